@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from collections.abc import AsyncGenerator
 
 from app.core.models import AnalysisResult, DialogueTurn, GeneratedDialogue, ImageAttachment
 
@@ -12,6 +13,10 @@ class STTProvider(ABC):
     async def transcribe_raw(self, audio_path: str) -> str:
         """Transcribes audio file to raw text without diarization."""
 
+    async def transcribe_stream(self, audio_path: str) -> AsyncGenerator[list[DialogueTurn], None]:
+        """Transcribes audio file with diarization, yielding turns as they are recognized."""
+        yield await self.transcribe(audio_path)
+
 
 class LLMProvider(ABC):
     @abstractmethod
@@ -53,3 +58,7 @@ class TTSProvider(ABC):
             output_path: Path to save the audio file
             voice: Optional voice name (e.g. "alloy", "sage", "fable"). If None, uses default.
         """
+
+    @abstractmethod
+    def stream(self, text: str, voice: str | None = None) -> AsyncGenerator[bytes, None]:
+        """Converts text to speech, yielding audio chunks as they are synthesized."""
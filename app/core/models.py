@@ -59,6 +59,26 @@ class GeneratedDialogue(BaseModel):
     dialogue: list[GeneratedDialogueTurn]
 
 
+class AudioSegment(BaseModel):
+    byte_offset: int
+    byte_length: int
+    start_seconds: float
+    duration_seconds: float
+
+
+class DialogueAudioTurn(AudioSegment):
+    role: str
+    text: str
+
+
+class DialogueAudioIndex(BaseModel):
+    """Position of each turn in a generated dialogue recording, for seeking to a speaker turn."""
+
+    audio_file: str
+    duration_seconds: float
+    turns: list[DialogueAudioTurn]
+
+
 # streaming responses
 class ComplaintsResponse(BaseModel):
     complaints: list[str] = Field(default_factory=list)
@@ -76,6 +96,15 @@ class ImageFindingsResponse(BaseModel):
     image_findings: list[str] = Field(default_factory=list)
 
 
+class ExtractionResponse(BaseModel):
+    """Combined schema for the single-call extraction pipeline mode."""
+
+    complaints: list[str] = Field(default_factory=list)
+    diagnosis: str | None = None
+    medications: list[Medication] = Field(default_factory=list)
+    image_findings: list[str] = Field(default_factory=list)
+
+
 class RecommendationsResponse(BaseModel):
     recommendations: list[str] = Field(default_factory=list)
 
@@ -0,0 +1,380 @@
+import asyncio
+import struct
+from array import array
+from collections.abc import AsyncGenerator, AsyncIterator, Callable, Sequence
+from contextlib import aclosing
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+from app.core.models import AudioSegment
+from config.logger import logger
+
+# MPEG version bits of the frame header: 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+# Layer III bitrates in kbps by bitrate index, for MPEG-1 and for MPEG-2/2.5
+MP3_BITRATES = {
+    True: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    False: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+XING_FLAGS = 0x0001 | 0x0002 | 0x0004  # frame count, byte count and seek TOC
+XING_SIZE = 4 + 4 + 4 + 4 + 100
+
+
+def audio_index_path(audio_file: Path) -> Path:
+    """Sidecar file holding the DialogueAudioIndex of a generated dialogue recording."""
+    return audio_file.with_name(f"{audio_file.stem}.index.json")
+
+
+class Mp3FrameHeader(NamedTuple):
+    version: int
+    bitrate_index: int
+    sample_rate_index: int
+    padding: bool
+    protected: bool
+    channel_mode: int
+
+    @classmethod
+    def parse(cls, data: bytes | bytearray, pos: int = 0) -> "Mp3FrameHeader | None":
+        """Parses a Layer III frame header, or returns None if the bytes are not one."""
+        if len(data) < pos + 4 or data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+            return None
+        b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+        version, layer = (b1 >> 3) & 0x03, (b1 >> 1) & 0x03
+        bitrate_index, sample_rate_index = b2 >> 4, (b2 >> 2) & 0x03
+        if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+            return None
+        return cls(
+            version=version,
+            bitrate_index=bitrate_index,
+            sample_rate_index=sample_rate_index,
+            padding=bool(b2 & 0x02),
+            protected=not b1 & 0x01,
+            channel_mode=b3 >> 6,
+        )
+
+    @property
+    def mpeg1(self) -> bool:
+        return self.version == 3
+
+    @property
+    def sample_rate(self) -> int:
+        return MP3_SAMPLE_RATES[self.version][self.sample_rate_index]
+
+    @property
+    def samples(self) -> int:
+        return 1152 if self.mpeg1 else 576
+
+    @property
+    def length(self) -> int:
+        bitrate = MP3_BITRATES[self.mpeg1][self.bitrate_index] * 1000
+        return self.samples // 8 * bitrate // self.sample_rate + self.padding
+
+    @property
+    def duration(self) -> float:
+        return self.samples / self.sample_rate
+
+    @property
+    def side_info_size(self) -> int:
+        mono = self.channel_mode == 3
+        if self.mpeg1:
+            return 17 if mono else 32
+        return 9 if mono else 17
+
+    def to_bytes(self) -> bytes:
+        return bytes(
+            (
+                0xFF,
+                0xE0 | self.version << 3 | 1 << 1 | (not self.protected),
+                self.bitrate_index << 4 | self.sample_rate_index << 2 | self.padding << 1,
+                self.channel_mode << 6,
+            )
+        )
+
+    def is_info_frame(self, frame: bytes | bytearray) -> bool:
+        """Whether the frame carries a Xing/Info or VBRI header instead of audio."""
+        offset = 4 + self.side_info_size + (2 if self.protected else 0)
+        return frame[offset : offset + 4] in (b"Xing", b"Info") or frame[36:40] == b"VBRI"
+
+
+class Mp3FrameParser:
+    """Splits an MP3 byte stream into audio frames, dropping ID3 tags and Xing/Info/VBRI frames."""
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+        self._skip = 0
+        self._first_frame = True
+        self.skipped_bytes = 0
+
+    def feed(self, data: bytes) -> list[tuple[Mp3FrameHeader, bytes]]:
+        self._buffer += data
+        frames: list[tuple[Mp3FrameHeader, bytes]] = []
+        pos = 0
+        while True:
+            if self._skip:
+                skipped = min(self._skip, len(self._buffer) - pos)
+                pos += skipped
+                self._skip -= skipped
+                if self._skip:
+                    break
+            available = len(self._buffer) - pos
+            if available < 4:
+                break
+            if self._buffer[pos : pos + 3] == b"ID3":
+                if available < 10:
+                    break
+                flags, size = self._buffer[pos + 5], self._buffer[pos + 6 : pos + 10]
+                # Tag sizes are synchsafe integers: 7 bits per byte
+                self._skip = 10 + (size[0] << 21 | size[1] << 14 | size[2] << 7 | size[3])
+                self._skip += 10 if flags & 0x10 else 0
+                continue
+            if self._buffer[pos : pos + 3] == b"TAG":
+                self._skip = 128
+                continue
+            header = Mp3FrameHeader.parse(self._buffer, pos)
+            if header is None:
+                # Not a frame boundary: resynchronize on the next byte
+                pos += 1
+                self.skipped_bytes += 1
+                continue
+            if available < header.length:
+                break
+            frame = bytes(self._buffer[pos : pos + header.length])
+            pos += header.length
+            if self._first_frame and header.is_info_frame(frame):
+                self._first_frame = False
+                continue
+            self._first_frame = False
+            frames.append((header, frame))
+        del self._buffer[:pos]
+        return frames
+
+    def close(self) -> None:
+        self.skipped_bytes += len(self._buffer)
+        self._buffer.clear()
+
+
+async def mp3_playback_chunks(
+    chunks: AsyncIterator[bytes], min_seconds: float
+) -> AsyncGenerator[bytes, None]:
+    """Regroups a streamed MP3 into whole frames that a player can decode chunk by chunk.
+
+    The first frames are passed on as soon as they arrive so playback starts right away; later
+    chunks carry at least min_seconds of audio.
+    """
+    parser = Mp3FrameParser()
+    pending = bytearray()
+    seconds, first = 0.0, True
+    async for chunk in chunks:
+        for header, frame in parser.feed(chunk):
+            pending += frame
+            seconds += header.duration
+        if pending and (first or seconds >= min_seconds):
+            yield bytes(pending)
+            pending.clear()
+            seconds, first = 0.0, False
+    if pending:
+        yield bytes(pending)
+
+
+async def ordered_streams(
+    streams: Sequence[Callable[[], AsyncGenerator[bytes, None]]], limit: int
+) -> AsyncGenerator[bytes, None]:
+    """Runs up to limit streams at a time and yields their chunks in order.
+
+    Chunks of the first unfinished stream are passed on as they arrive; later streams are
+    buffered until their turn. The first failing stream's exception is raised in order.
+    """
+    semaphore = asyncio.Semaphore(limit)
+    queues: list[asyncio.Queue[bytes | Exception | None]] = [asyncio.Queue() for _ in streams]
+
+    async def produce(
+        open_stream: Callable[[], AsyncGenerator[bytes, None]],
+        queue: asyncio.Queue[bytes | Exception | None],
+    ) -> None:
+        try:
+            async with semaphore, aclosing(open_stream()) as chunks:
+                async for chunk in chunks:
+                    queue.put_nowait(chunk)
+        except Exception as e:
+            queue.put_nowait(e)
+        else:
+            queue.put_nowait(None)
+
+    tasks = [asyncio.create_task(produce(stream, queue)) for stream, queue in zip(streams, queues)]
+    try:
+        for queue in queues:
+            while (item := await queue.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class _AudioPart:
+    def __init__(self) -> None:
+        self.parser = Mp3FrameParser()
+        self.pending = bytearray()
+        self.frame_sizes = array("H")
+        self.finished = False
+
+
+class OrderedAudioWriter:
+    """Assembles MP3 parts synthesized concurrently into one file in their original order.
+
+    Each part is split into frames; its ID3 tags and Xing/Info headers are dropped, and the file
+    starts with a single Info/Xing frame carrying the total frame count and a seek TOC, written
+    into space reserved at the start once all parts are complete. No audio is re-encoded.
+
+    Frames of the part being written go straight to the output; frames of later parts are held in
+    memory until their turn, and their producers wait while more than max_buffered bytes are held.
+    The output receives writes of exactly chunk_size bytes, except for the last one and the header.
+    """
+
+    def __init__(self, output: BinaryIO, parts: int, chunk_size: int, max_buffered: int) -> None:
+        self._output = output
+        self._start = output.tell()
+        self._chunk_size = chunk_size
+        self._max_buffered = max_buffered
+        self._parts = [_AudioPart() for _ in range(parts)]
+        self._current = 0
+        self._buffered = 0
+        self._out = bytearray()
+        self._changed = asyncio.Condition()
+        self._header: Mp3FrameHeader | None = None
+        self._header_size = 0
+        self._bitrates: set[int] = set()
+        self.bytes_written = 0
+        self.duration_seconds = 0.0
+        self.segments: list[AudioSegment] = []
+
+    async def write(self, index: int, chunk: bytes) -> None:
+        part = self._parts[index]
+        data = bytearray()
+        for header, frame in part.parser.feed(chunk):
+            self._check_format(header)
+            self._bitrates.add(header.bitrate_index)
+            part.frame_sizes.append(len(frame))
+            data += frame
+        if not data:
+            return
+        async with self._changed:
+            await self._changed.wait_for(
+                lambda: index == self._current or self._buffered < self._max_buffered
+            )
+            if index == self._current:
+                self._append(data)
+            else:
+                part.pending += data
+                self._buffered += len(data)
+
+    async def finish(self, index: int) -> None:
+        """Marks a part as complete, moving on to the next parts that are already buffered."""
+        part = self._parts[index]
+        part.parser.close()
+        if part.parser.skipped_bytes:
+            logger.warning(f"Audio part {index}: skipped {part.parser.skipped_bytes} non-MP3 bytes")
+        async with self._changed:
+            part.finished = True
+            while self._current < len(self._parts) and self._parts[self._current].finished:
+                self._current += 1
+                if self._current < len(self._parts):
+                    following = self._parts[self._current]
+                    self._buffered -= len(following.pending)
+                    self._append(following.pending)
+                    following.pending = bytearray()
+            self._changed.notify_all()
+
+    def close(self) -> list[AudioSegment]:
+        """Flushes the output, writes the Xing header and returns the byte/time span of each part."""
+        if self._current < len(self._parts):
+            raise RuntimeError(f"Audio part {self._current} was not finished")
+        if self._out:
+            self._output.write(self._out)
+            self.bytes_written += len(self._out)
+            self._out.clear()
+
+        segments: list[AudioSegment] = []
+        offset, frames = self._header_size, 0
+        frame_duration = self._header.duration if self._header else 0.0
+        for part in self._parts:
+            size = sum(part.frame_sizes)
+            segments.append(
+                AudioSegment(
+                    byte_offset=offset,
+                    byte_length=size,
+                    start_seconds=round(frames * frame_duration, 3),
+                    duration_seconds=round(len(part.frame_sizes) * frame_duration, 3),
+                )
+            )
+            offset += size
+            frames += len(part.frame_sizes)
+        self.duration_seconds = round(frames * frame_duration, 3)
+        self.segments = segments
+
+        if self._header is not None:
+            end = self._output.tell()
+            self._output.seek(self._start)
+            self._output.write(self._info_frame())
+            self._output.seek(end)
+        self._output.flush()
+        return segments
+
+    def _check_format(self, header: Mp3FrameHeader) -> None:
+        if self._header is None:
+            self._header = header
+            return
+        if (header.version, header.sample_rate_index) != (
+            self._header.version,
+            self._header.sample_rate_index,
+        ):
+            raise ValueError(
+                f"Audio parts have different sample rates ({header.sample_rate} Hz and "
+                f"{self._header.sample_rate} Hz) and cannot be joined without re-encoding"
+            )
+
+    def _append(self, data: bytes | bytearray) -> None:
+        if not self._header_size and self._header is not None:
+            # Space for the Info/Xing frame, filled in by close()
+            self._header_size = self._info_header().length
+            self._out += bytes(self._header_size)
+        self._out += data
+        while len(self._out) >= self._chunk_size:
+            self._output.write(self._out[: self._chunk_size])
+            del self._out[: self._chunk_size]
+            self.bytes_written += self._chunk_size
+
+    def _info_header(self) -> Mp3FrameHeader:
+        assert self._header is not None
+        # The smallest bitrate whose frame fits the Xing payload after the side info
+        for bitrate_index in range(1, 15):
+            header = self._header._replace(
+                bitrate_index=bitrate_index, padding=False, protected=False
+            )
+            if header.length >= 4 + header.side_info_size + XING_SIZE:
+                return header
+        raise ValueError("No MP3 frame size fits the Xing header")
+
+    def _info_frame(self) -> bytes:
+        header = self._info_header()
+        frame_sizes = array("H")
+        for part in self._parts:
+            frame_sizes.extend(part.frame_sizes)
+        total_bytes = self._header_size + sum(frame_sizes)
+
+        # TOC entry i: position of the frame at i% of the duration, in 1/256 of the file size
+        toc = bytearray()
+        offset, next_frame = self._header_size, 0
+        for i in range(100):
+            target = i * len(frame_sizes) // 100
+            while next_frame < target:
+                offset += frame_sizes[next_frame]
+                next_frame += 1
+            toc.append(min(255, offset * 256 // total_bytes))
+
+        # Constant bitrate streams are tagged "Info", variable bitrate ones "Xing"
+        tag = b"Info" if len(self._bitrates) == 1 else b"Xing"
+        payload = tag + struct.pack(">III", XING_FLAGS, len(frame_sizes), total_bytes) + toc
+        frame = header.to_bytes() + bytes(header.side_info_size) + payload
+        return frame + bytes(header.length - len(frame))
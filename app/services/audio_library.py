@@ -0,0 +1,174 @@
+import json
+import re
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Literal
+
+from pydantic import BaseModel
+
+from app.services.audio import audio_index_path
+from config.logger import logger
+from config.settings import config
+
+LIBRARY_DB_NAME = "dialogue_library.db"
+DIALOGUE_FILE_PATTERN = re.compile(r"^(\d+)_dialogue_(.+)_skill(\d+)\.mp3$")
+
+AudioStatus = Literal["generating", "ready"]
+ENTRY_COLUMNS = (
+    "file_index",
+    "file_name",
+    "diagnosis",
+    "doctor_skill",
+    "status",
+    "duration_seconds",
+    "turns",
+    "created_at",
+)
+
+
+class DialogueAudioEntry(BaseModel):
+    file_index: int
+    file_name: str
+    diagnosis: str | None = None
+    doctor_skill: int
+    status: AudioStatus
+    duration_seconds: float | None = None
+    turns: int | None = None
+    created_at: float
+
+
+def diagnosis_slug(diagnosis: str | None) -> str:
+    if not diagnosis:
+        return "random"
+    slug = diagnosis.lower()
+    slug = re.sub(r"[^\w\s-]", "", slug)
+    slug = re.sub(r"[\s_]+", "_", slug)
+    slug = slug.strip("_")
+    return slug
+
+
+class DialogueAudioLibrary:
+    """Manifest of the generated dialogue recordings in a directory, kept in SQLite next to them.
+
+    File numbers come from an AUTOINCREMENT key, so concurrent generations never share a number
+    and numbers of discarded files are not reused. Recordings that predate the manifest are
+    imported once, when it is created.
+    """
+
+    def __init__(self, directory: Path | None = None) -> None:
+        self.directory = directory or config.DATA_DIR
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.directory / LIBRARY_DB_NAME
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Serializes creation so only one process imports the existing files
+            conn.execute("BEGIN IMMEDIATE")
+            created = not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'dialogue_audio'"
+            ).fetchone()
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS dialogue_audio (
+                    file_index INTEGER PRIMARY KEY AUTOINCREMENT,
+                    file_name TEXT NOT NULL,
+                    diagnosis TEXT,
+                    doctor_skill INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    duration_seconds REAL,
+                    turns INTEGER,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            if created:
+                self._import_existing(conn)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.db_path, timeout=10)) as conn, conn:
+            yield conn
+
+    def _import_existing(self, conn: sqlite3.Connection) -> None:
+        imported = 0
+        for path in self.directory.glob("*_dialogue_*.mp3"):
+            match = DIALOGUE_FILE_PATTERN.match(path.name)
+            if not match:
+                continue
+            file_index, slug, doctor_skill = match.groups()
+            duration_seconds, turns = None, None
+            index_file = audio_index_path(path)
+            if index_file.exists():
+                index = json.loads(index_file.read_text(encoding="utf-8"))
+                duration_seconds, turns = index["duration_seconds"], len(index["turns"])
+            conn.execute(
+                "INSERT OR IGNORE INTO dialogue_audio (file_index, file_name, diagnosis, "
+                "doctor_skill, status, duration_seconds, turns, created_at) "
+                "VALUES (?, ?, ?, ?, 'ready', ?, ?, ?)",
+                (
+                    int(file_index),
+                    path.name,
+                    None if slug == "random" else slug.replace("_", " "),
+                    int(doctor_skill),
+                    duration_seconds,
+                    turns,
+                    path.stat().st_mtime,
+                ),
+            )
+            imported += 1
+        if imported:
+            logger.info(f"DialogueAudioLibrary: imported {imported} existing recordings")
+
+    def allocate(self, diagnosis: str | None, doctor_skill: int) -> DialogueAudioEntry:
+        """Reserves the next file number and name for a recording being generated."""
+        created_at = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO dialogue_audio (file_name, diagnosis, doctor_skill, status, created_at) "
+                "VALUES ('', ?, ?, 'generating', ?)",
+                (diagnosis, doctor_skill, created_at),
+            )
+            file_index = cursor.lastrowid
+            assert file_index is not None
+            file_name = (
+                f"{file_index:04d}_dialogue_{diagnosis_slug(diagnosis)}_skill{doctor_skill}.mp3"
+            )
+            conn.execute(
+                "UPDATE dialogue_audio SET file_name = ? WHERE file_index = ?",
+                (file_name, file_index),
+            )
+        return DialogueAudioEntry(
+            file_index=file_index,
+            file_name=file_name,
+            diagnosis=diagnosis,
+            doctor_skill=doctor_skill,
+            status="generating",
+            created_at=created_at,
+        )
+
+    def complete(self, file_index: int, duration_seconds: float, turns: int) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE dialogue_audio SET status = 'ready', duration_seconds = ?, turns = ? "
+                "WHERE file_index = ?",
+                (duration_seconds, turns, file_index),
+            )
+
+    def discard(self, file_index: int) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM dialogue_audio WHERE file_index = ?", (file_index,))
+
+    def entries(self, limit: int | None = None) -> list[DialogueAudioEntry]:
+        """Ready recordings, newest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(ENTRY_COLUMNS)} FROM dialogue_audio WHERE status = 'ready' "
+                "ORDER BY file_index DESC LIMIT ?",
+                (-1 if limit is None else limit,),
+            ).fetchall()
+        return [DialogueAudioEntry(**dict(zip(ENTRY_COLUMNS, row))) for row in rows]
+
+    def path(self, entry: DialogueAudioEntry) -> Path:
+        return self.directory / entry.file_name
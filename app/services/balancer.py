@@ -0,0 +1,104 @@
+import itertools
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import httpx
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from config.logger import logger
+
+WORKER_COOKIE = "medbro_worker"
+# Connection-level headers are not forwarded between the client, the balancer and the worker
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+}
+PROXY_METHODS = ["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]
+
+
+class StickyBalancer:
+    """Reverse proxy pinning every browser session to one worker with a cookie.
+
+    Gradio keeps a session's queue and event streams in the worker process, so all requests of a
+    session must reach the same worker. New sessions are assigned round-robin.
+    """
+
+    def __init__(self, workers: list[str]) -> None:
+        self.workers = workers
+        self._next_worker = itertools.cycle(range(len(workers)))
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=5.0))
+
+    def pick_worker(self, request: Request) -> tuple[int, bool]:
+        cookie = request.cookies.get(WORKER_COOKIE, "")
+        if cookie.isdigit() and int(cookie) < len(self.workers):
+            return int(cookie), False
+        return next(self._next_worker), True
+
+    async def proxy(self, request: Request) -> Response:
+        index, assigned = self.pick_worker(request)
+        raw_path = request.scope.get("raw_path") or request.url.path.encode()
+        if request.scope.get("query_string"):
+            raw_path += b"?" + request.scope["query_string"]
+        url = httpx.URL(self.workers[index]).copy_with(raw_path=raw_path)
+        headers = [
+            (name, value)
+            for name, value in request.headers.raw
+            if name.decode("latin-1").lower() not in HOP_BY_HOP_HEADERS
+        ]
+        upstream_request = self._client.build_request(
+            request.method,
+            url,
+            headers=headers,
+            content=request.stream() if request.method not in ("GET", "HEAD") else None,
+        )
+        try:
+            upstream = await self._client.send(upstream_request, stream=True)
+        except httpx.ConnectError:
+            logger.error(f"✗ Worker {index} at {self.workers[index]} is unreachable")
+            response: Response = PlainTextResponse("Worker unavailable, please reload", 502)
+            # The next request is assigned to another worker
+            response.delete_cookie(WORKER_COOKIE)
+            return response
+
+        response = StreamingResponse(
+            upstream.aiter_raw(),
+            status_code=upstream.status_code,
+            headers={
+                name: value
+                for name, value in upstream.headers.items()
+                if name.lower() not in HOP_BY_HOP_HEADERS and name.lower() != "set-cookie"
+            },
+            background=BackgroundTask(upstream.aclose),
+        )
+        for cookie in upstream.headers.get_list("set-cookie"):
+            response.headers.append("set-cookie", cookie)
+        if assigned:
+            response.set_cookie(WORKER_COOKIE, str(index), httponly=True, samesite="lax")
+        return response
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def create_balancer_app(workers: list[str]) -> Starlette:
+    balancer = StickyBalancer(workers)
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        yield
+        await balancer.close()
+
+    return Starlette(
+        routes=[Route("/{path:path}", balancer.proxy, methods=PROXY_METHODS)],
+        lifespan=lifespan,
+    )
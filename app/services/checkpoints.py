@@ -0,0 +1,129 @@
+import hashlib
+import json
+import sqlite3
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel
+from pydantic_core import to_jsonable_python
+
+from config.logger import logger
+from config.settings import config
+
+
+class StageCheckpoint(BaseModel):
+    session_id: str
+    stage: str
+    response_id: str | None = None
+    outputs: dict[str, Any]
+
+
+def hash_files(paths: Iterable[str]) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def hash_text(*parts: str | None) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class CheckpointStore:
+    """Persists finished stages in SQLite so an interrupted session can resume.
+
+    Upload stages are stored under the upload's session id, analysis stages under a hash of
+    their inputs, so an analysis stage is reused by any run with the same inputs.
+    """
+
+    def __init__(self, db_path: Path | None = None, ttl_hours: float | None = None) -> None:
+        self.db_path = db_path or config.CHECKPOINT_DB_PATH
+        self.ttl_seconds = (ttl_hours or config.CHECKPOINT_TTL_HOURS) * 3600
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            # Worker processes share the store; WAL keeps their reads and writes from blocking
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS stage_checkpoints (
+                    session_id TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    response_id TEXT,
+                    outputs TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (session_id, stage)
+                )
+                """
+            )
+            deleted = conn.execute(
+                "DELETE FROM stage_checkpoints WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,),
+            ).rowcount
+        if deleted:
+            logger.info(f"CheckpointStore: pruned {deleted} expired checkpoints")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # A connection per call keeps the store usable from worker threads
+        with closing(sqlite3.connect(self.db_path, timeout=10)) as conn, conn:
+            yield conn
+
+    def load(self, session_id: str) -> dict[str, StageCheckpoint]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT stage, response_id, outputs FROM stage_checkpoints "
+                "WHERE session_id = ? AND created_at >= ?",
+                (session_id, time.time() - self.ttl_seconds),
+            ).fetchall()
+        return {
+            stage: StageCheckpoint(
+                session_id=session_id,
+                stage=stage,
+                response_id=response_id,
+                outputs=json.loads(outputs),
+            )
+            for stage, response_id, outputs in rows
+        }
+
+    def get(self, session_id: str, stage: str) -> StageCheckpoint | None:
+        return self.load(session_id).get(stage)
+
+    def save(
+        self,
+        session_id: str,
+        stage: str,
+        outputs: dict[str, Any],
+        response_id: str | None = None,
+    ) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO stage_checkpoints "
+                "(session_id, stage, response_id, outputs, created_at) VALUES (?, ?, ?, ?, ?)",
+                (
+                    session_id,
+                    stage,
+                    response_id,
+                    json.dumps(to_jsonable_python(outputs), ensure_ascii=False),
+                    time.time(),
+                ),
+            )
+
+    def clear(self, session_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM stage_checkpoints WHERE session_id = ?", (session_id,))
+
+
+def get_checkpoint_store() -> CheckpointStore | None:
+    if not config.CHECKPOINTS_ENABLED:
+        return None
+    return CheckpointStore()
@@ -0,0 +1,228 @@
+import asyncio
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import closing, contextmanager
+from pathlib import Path
+
+from app.core.interfaces import LLMProvider
+from app.core.models import GeneratedDialogue
+from app.services.checkpoints import hash_text
+from app.services.llm import get_llm_provider
+from app.services.metrics import record_cache_lookup
+from config.logger import logger
+from config.prompts import get_dialogue_generation_prompt
+from config.settings import config
+
+# A refill claimed by a worker that died is taken over after this long
+_REFILL_CLAIM_SECONDS = 600.0
+
+
+def normalize_diagnosis(diagnosis: str | None) -> str | None:
+    return " ".join((diagnosis or "").lower().split()) or None
+
+
+class DialoguePool:
+    """Generated dialogues kept ready per diagnosis and doctor skill, so simulations start at once.
+
+    Dialogues are stored in SQLite, keyed by their generation prompt, LLM provider and model, so
+    they survive restarts and are dropped when any of these changes. Only the presets and
+    combinations requested at least DIALOGUE_POOL_MIN_REQUESTS times are refilled, and a refill is
+    claimed in the database so workers sharing it never fill the same combination twice. The
+    pool's async methods share one LLM client and must run on one event loop.
+    """
+
+    def __init__(
+        self, llm: LLMProvider, db_path: Path | None = None, size: int | None = None
+    ) -> None:
+        self._llm = llm
+        self.db_path = db_path or config.DIALOGUE_POOL_DB_PATH
+        self.size = size or config.DIALOGUE_POOL_SIZE
+        self._presets = {
+            (normalize_diagnosis(diagnosis), skill)
+            for diagnosis, skill in config.DIALOGUE_POOL_PRESETS
+        }
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS dialogue_pool (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    key TEXT NOT NULL,
+                    diagnosis TEXT,
+                    doctor_skill INTEGER NOT NULL,
+                    dialogue TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS dialogue_pool_key ON dialogue_pool (key)")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS dialogue_pool_demand (
+                    key TEXT PRIMARY KEY,
+                    diagnosis TEXT,
+                    doctor_skill INTEGER NOT NULL,
+                    requests INTEGER NOT NULL DEFAULT 0,
+                    refill_claimed_at REAL
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.db_path, timeout=10)) as conn, conn:
+            yield conn
+
+    def key(self, diagnosis: str | None, doctor_skill: int) -> str:
+        prompt = get_dialogue_generation_prompt(diagnosis=diagnosis, doctor_skill=doctor_skill)
+        return hash_text(prompt, type(self._llm).__name__, config.LLM_MODEL)
+
+    def take(self, diagnosis: str | None, doctor_skill: int) -> GeneratedDialogue | None:
+        """Removes and returns the oldest ready dialogue of a combination, if there is one."""
+        diagnosis = normalize_diagnosis(diagnosis)
+        with self._connect() as conn:
+            # Two workers never take the same dialogue
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, dialogue FROM dialogue_pool WHERE key = ? ORDER BY id LIMIT 1",
+                (self.key(diagnosis, doctor_skill),),
+            ).fetchone()
+            if row:
+                conn.execute("DELETE FROM dialogue_pool WHERE id = ?", (row[0],))
+            conn.execute(
+                "INSERT INTO dialogue_pool_demand (key, diagnosis, doctor_skill, requests) "
+                "VALUES (?, ?, ?, 1) ON CONFLICT (key) DO UPDATE SET requests = requests + 1",
+                (self.key(diagnosis, doctor_skill), diagnosis, doctor_skill),
+            )
+        record_cache_lookup("dialogue_pool", row is not None)
+        return GeneratedDialogue.model_validate_json(row[1]) if row else None
+
+    def count(self, key: str) -> int:
+        with self._connect() as conn:
+            return int(
+                conn.execute("SELECT COUNT(*) FROM dialogue_pool WHERE key = ?", (key,)).fetchone()[
+                    0
+                ]
+            )
+
+    def _is_wanted(self, key: str, diagnosis: str | None, doctor_skill: int) -> bool:
+        """Whether a combination is a preset or was requested often enough to keep it ready."""
+        if (diagnosis, doctor_skill) in self._presets:
+            return True
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT requests FROM dialogue_pool_demand WHERE key = ?", (key,)
+            ).fetchone()
+        return row is not None and row[0] >= config.DIALOGUE_POOL_MIN_REQUESTS
+
+    def _claim_refill(self, key: str, diagnosis: str | None, doctor_skill: int) -> bool:
+        """Marks a combination as being refilled, unless another worker already claimed it."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO dialogue_pool_demand (key, diagnosis, doctor_skill) "
+                "VALUES (?, ?, ?)",
+                (key, diagnosis, doctor_skill),
+            )
+            claimed = conn.execute(
+                "UPDATE dialogue_pool_demand SET refill_claimed_at = ? WHERE key = ? "
+                "AND (refill_claimed_at IS NULL OR refill_claimed_at < ?)",
+                (now, key, now - _REFILL_CLAIM_SECONDS),
+            )
+            return claimed.rowcount == 1
+
+    def _release_refill(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE dialogue_pool_demand SET refill_claimed_at = NULL WHERE key = ?", (key,)
+            )
+
+    def _add(
+        self, key: str, diagnosis: str | None, doctor_skill: int, dialogue: GeneratedDialogue
+    ) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO dialogue_pool (key, diagnosis, doctor_skill, dialogue, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, diagnosis, doctor_skill, dialogue.model_dump_json(), time.time()),
+            )
+
+    async def refill(self, diagnosis: str | None, doctor_skill: int) -> int:
+        """Generates dialogues until a wanted combination has `size` ready; returns how many were
+        added."""
+        diagnosis = normalize_diagnosis(diagnosis)
+        key = self.key(diagnosis, doctor_skill)
+        if not await asyncio.to_thread(self._is_wanted, key, diagnosis, doctor_skill):
+            return 0
+        if not await asyncio.to_thread(self._claim_refill, key, diagnosis, doctor_skill):
+            return 0
+        try:
+            missing = self.size - await asyncio.to_thread(self.count, key)
+            if missing <= 0:
+                return 0
+            logger.info(
+                f"→ Refilling dialogue pool: {missing} dialogues "
+                f"(diagnosis: {diagnosis}, skill: {doctor_skill})"
+            )
+            system_prompt = get_dialogue_generation_prompt(
+                diagnosis=diagnosis, doctor_skill=doctor_skill
+            )
+            results = await asyncio.gather(
+                *[
+                    self._llm.generate_dialogue(system_prompt=system_prompt, diagnosis=diagnosis)
+                    for _ in range(missing)
+                ],
+                return_exceptions=True,
+            )
+            added = 0
+            for result in results:
+                if isinstance(result, BaseException):
+                    logger.error(f"✗ Dialogue pool generation failed: {result}")
+                    continue
+                await asyncio.to_thread(self._add, key, diagnosis, doctor_skill, result)
+                added += 1
+            logger.info(f"✓ Dialogue pool refilled with {added} dialogues")
+            return added
+        finally:
+            await asyncio.to_thread(self._release_refill, key)
+
+    def _requested_combinations(self) -> list[tuple[str | None, int]]:
+        """Combinations requested repeatedly; data of an outdated prompt is dropped."""
+        with self._connect() as conn:
+            keys = conn.execute(
+                "SELECT key, diagnosis, doctor_skill FROM dialogue_pool "
+                "UNION SELECT key, diagnosis, doctor_skill FROM dialogue_pool_demand"
+            ).fetchall()
+            stale = [(key,) for key, diagnosis, skill in keys if key != self.key(diagnosis, skill)]
+            if stale:
+                conn.executemany("DELETE FROM dialogue_pool WHERE key = ?", stale)
+                conn.executemany("DELETE FROM dialogue_pool_demand WHERE key = ?", stale)
+                logger.info(f"DialoguePool: dropped dialogues of {len(stale)} outdated prompts")
+            requested = conn.execute(
+                "SELECT diagnosis, doctor_skill FROM dialogue_pool_demand WHERE requests >= ?",
+                (config.DIALOGUE_POOL_MIN_REQUESTS,),
+            ).fetchall()
+        return [(diagnosis, skill) for diagnosis, skill in requested]
+
+    async def warm(self) -> None:
+        """Fills the presets and the combinations requested repeatedly, one at a time."""
+        requested = await asyncio.to_thread(self._requested_combinations)
+        wanted = {
+            self.key(diagnosis, skill): (diagnosis, skill) for diagnosis, skill in self._presets
+        }
+        for diagnosis, skill in requested:
+            wanted[self.key(diagnosis, skill)] = (diagnosis, skill)
+        for diagnosis, skill in wanted.values():
+            await self.refill(diagnosis, skill)
+
+
+_dialogue_pool: DialoguePool | None = None
+
+
+def get_dialogue_pool() -> DialoguePool:
+    global _dialogue_pool
+    if _dialogue_pool is None:
+        _dialogue_pool = DialoguePool(get_llm_provider())
+    return _dialogue_pool
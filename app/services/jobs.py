@@ -0,0 +1,367 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import AsyncGenerator, Callable, Coroutine, Iterator
+from concurrent.futures import Future
+from contextlib import aclosing, closing, contextmanager
+from pathlib import Path
+from typing import Any, Literal, TypeVar
+
+from pydantic import BaseModel
+from pydantic_core import to_jsonable_python
+
+from app.core.models import AnalysisResult, EvaluationCriterion, Medication
+from config.logger import logger
+from config.settings import config
+
+T = TypeVar("T")
+
+JobStatus = Literal["queued", "running", "complete", "failed", "cancelled"]
+FINISHED_STATUSES = ("complete", "failed", "cancelled")
+
+# Models of list items in event data, restored when events are read back from the job store
+EVENT_ITEM_MODELS: dict[str, type[BaseModel]] = {
+    "criteria": EvaluationCriterion,
+    "medications": Medication,
+}
+
+
+def load_job_event(event: dict[str, Any]) -> dict[str, Any]:
+    stage = event.get("stage")
+    data = event.get("data")
+    if stage == "complete" and isinstance(data, dict):
+        data = AnalysisResult.model_validate(data)
+    elif stage in EVENT_ITEM_MODELS and isinstance(data, list):
+        data = [EVENT_ITEM_MODELS[stage].model_validate(item) for item in data]
+    return {**event, "data": data}
+
+
+class JobRecord(BaseModel):
+    job_id: str
+    worker: str
+    status: JobStatus
+    cancel_requested: bool = False
+
+
+class AnalysisJob:
+    """Event log of one background analysis that any number of clients can follow."""
+
+    def __init__(self, job_id: str) -> None:
+        self.job_id = job_id
+        self.status: JobStatus = "queued"
+        self.created_at = time.time()
+        self.finished_at: float | None = None
+        self.events: list[dict[str, Any]] = []
+        self.future: Future[None] | None = None
+        # Number of events already written to the job store
+        self.stored_events = 0
+        self._lock = threading.Lock()
+        # Subscribers live on other event loops and are woken up thread-safely
+        self._subscribers: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def publish(self, event: dict[str, Any]) -> None:
+        with self._lock:
+            self.events.append(event)
+        self._notify()
+
+    def finish(self, status: JobStatus) -> None:
+        with self._lock:
+            if self.finished:
+                return
+            self.status = status
+            self.finished_at = time.time()
+        logger.info(f"✓ Job {self.job_id} {status} with {len(self.events)} events")
+        self._notify()
+
+    async def subscribe(self, offset: int = 0) -> AsyncGenerator[dict[str, Any], None]:
+        """Replays the events from `offset`, then follows the job until it finishes."""
+        wakeup = asyncio.Event()
+        subscriber = (asyncio.get_running_loop(), wakeup)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            while True:
+                wakeup.clear()
+                with self._lock:
+                    events = self.events[offset:]
+                    finished = self.finished
+                offset += len(events)
+                for event in events:
+                    yield event
+                if finished:
+                    return
+                await wakeup.wait()
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+    def _notify(self) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, wakeup in subscribers:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                # The subscriber's loop is already closed
+                pass
+
+
+class JobStore:
+    """Shares job status and events between worker processes through SQLite."""
+
+    def __init__(self, db_path: Path | None = None) -> None:
+        self.db_path = db_path or config.JOB_DB_PATH
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            # Readers in other processes do not block the worker writing events
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analysis_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    worker TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    finished_at REAL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analysis_job_events (
+                    job_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    event TEXT NOT NULL,
+                    PRIMARY KEY (job_id, idx)
+                )
+                """
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.db_path, timeout=10)) as conn, conn:
+            yield conn
+
+    def create(self, job_id: str, worker: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO analysis_jobs (job_id, worker, status, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, worker, "queued", time.time()),
+            )
+
+    def get(self, job_id: str) -> JobRecord | None:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT worker, status, cancel_requested FROM analysis_jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        worker, status, cancel_requested = row
+        return JobRecord(
+            job_id=job_id, worker=worker, status=status, cancel_requested=bool(cancel_requested)
+        )
+
+    def append_events(self, job_id: str, start: int, events: list[dict[str, Any]]) -> None:
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO analysis_job_events (job_id, idx, event) VALUES (?, ?, ?)",
+                [
+                    (job_id, idx, json.dumps(to_jsonable_python(event), ensure_ascii=False))
+                    for idx, event in enumerate(events, start)
+                ],
+            )
+
+    def events(self, job_id: str, offset: int = 0) -> list[dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT event FROM analysis_job_events WHERE job_id = ? AND idx >= ? ORDER BY idx",
+                (job_id, offset),
+            ).fetchall()
+        return [load_job_event(json.loads(event)) for (event,) in rows]
+
+    def set_status(self, job_id: str, status: JobStatus) -> None:
+        finished_at = time.time() if status in FINISHED_STATUSES else None
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE analysis_jobs SET status = ?, finished_at = ? WHERE job_id = ?",
+                (status, finished_at, job_id),
+            )
+
+    def request_cancel(self, job_id: str) -> bool:
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE analysis_jobs SET cancel_requested = 1 "
+                "WHERE job_id = ? AND finished_at IS NULL",
+                (job_id,),
+            ).rowcount
+        return updated > 0
+
+    def prune(self, cutoff: float) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM analysis_job_events WHERE job_id IN "
+                "(SELECT job_id FROM analysis_jobs WHERE finished_at < ?)",
+                (cutoff,),
+            )
+            conn.execute("DELETE FROM analysis_jobs WHERE finished_at < ?", (cutoff,))
+
+
+class StoredJob:
+    """A job running in another worker process, followed through the job store."""
+
+    def __init__(self, job_id: str, store: JobStore, poll_interval: float | None = None) -> None:
+        self.job_id = job_id
+        self._store = store
+        self._poll_interval = poll_interval or config.JOB_POLL_INTERVAL
+
+    async def subscribe(self, offset: int = 0) -> AsyncGenerator[dict[str, Any], None]:
+        while True:
+            # The owner stores all events before the final status, so read the status first
+            record = await asyncio.to_thread(self._store.get, self.job_id)
+            events = await asyncio.to_thread(self._store.events, self.job_id, offset)
+            offset += len(events)
+            for event in events:
+                yield event
+            if record is None or record.status in FINISHED_STATUSES:
+                return
+            await asyncio.sleep(self._poll_interval)
+
+
+class JobManager:
+    """Runs analysis jobs on a background event loop, detached from the client that started them.
+
+    With a job store, jobs of other worker processes can be followed and cancelled as well.
+    """
+
+    def __init__(
+        self, retention_minutes: float | None = None, store: JobStore | None = None
+    ) -> None:
+        self.retention_seconds = (retention_minutes or config.JOB_RETENTION_MINUTES) * 60
+        self.worker_id = config.WORKER_ID or f"{socket.gethostname()}-{os.getpid()}"
+        self._store = store
+        # Serializes event writes of the sync task and the final write of a job
+        self._store_lock = threading.Lock()
+        self._jobs: dict[str, AnalysisJob] = {}
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="analysis-jobs", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, run: Callable[[], AsyncGenerator[dict[str, Any], None]]) -> AnalysisJob:
+        """Starts `run` on the job loop; it is called there, so its clients stay on that loop."""
+        self._prune()
+        job = AnalysisJob(uuid.uuid4().hex[:12])
+        with self._lock:
+            self._jobs[job.job_id] = job
+        if self._store:
+            self._store.create(job.job_id, self.worker_id)
+
+        def mark_cancelled(future: Future[None]) -> None:
+            # Covers jobs cancelled before they started running; finished jobs keep their status
+            job.finish("cancelled")
+
+        job.future = asyncio.run_coroutine_threadsafe(self._run(job, run), self._loop)
+        job.future.add_done_callback(mark_cancelled)
+        logger.info(f"→ Job {job.job_id} submitted")
+        return job
+
+    def run_coroutine(self, coro: Coroutine[Any, Any, T]) -> Future[T]:
+        """Runs a coroutine on the job loop, next to the jobs and the tasks they attach to."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def get(self, job_id: str) -> AnalysisJob | StoredJob | None:
+        job_id = job_id.strip()
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self._store and self._store.get(job_id):
+            return StoredJob(job_id, self._store)
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if isinstance(job, StoredJob):
+            # The worker running the job picks the request up on its next sync
+            logger.info(f"→ Requesting cancellation of job {job.job_id}")
+            return self._store is not None and self._store.request_cancel(job.job_id)
+        if not job or job.finished or not job.future:
+            return False
+        logger.info(f"→ Cancelling job {job.job_id}")
+        job.future.cancel()
+        return True
+
+    async def _run(
+        self, job: AnalysisJob, run: Callable[[], AsyncGenerator[dict[str, Any], None]]
+    ) -> None:
+        job.status = "running"
+        sync_task: asyncio.Task | None = None
+        if self._store:
+            sync_task = asyncio.create_task(self._sync(job, asyncio.current_task()))
+        try:
+            async with aclosing(run()) as events:
+                async for event in events:
+                    job.publish(event)
+        except asyncio.CancelledError:
+            job.finish("cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"✗ Job {job.job_id} failed: {e}")
+            job.publish({"stage": "error", "status": "error", "data": str(e)})
+            job.finish("failed")
+        else:
+            failed = bool(job.events) and job.events[-1].get("stage") == "error"
+            job.finish("failed" if failed else "complete")
+        finally:
+            if sync_task:
+                sync_task.cancel()
+                await asyncio.to_thread(self._store_job, job)
+
+    async def _sync(self, job: AnalysisJob, run_task: asyncio.Task | None) -> None:
+        """Writes new events to the job store in batches and applies cancellation requests."""
+        assert self._store is not None
+        while True:
+            await asyncio.sleep(config.JOB_POLL_INTERVAL)
+            await asyncio.to_thread(self._store_job, job)
+            record = await asyncio.to_thread(self._store.get, job.job_id)
+            if record and record.cancel_requested and run_task:
+                logger.info(f"→ Job {job.job_id} cancelled from another worker")
+                run_task.cancel()
+                return
+
+    def _store_job(self, job: AnalysisJob) -> None:
+        assert self._store is not None
+        with self._store_lock:
+            events = job.events[job.stored_events :]
+            if events:
+                self._store.append_events(job.job_id, job.stored_events, events)
+                job.stored_events += len(events)
+            self._store.set_status(job.job_id, job.status)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            expired = [
+                job_id
+                for job_id, job in self._jobs.items()
+                if job.finished_at is not None and job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if self._store:
+            self._store.prune(cutoff)
+
+
+def get_job_manager() -> JobManager:
+    return JobManager(store=JobStore() if config.JOB_STORE_ENABLED else None)
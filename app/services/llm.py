@@ -4,24 +4,22 @@ from pathlib import Path
 from typing import Any
 
 from openai import AsyncOpenAI
+from pydantic import BaseModel
 
 from app.core.interfaces import LLMProvider
 from app.core.models import (
     AnalysisResult,
-    ComplaintsResponse,
-    DiagnosisResponse,
     DialogueTurn,
     DoctorEvaluation,
     EvaluationCriterion,
     GeneratedDialogue,
     GeneratedDialogueTurn,
     ImageAttachment,
-    ImageFindingsResponse,
     Medication,
-    MedicationsResponse,
     PrescriptionReview,
     StructuredData,
 )
+from app.services.metrics import track_upstream_call
 from config.logger import logger
 from config.prompts import get_image_analysis_prompt
 from config.settings import config
@@ -206,11 +204,12 @@ class OpenAILLM(LLMProvider):
             "Please analyze these medical images/documents.", system_prompt, images
         )
 
-        response = await self.client.chat.completions.create(
-            model=config.LLM_MODEL,
-            messages=messages,  # type: ignore[arg-type]
-            temperature=0.2,
-        )
+        with track_upstream_call("vision", "openai"):
+            response = await self.client.chat.completions.create(
+                model=config.LLM_MODEL,
+                messages=messages,  # type: ignore[arg-type]
+                temperature=0.2,
+            )
 
         result = response.choices[0].message.content
         logger.info("OpenAILLM: Image analysis complete")
@@ -296,177 +295,30 @@ class OpenAILLM(LLMProvider):
             raise ValueError("Failed to generate dialogue from LLM")
         return parsed_result
 
-    async def analyze_formatted_transcript_streaming(
-        self,
-        dialogue: list[DialogueTurn],
-        system_prompt: str,
-    ) -> Any:
-        dialogue_text = "\n".join([f"{turn.speaker}: {turn.text}" for turn in dialogue])
-
-        if not dialogue_text or not dialogue_text.strip():
-            raise ValueError("Cannot start streaming analysis: dialogue is empty")
-
-        logger.info("OpenAILLM: Starting formatted transcript streaming...")
-        logger.info(f"Dialogue text length: {len(dialogue_text)} chars")
-
-        stream = self.client.responses.stream(
-            model=config.LLM_MODEL,
-            input=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": dialogue_text},
-            ],
-            temperature=0.2,
-        )
-
-        return stream
-
-    async def inject_image_analysis_streaming(
-        self, previous_response_id: str, image_analysis: str
-    ) -> Any:
-        logger.info(
-            f"OpenAILLM: Injecting image analysis into conversation (previous_response_id={previous_response_id})..."
-        )
-
-        stream = self.client.responses.stream(
-            model=config.LLM_MODEL,
-            input=[
-                {
-                    "role": "user",
-                    "content": f"Additional context - Image/Document Analysis Report:\n{image_analysis}\n\nPlease acknowledge this information briefly.",
-                }
-            ],
-            temperature=0.2,
-            previous_response_id=previous_response_id,
-        )
-
-        return stream
-
-    async def analyze_complaints_streaming(
-        self,
-        previous_response_id: str,
-        system_prompt: str,
-    ) -> Any:
-        logger.info(
-            f"OpenAILLM: Starting complaints streaming with previous_response_id={previous_response_id}..."
-        )
-
-        stream = self.client.responses.stream(
-            model=config.LLM_MODEL,
-            input=[{"role": "user", "content": system_prompt}],
-            text_format=ComplaintsResponse,
-            temperature=0.2,
-            previous_response_id=previous_response_id,
-        )
-
-        return stream
-
-    async def analyze_diagnosis_streaming(
-        self,
-        previous_response_id: str,
-        system_prompt: str,
-    ) -> Any:
-        logger.info(
-            f"OpenAILLM: Starting diagnosis streaming with previous_response_id={previous_response_id}..."
-        )
-
-        stream = self.client.responses.stream(
-            model=config.LLM_MODEL,
-            input=[{"role": "user", "content": system_prompt}],
-            text_format=DiagnosisResponse,
-            temperature=0.2,
-            previous_response_id=previous_response_id,
-        )
-
-        return stream
-
-    async def analyze_medications_streaming(
-        self,
-        previous_response_id: str,
-        system_prompt: str,
-    ) -> Any:
-        logger.info(
-            f"OpenAILLM: Starting medications streaming with previous_response_id={previous_response_id}..."
-        )
-
-        stream = self.client.responses.stream(
-            model=config.LLM_MODEL,
-            input=[{"role": "user", "content": system_prompt}],
-            text_format=MedicationsResponse,
-            temperature=0.2,
-            previous_response_id=previous_response_id,
-        )
-
-        return stream
-
-    async def analyze_image_findings_streaming(
+    async def stream_response(
         self,
-        previous_response_id: str,
-        system_prompt: str,
+        input_messages: list[dict[str, Any]],
+        model: str | None = None,
+        temperature: float = 0.2,
+        previous_response_id: str | None = None,
+        text_format: type[BaseModel] | None = None,
     ) -> Any:
+        target_model = model or config.LLM_MODEL
         logger.info(
-            f"OpenAILLM: Starting image findings streaming with previous_response_id={previous_response_id}..."
+            f"OpenAILLM: Starting {target_model} stream with previous_response_id={previous_response_id}..."
         )
 
-        stream = self.client.responses.stream(
-            model=config.LLM_MODEL,
-            input=[{"role": "user", "content": system_prompt}],
-            text_format=ImageFindingsResponse,
-            temperature=0.2,
-            previous_response_id=previous_response_id,
-        )
-
-        return stream
-
-    async def analyze_recommendations_streaming(
-        self,
-        previous_response_id: str,
-        system_prompt: str,
-    ) -> Any:
-        logger.info(
-            f"OpenAILLM: Starting recommendations streaming with previous_response_id={previous_response_id}..."
-        )
+        kwargs: dict[str, Any] = {}
+        if previous_response_id:
+            kwargs["previous_response_id"] = previous_response_id
+        if text_format is not None:
+            kwargs["text_format"] = text_format
 
         stream = self.client.responses.stream(
-            model=config.LLM_MODEL,
-            input=[{"role": "user", "content": system_prompt}],
-            temperature=0.2,
-            previous_response_id=previous_response_id,
-        )
-
-        return stream
-
-    async def analyze_criteria_streaming(
-        self,
-        previous_response_id: str,
-        system_prompt: str,
-    ) -> Any:
-        logger.info(
-            f"OpenAILLM: Starting criteria streaming with previous_response_id={previous_response_id}..."
-        )
-
-        stream = self.client.responses.stream(
-            model=config.LLM_MODEL,
-            input=[{"role": "user", "content": system_prompt}],
-            temperature=0.2,
-            previous_response_id=previous_response_id,
-        )
-
-        return stream
-
-    async def analyze_general_comment_streaming(
-        self,
-        previous_response_id: str,
-        system_prompt: str,
-    ) -> Any:
-        logger.info(
-            f"OpenAILLM: Starting general comment streaming with previous_response_id={previous_response_id}..."
-        )
-
-        stream = self.client.responses.stream(
-            model=config.LLM_MODEL,
-            input=[{"role": "user", "content": system_prompt}],
-            temperature=0.2,
-            previous_response_id=previous_response_id,
+            model=target_model,
+            input=input_messages,  # type: ignore[arg-type]
+            temperature=temperature,
+            **kwargs,
         )
 
         return stream
@@ -0,0 +1,261 @@
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+
+from config.settings import config
+
+LabelValues = tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0)
+RATE_BUCKETS = (5.0, 10.0, 20.0, 40.0, 60.0, 80.0, 120.0, 160.0, 240.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(ABC):
+    type_name = ""
+
+    def __init__(self, name: str, description: str, label_names: Iterable[str] = ()) -> None:
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"Metric {self.name} expects labels {self.label_names}, got {labels}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type_name}"]
+        return lines + self._samples()
+
+    @abstractmethod
+    def _samples(self) -> list[str]:
+        """Sample lines of the metric in the Prometheus text format."""
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, description: str, label_names: Iterable[str] = ()) -> None:
+        super().__init__(name, description, label_names)
+        self._values: dict[LabelValues, float] = {}
+        if not self.label_names:
+            self._values[()] = 0.0
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Per label set: observation count per bucket (not cumulative), sum and total count
+        self._counts: dict[LabelValues, list[int]] = {}
+        self._sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * len(self.buckets)
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            snapshot = [
+                (key, list(counts), self._sums[key]) for key, counts in self._counts.items()
+            ]
+
+        lines: list[str] = []
+        for key, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, label_names: Iterable[str] = ()) -> Counter:
+        metric = Counter(name, description, label_names)
+        self.register(metric)
+        return metric
+
+    def gauge(self, name: str, description: str, label_names: Iterable[str] = ()) -> Gauge:
+        metric = Gauge(name, description, label_names)
+        self.register(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        label_names: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, description, label_names, buckets)
+        self.register(metric)
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: list[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+PREFIX = config.APP_NAME
+
+STAGE_TTFT = REGISTRY.histogram(
+    f"{PREFIX}_stage_ttft_seconds",
+    "Time from a pipeline stage start to its first output token",
+    ("pipeline", "stage"),
+)
+STAGE_DURATION = REGISTRY.histogram(
+    f"{PREFIX}_stage_duration_seconds",
+    "Total duration of a pipeline stage",
+    ("pipeline", "stage"),
+)
+STAGE_QUEUE_WAIT = REGISTRY.histogram(
+    f"{PREFIX}_stage_queue_wait_seconds",
+    "Time a ready pipeline stage waited for a concurrency slot",
+    ("pipeline", "stage"),
+)
+STAGE_TOKENS_PER_SECOND = REGISTRY.histogram(
+    f"{PREFIX}_stage_output_tokens_per_second",
+    "Output token rate of a pipeline stage after its first token",
+    ("pipeline", "stage"),
+    buckets=RATE_BUCKETS,
+)
+PIPELINE_DURATION = REGISTRY.histogram(
+    f"{PREFIX}_pipeline_duration_seconds",
+    "Total duration of an analysis pipeline run",
+    ("pipeline",),
+)
+STAGES_WAITING = REGISTRY.gauge(
+    f"{PREFIX}_pipeline_stages_waiting",
+    "Pipeline stages ready to run and waiting for a concurrency slot",
+)
+STAGES_RUNNING = REGISTRY.gauge(
+    f"{PREFIX}_pipeline_stages_running", "Pipeline stages currently streaming"
+)
+SESSIONS_IN_FLIGHT = REGISTRY.gauge(
+    f"{PREFIX}_analysis_sessions_in_flight", "Consultation analyses currently running"
+)
+UPSTREAM_DURATION = REGISTRY.histogram(
+    f"{PREFIX}_upstream_call_duration_seconds",
+    "Duration of STT, TTS and vision calls",
+    ("service", "provider"),
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    f"{PREFIX}_upstream_errors_total",
+    "Failed upstream calls by service and exception type",
+    ("service", "error_type"),
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    f"{PREFIX}_cache_requests_total",
+    "Cache and checkpoint lookups by result (hit or miss)",
+    ("cache", "result"),
+)
+TTS_CACHE_BYTES = REGISTRY.gauge(f"{PREFIX}_tts_cache_bytes", "Size of the synthesized audio cache")
+UPLOAD_BYTES = REGISTRY.counter(
+    f"{PREFIX}_upload_bytes_total", "Bytes of audio and image files uploaded", ("kind",)
+)
+
+
+@contextmanager
+def track_upstream_call(service: str, provider: str) -> Iterator[None]:
+    """Records the duration of an upstream call and counts it by exception type if it fails."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        UPSTREAM_ERRORS.inc(service=service, error_type=type(e).__name__)
+        raise
+    finally:
+        UPSTREAM_DURATION.observe(time.perf_counter() - started, service=service, provider=provider)
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_upload(kind: str, paths: Iterable[str]) -> None:
+    for path in paths:
+        if path and os.path.exists(path):
+            UPLOAD_BYTES.inc(os.path.getsize(path), kind=kind)
@@ -0,0 +1,944 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from contextlib import suppress
+from functools import partial
+from typing import Any, Literal
+
+from pydantic import BaseModel, Field, model_validator
+
+from app.core import models
+from app.core.models import (
+    AnalysisResult,
+    DialogueTurn,
+    DoctorEvaluation,
+    EvaluationCriterion,
+    PrescriptionReview,
+    StructuredData,
+)
+from app.services.checkpoints import CheckpointStore, hash_text
+from app.services.llm import OpenAILLM
+from app.services.metrics import (
+    PIPELINE_DURATION,
+    STAGE_DURATION,
+    STAGE_QUEUE_WAIT,
+    STAGE_TOKENS_PER_SECOND,
+    STAGE_TTFT,
+    STAGES_RUNNING,
+    STAGES_WAITING,
+    UPSTREAM_ERRORS,
+    record_cache_lookup,
+)
+from app.services.stream_events import AnalysisEventStream
+from app.services.stream_parsing import (
+    DelimitedItemTokenizer,
+    PartialJsonObjectParser,
+    parse_criterion,
+)
+from config.logger import logger
+from config.prompts import (
+    get_criteria_results_context,
+    get_criteria_streaming_prompt,
+    get_image_report_context,
+    get_stage_results_context,
+    get_streaming_prompt,
+    get_transcript_chunk_context,
+)
+from config.settings import config
+
+
+class ModelProfile(BaseModel):
+    model: str | None = None
+    temperature: float = 0.2
+
+
+class StageSpec(BaseModel):
+    name: str
+    prompt: str
+    input: Literal["dialogue", "dialogue_stream", "raw_dialogue"] | None = None
+    depends_on: list[str] = Field(default_factory=list)
+    profile: str = "default"
+    parser: Literal["text", "items", "criteria", "structured", "partial_json"] = "text"
+    response_format: str | None = None
+    field: str | None = None
+    events: list[str] | None = None
+    skip_items: list[str] = Field(default_factory=list)
+    include_image_report: bool = False
+    group_size: int | None = Field(default=None, ge=1)
+
+    @property
+    def event_stages(self) -> list[str]:
+        return [self.name] if self.events is None else self.events
+
+    @property
+    def response_model(self) -> type[BaseModel] | None:
+        response_model = getattr(models, self.response_format or "", None)
+        if isinstance(response_model, type) and issubclass(response_model, BaseModel):
+            return response_model
+        return None
+
+    @model_validator(mode="after")
+    def _check_inputs(self) -> "StageSpec":
+        if self.input is None and not self.depends_on:
+            raise ValueError(f"Stage '{self.name}' needs either an input or depends_on")
+        if self.input is not None and self.depends_on:
+            # The conversation it continues already holds the dialogue
+            raise ValueError(f"Stage '{self.name}' cannot have both an input and depends_on")
+        if self.input == "dialogue_stream" and self.parser != "text":
+            raise ValueError(f"Stage '{self.name}' with dialogue_stream input must be a text root")
+        if self.parser in ("structured", "partial_json") and not self.response_format:
+            raise ValueError(f"Stage '{self.name}' needs a response_format for its parser")
+        if self.response_format and self.response_model is None:
+            raise ValueError(
+                f"Stage '{self.name}' has an unknown response_format '{self.response_format}'"
+            )
+        if self.parser == "structured" and not self.field:
+            raise ValueError(f"Stage '{self.name}' needs a field for the structured parser")
+        if self.group_size and (self.parser != "criteria" or self.input == "dialogue_stream"):
+            raise ValueError(
+                f"Stage '{self.name}' can only set group_size with the criteria parser"
+            )
+        return self
+
+
+class PipelineSpec(BaseModel):
+    name: str
+    stages: list[StageSpec]
+    profiles: dict[str, ModelProfile]
+
+    @model_validator(mode="after")
+    def _check_graph(self) -> "PipelineSpec":
+        names = [stage.name for stage in self.stages]
+        streamed = {stage.name: stage.input == "dialogue_stream" for stage in self.stages}
+        if len(names) != len(set(names)):
+            raise ValueError(f"Pipeline '{self.name}' has duplicate stage names")
+
+        for stage in self.stages:
+            if stage.profile not in self.profiles:
+                raise ValueError(f"Stage '{stage.name}' uses unknown profile '{stage.profile}'")
+            for dependency in stage.depends_on:
+                if dependency not in names:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown '{dependency}'")
+            if stage.depends_on and streamed.get(stage.depends_on[0]):
+                # Its conversation holds only the last dialogue chunk
+                raise ValueError(
+                    f"Stage '{stage.name}' cannot continue the conversation of a dialogue_stream stage"
+                )
+
+        # Kahn's algorithm: every stage must become ready at some point
+        remaining = {stage.name: set(stage.depends_on) for stage in self.stages}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Pipeline '{self.name}' has a dependency cycle")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return self
+
+
+def load_pipeline(mode: str | None = None) -> PipelineSpec:
+    name = mode or config.ANALYSIS_PIPELINE_MODE
+    pipelines = config.ANALYSIS_PIPELINES.get("pipelines", {})
+    if name not in pipelines:
+        raise ValueError(f"Unknown analysis pipeline: {name}")
+
+    return PipelineSpec(
+        name=name,
+        stages=pipelines[name],
+        profiles=config.ANALYSIS_PIPELINES.get("profiles", {"default": {}}),
+    )
+
+
+class StageTiming(BaseModel):
+    pipeline_started: float = 0.0
+    queued: float = 0.0
+    started: float = 0.0
+    first_token: float | None = None
+    finished: float = 0.0
+
+    # Model requests on the dependency chain up to and including this stage
+    depth: int = 1
+    output_tokens: int = 0
+
+    @property
+    def start(self) -> float:
+        return self.started - self.pipeline_started
+
+    @property
+    def wait(self) -> float:
+        return self.started - self.queued
+
+    @property
+    def ttft(self) -> float | None:
+        return None if self.first_token is None else self.first_token - self.started
+
+    @property
+    def total(self) -> float:
+        return self.finished - self.started
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        if self.first_token is None or not self.output_tokens:
+            return None
+        generation = self.finished - self.first_token
+        return self.output_tokens / generation if generation > 0 else None
+
+    def summary(self) -> dict[str, float | None]:
+        return {
+            "start": self.start,
+            "wait": self.wait,
+            "ttft": self.ttft,
+            "total": self.total,
+            "depth": self.depth,
+            "tokens_per_second": self.tokens_per_second,
+        }
+
+
+class StageResult(BaseModel):
+    name: str
+    response_id: str
+    outputs: dict[str, Any] = Field(default_factory=dict)
+    depth: int = 0
+    restored: bool = False
+    # Added to the input of dependent stages when the conversation does not hold all outputs
+    context: str | None = None
+    # Outputs as text, added to the input of stages that continue another dependency
+    summary: str | None = None
+
+
+class StageOutputParser(ABC):
+    """Turns a stage's streamed deltas and final response into outputs and UI events."""
+
+    def __init__(self, spec: StageSpec, events: AnalysisEventStream) -> None:
+        self.spec = spec
+        self.events = events
+        self.outputs: dict[str, Any] = {}
+        self._reported: set[str] = set()
+
+    def starting(self) -> list[dict[str, Any]]:
+        return [self.events.event(stage, "starting") for stage in self.spec.event_stages]
+
+    def feed(self, delta: str) -> list[dict[str, Any]]:
+        return []
+
+    @abstractmethod
+    def close(self, final_response: Any) -> None:
+        """Sets the final outputs from the completed response."""
+
+    def completion(self) -> list[dict[str, Any]]:
+        # Events are numbered on creation, so they are built right before they are queued
+        updates: list[dict[str, Any]] = []
+        for stage, value in self.outputs.items():
+            if stage in self._reported:
+                continue
+            self._reported.add(stage)
+            if stage in self.spec.event_stages:
+                updates.extend(self._completion_events(stage, value))
+        return updates
+
+    def load(self, stage: str, value: Any) -> Any:
+        return value
+
+    def restore(self, outputs: dict[str, Any]) -> list[dict[str, Any]]:
+        for stage, value in outputs.items():
+            self.outputs[stage] = self.load(stage, value)
+        return self.completion()
+
+    def _completion_events(self, stage: str, value: Any) -> list[dict[str, Any]]:
+        return [self.events.event(stage, "complete", value)]
+
+
+class TextOutputParser(StageOutputParser):
+    def __init__(self, spec: StageSpec, events: AnalysisEventStream) -> None:
+        super().__init__(spec, events)
+        self._text = ""
+
+    def feed(self, delta: str) -> list[dict[str, Any]]:
+        self._text += delta
+        return [
+            update
+            for stage in self.spec.event_stages
+            for update in self.events.append_text(stage, delta, self._text)
+        ]
+
+    def close(self, final_response: Any) -> None:
+        self.outputs[self.spec.name] = self._text
+
+
+class ItemsOutputParser(StageOutputParser):
+    def __init__(self, spec: StageSpec, events: AnalysisEventStream) -> None:
+        super().__init__(spec, events)
+        self._tokenizer = DelimitedItemTokenizer()
+        self._skip = {item.lower() for item in spec.skip_items}
+        self._items: list[Any] = []
+
+    def parse(self, items: list[str]) -> list[Any]:
+        return [item for item in items if item.lower() not in self._skip]
+
+    def feed(self, delta: str) -> list[dict[str, Any]]:
+        new_items = self.parse(self._tokenizer.feed(delta))
+        if not new_items:
+            return []
+        self._items.extend(new_items)
+        return [
+            update
+            for stage in self.spec.event_stages
+            for update in self.events.add_items(stage, new_items, self._items)
+        ]
+
+    def close(self, final_response: Any) -> None:
+        self._items.extend(self.parse(self._tokenizer.flush()))
+        self.outputs[self.spec.name] = self._items
+
+
+class CriteriaOutputParser(ItemsOutputParser):
+    def __init__(self, spec: StageSpec, events: AnalysisEventStream) -> None:
+        super().__init__(spec, events)
+        self._order = {name: index for index, name in enumerate(config.EVALUATION_CRITERIA)}
+        self._group_tokenizers: dict[int, DelimitedItemTokenizer] = {}
+
+    def parse(self, items: list[str]) -> list[Any]:
+        return [criterion for criterion in map(parse_criterion, items) if criterion]
+
+    def feed_group(self, group: int, delta: str) -> list[dict[str, Any]]:
+        """Feeds the stream of one criteria group, evaluated concurrently with the others."""
+        tokenizer = self._group_tokenizers.setdefault(group, DelimitedItemTokenizer())
+        return self._add_in_order(self.parse(tokenizer.feed(delta)))
+
+    def close_group(self, group: int) -> list[dict[str, Any]]:
+        tokenizer = self._group_tokenizers.pop(group, DelimitedItemTokenizer())
+        return self._add_in_order(self.parse(tokenizer.flush()))
+
+    def _add_in_order(self, criteria: list[EvaluationCriterion]) -> list[dict[str, Any]]:
+        if not criteria:
+            return []
+        # Groups finish in any order; the cards keep the order of the criteria config
+        self._items.extend(criteria)
+        self._items.sort(key=lambda criterion: self._order.get(criterion.name, len(self._order)))
+        return [
+            self.events.event(stage, "streaming", list(self._items))
+            for stage in self.spec.event_stages
+        ]
+
+    def load(self, stage: str, value: Any) -> Any:
+        return [EvaluationCriterion.model_validate(criterion) for criterion in value]
+
+
+def get_parsed_response(final_response: Any) -> Any:
+    if final_response.output:
+        for message in final_response.output:
+            if hasattr(message, "content"):
+                for content in message.content:
+                    if getattr(content, "parsed", None) is not None:
+                        return content.parsed
+    return None
+
+
+class StructuredOutputParser(StageOutputParser):
+    def close(self, final_response: Any) -> None:
+        assert self.spec.field is not None and self.spec.response_model is not None
+        parsed = get_parsed_response(final_response) or self.spec.response_model()
+        self.outputs[self.spec.name] = getattr(parsed, self.spec.field)
+
+    def load(self, stage: str, value: Any) -> Any:
+        assert self.spec.response_model is not None
+        return getattr(self.spec.response_model.model_validate({stage: value}), stage)
+
+    def _completion_events(self, stage: str, value: Any) -> list[dict[str, Any]]:
+        return [
+            self.events.event(stage, "streaming", value),
+            self.events.event(stage, "complete", value),
+        ]
+
+
+class PartialJsonOutputParser(StructuredOutputParser):
+    """Emits each field of a streamed structured response as its own stage once it is closed."""
+
+    def __init__(self, spec: StageSpec, events: AnalysisEventStream) -> None:
+        super().__init__(spec, events)
+        assert spec.response_model is not None
+        self._response_model = spec.response_model
+        self._parser = PartialJsonObjectParser()
+
+    def feed(self, delta: str) -> list[dict[str, Any]]:
+        for field, value in self._parser.feed(delta):
+            if field not in self._response_model.model_fields:
+                continue
+            logger.info(f"→ {self.spec.name} field complete: {field}")
+            self.outputs[field] = self.load(field, value)
+        return self.completion()
+
+    def close(self, final_response: Any) -> None:
+        parsed = get_parsed_response(final_response) or self._response_model()
+        # Fields the partial parser could not emit are taken from the final parsed response
+        for field in self._response_model.model_fields:
+            if field not in self.outputs:
+                self.outputs[field] = getattr(parsed, field)
+
+
+OUTPUT_PARSERS: dict[str, type[StageOutputParser]] = {
+    "text": TextOutputParser,
+    "items": ItemsOutputParser,
+    "criteria": CriteriaOutputParser,
+    "structured": StructuredOutputParser,
+    "partial_json": PartialJsonOutputParser,
+}
+
+
+def format_output_item(item: Any) -> str:
+    if isinstance(item, EvaluationCriterion):
+        return f"{item.name}: {item.score}/5. {item.comment}"
+    if isinstance(item, BaseModel):
+        return ", ".join(
+            f"{key}: {value}" for key, value in item.model_dump(exclude_none=True).items()
+        )
+    return str(item)
+
+
+def format_stage_outputs(outputs: dict[str, Any]) -> str:
+    sections = []
+    for name, value in outputs.items():
+        if isinstance(value, list):
+            text = "\n".join(f"- {format_output_item(item)}" for item in value)
+        else:
+            text = str(value or "")
+        sections.append(f"{name}:\n{text or 'none'}")
+    return "\n\n".join(sections)
+
+
+def format_dialogue(turns: list[DialogueTurn]) -> str:
+    return "\n".join([f"{turn.speaker}: {turn.text}" for turn in turns])
+
+
+class DialogueFeed:
+    """Dialogue turns of a consultation that become available while the audio is transcribed."""
+
+    def __init__(self) -> None:
+        self.turns: list[DialogueTurn] = []
+        self.closed = False
+        self._error: BaseException | None = None
+        self._changed = asyncio.Condition()
+
+    @classmethod
+    def from_turns(cls, turns: list[DialogueTurn]) -> "DialogueFeed":
+        feed = cls()
+        feed.turns = list(turns)
+        feed.closed = True
+        return feed
+
+    async def extend(self, turns: list[DialogueTurn]) -> None:
+        async with self._changed:
+            self.turns.extend(turns)
+            self._changed.notify_all()
+
+    async def close(self, error: BaseException | None = None) -> None:
+        async with self._changed:
+            self.closed = True
+            self._error = error
+            self._changed.notify_all()
+
+    async def pump(self, batches: AsyncIterator[list[DialogueTurn]]) -> None:
+        try:
+            async for turns in batches:
+                await self.extend(turns)
+        except Exception as e:
+            await self.close(e)
+            raise
+        await self.close()
+
+    async def wait_closed(self) -> list[DialogueTurn]:
+        await self._wait_for(lambda: self.closed)
+        return self.turns
+
+    async def chunks(self, max_turns: int) -> AsyncIterator[list[DialogueTurn]]:
+        # While the transcription runs, each chunk takes up to max_turns of the turns that arrived
+        # while the previous one was processed; once it is done, the rest goes in one chunk
+        position = 0
+        while True:
+            await self._wait_for(lambda: self.closed or len(self.turns) > position)
+            if position >= len(self.turns):
+                return
+            end = len(self.turns) if self.closed else position + max_turns
+            chunk = self.turns[position:end]
+            position += len(chunk)
+            yield chunk
+
+    async def _wait_for(self, predicate: Callable[[], bool]) -> None:
+        async with self._changed:
+            await self._changed.wait_for(lambda: predicate() or self._error is not None)
+        if self._error is not None:
+            raise ValueError(f"Transcription failed: {self._error}")
+
+
+class StagePipeline:
+    """Runs a declared stage graph, starting every stage as soon as its dependencies complete."""
+
+    def __init__(
+        self,
+        spec: PipelineSpec,
+        llm: OpenAILLM,
+        events: AnalysisEventStream,
+        max_concurrency: int | None = None,
+        checkpoints: CheckpointStore | None = None,
+    ) -> None:
+        self.spec = spec
+        self.events = events
+        self.timings: dict[str, StageTiming] = {}
+        self._llm = llm
+        self._checkpoints = checkpoints
+        self._stage_keys: dict[str, str] = {}
+        self._dialogue = DialogueFeed()
+        self._image_report: str | asyncio.Future[str] | None = None
+        self._raw_transcript: str | asyncio.Future[str] | None = None
+        self._pipeline_started = 0.0
+        self._semaphore = asyncio.Semaphore(max_concurrency or config.PIPELINE_MAX_CONCURRENCY)
+
+    async def run(
+        self,
+        transcript: list[DialogueTurn] | AsyncIterator[list[DialogueTurn]],
+        image_report: str | asyncio.Future[str] | None = None,
+        raw_transcript: str | asyncio.Future[str] | None = None,
+    ) -> AsyncGenerator[dict[str, Any], None]:
+        """Runs the pipeline on a complete transcript or on turn batches as they are transcribed.
+
+        The image report may be a future that resolves while the first stages already run. The
+        raw transcript, without speakers, feeds the raw_dialogue stages before the diarized
+        dialogue is complete.
+        """
+        logger.info(f"Running '{self.spec.name}' pipeline with {len(self.spec.stages)} stages")
+
+        self._image_report = image_report
+        self._raw_transcript = raw_transcript
+        pump_task: asyncio.Task | None = None
+        if isinstance(transcript, list):
+            self._dialogue = DialogueFeed.from_turns(transcript)
+            await self._get_dialogue_text()
+        else:
+            self._dialogue = DialogueFeed()
+            pump_task = asyncio.create_task(
+                self._dialogue.pump(transcript), name="transcription_feed"
+            )
+
+        queue: asyncio.Queue[tuple[str, Any]] = asyncio.Queue()
+        if isinstance(image_report, asyncio.Future):
+            image_report.add_done_callback(partial(self._report_future, "image_report", queue))
+        # The raw transcript is shown as a preview until the diarized transcript is formatted
+        if isinstance(raw_transcript, asyncio.Future):
+            raw_transcript.add_done_callback(
+                partial(self._report_future, "transcript_preview", queue)
+            )
+        elif raw_transcript:
+            queue.put_nowait(
+                ("event", self.events.event("transcript_preview", "complete", raw_transcript))
+            )
+        pending = {stage.name: stage for stage in self.spec.stages}
+        running: dict[str, asyncio.Task] = {}
+        results: dict[str, StageResult] = {}
+        self._pipeline_started = time.perf_counter()
+
+        def mark_done(name: str, task: asyncio.Task) -> None:
+            queue.put_nowait(("done", name))
+
+        def start_ready_stages() -> None:
+            for name, stage in list(pending.items()):
+                if all(dependency in results for dependency in stage.depends_on):
+                    del pending[name]
+                    task = asyncio.create_task(
+                        self._run_stage(stage, results, queue), name=f"stage_{name}"
+                    )
+                    task.add_done_callback(partial(mark_done, name))
+                    running[name] = task
+
+        try:
+            start_ready_stages()
+            while running:
+                kind, payload = await queue.get()
+                if kind == "event":
+                    yield payload
+                    continue
+
+                # A stage's events are queued before its done marker, so they are already yielded
+                task = running.pop(payload)
+                results[payload] = task.result()
+                start_ready_stages()
+
+        finally:
+            tasks = list(running.values())
+            if pump_task:
+                tasks.append(pump_task)
+            for task in tasks:
+                task.cancel()
+            for task in tasks:
+                with suppress(asyncio.CancelledError, Exception):
+                    await task
+
+        total = time.perf_counter() - self._pipeline_started
+        PIPELINE_DURATION.observe(total, pipeline=self.spec.name)
+        logger.info(f"✓ Pipeline '{self.spec.name}' finished in {total:.2f}s")
+        for name, timing in self.timings.items():
+            ttft = f"{timing.ttft:.2f}s" if timing.ttft is not None else "n/a"
+            logger.info(
+                f"  {name}: start={timing.start:.2f}s wait={timing.wait:.2f}s ttft={ttft} "
+                f"total={timing.total:.2f}s depth={timing.depth}"
+            )
+
+        outputs: dict[str, Any] = {}
+        for result in results.values():
+            outputs.update(result.outputs)
+
+        final_event = self.events.event("complete", "complete", self.build_result(outputs))
+        final_event["timings"] = {
+            name: timing.summary() for name, timing in self.timings.items()
+        } | {"pipeline": {"total": total}}
+        yield final_event
+
+    def _report_future(
+        self, stage: str, queue: asyncio.Queue[tuple[str, Any]], future: asyncio.Future[str]
+    ) -> None:
+        if not future.cancelled() and future.exception() is None:
+            queue.put_nowait(("event", self.events.event(stage, "complete", future.result())))
+
+    async def _run_stage(
+        self,
+        stage: StageSpec,
+        results: dict[str, StageResult],
+        queue: asyncio.Queue[tuple[str, Any]],
+    ) -> StageResult:
+        dependencies = [results[dependency] for dependency in stage.depends_on]
+        depth = 1 + max((dependency.depth for dependency in dependencies), default=0)
+
+        # A stage that formats the dialogue while it is transcribed cannot wait for its cache key
+        if self._checkpoints and (stage.input != "dialogue_stream" or self._dialogue.closed):
+            key = await self._stage_key(stage)
+            checkpoint = await asyncio.to_thread(self._checkpoints.get, key, stage.name)
+            record_cache_lookup("stage", bool(checkpoint and checkpoint.response_id))
+            if checkpoint and checkpoint.response_id:
+                logger.info(f"→ Replaying {stage.name} stage from cache ({key[:12]})")
+                parser = OUTPUT_PARSERS[stage.parser](stage, self.events)
+                for update in parser.restore(checkpoint.outputs):
+                    queue.put_nowait(("event", update))
+                return StageResult(
+                    name=stage.name,
+                    response_id=checkpoint.response_id,
+                    outputs=parser.outputs,
+                    restored=True,
+                    context=self._stage_context(stage, parser.outputs),
+                    summary=format_stage_outputs(parser.outputs),
+                )
+
+        timing = StageTiming(
+            pipeline_started=self._pipeline_started, queued=time.perf_counter(), depth=depth
+        )
+        self.timings[stage.name] = timing
+
+        STAGES_WAITING.inc()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            STAGES_WAITING.dec()
+        STAGES_RUNNING.inc()
+        try:
+            result = await self._execute_stage(stage, dependencies, depth, timing, queue)
+        except Exception as e:
+            UPSTREAM_ERRORS.inc(service="llm", error_type=type(e).__name__)
+            raise
+        finally:
+            STAGES_RUNNING.dec()
+            self._semaphore.release()
+
+        labels = {"pipeline": self.spec.name, "stage": stage.name}
+        STAGE_QUEUE_WAIT.observe(timing.wait, **labels)
+        STAGE_DURATION.observe(timing.total, **labels)
+        if timing.ttft is not None:
+            STAGE_TTFT.observe(timing.ttft, **labels)
+        if timing.tokens_per_second is not None:
+            STAGE_TOKENS_PER_SECOND.observe(timing.tokens_per_second, **labels)
+        return result
+
+    async def _execute_stage(
+        self,
+        stage: StageSpec,
+        dependencies: list[StageResult],
+        depth: int,
+        timing: StageTiming,
+        queue: asyncio.Queue[tuple[str, Any]],
+    ) -> StageResult:
+        timing.started = time.perf_counter()
+        logger.info(f"→ Starting {stage.name} stage")
+
+        parser = OUTPUT_PARSERS[stage.parser](stage, self.events)
+        for update in parser.starting():
+            queue.put_nowait(("event", update))
+
+        if stage.input == "dialogue_stream":
+            response_id = await self._run_chunked_stage(stage, parser, timing, queue)
+            final_response = None
+        elif stage.group_size:
+            assert isinstance(parser, CriteriaOutputParser)
+            response_id = await self._run_grouped_stage(stage, parser, dependencies, timing, queue)
+            final_response = None
+        else:
+            final_response = await self._stream_stage(
+                stage,
+                parser.feed,
+                await self._build_input(stage, dependencies),
+                dependencies[0].response_id if dependencies else None,
+                timing,
+                queue,
+            )
+            response_id = final_response.id
+
+        parser.close(final_response)
+        timing.finished = time.perf_counter()
+        logger.info(f"→ {stage.name} complete in {timing.total:.2f}s")
+
+        # Cache before reporting completion so a completed stage is never re-run
+        if self._checkpoints:
+            await asyncio.to_thread(
+                self._checkpoints.save,
+                await self._stage_key(stage),
+                stage.name,
+                parser.outputs,
+                response_id,
+            )
+        for update in parser.completion():
+            queue.put_nowait(("event", update))
+        return StageResult(
+            name=stage.name,
+            response_id=response_id,
+            outputs=parser.outputs,
+            depth=depth,
+            context=self._stage_context(stage, parser.outputs),
+            summary=format_stage_outputs(parser.outputs),
+        )
+
+    async def _stream_stage(
+        self,
+        stage: StageSpec,
+        feed: Callable[[str], list[dict[str, Any]]],
+        input_messages: list[dict[str, Any]],
+        previous_response_id: str | None,
+        timing: StageTiming,
+        queue: asyncio.Queue[tuple[str, Any]],
+    ) -> Any:
+        profile = self.spec.profiles[stage.profile]
+        stream_manager = await self._llm.stream_response(
+            input_messages=input_messages,
+            model=profile.model,
+            temperature=profile.temperature,
+            previous_response_id=previous_response_id,
+            text_format=stage.response_model,
+        )
+
+        async with stream_manager as stream:
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    if hasattr(event, "delta") and event.delta:
+                        if timing.first_token is None:
+                            timing.first_token = time.perf_counter()
+                        for update in feed(event.delta):
+                            queue.put_nowait(("event", update))
+                elif event.type == "response.completed":
+                    logger.info(f"→ {stage.name} stream completed")
+
+            final_response = await stream.get_final_response()
+            usage = getattr(final_response, "usage", None)
+            timing.output_tokens += getattr(usage, "output_tokens", 0) or 0
+            if not final_response.id:
+                raise ValueError(f"Failed to get response_id from {stage.name} stage")
+        return final_response
+
+    async def _run_chunked_stage(
+        self,
+        stage: StageSpec,
+        parser: StageOutputParser,
+        timing: StageTiming,
+        queue: asyncio.Queue[tuple[str, Any]],
+    ) -> str:
+        prompt = get_streaming_prompt(stage.prompt)
+        response_id = ""
+        formatted: list[DialogueTurn] = []
+
+        async for chunk in self._dialogue.chunks(config.TRANSCRIPT_CHUNK_MAX_TURNS):
+            logger.info(f"→ {stage.name}: formatting {len(chunk)} new turns")
+            input_messages = [{"role": "system", "content": prompt}]
+            if formatted:
+                context = format_dialogue(formatted[-config.TRANSCRIPT_CHUNK_CONTEXT_TURNS :])
+                input_messages.append(
+                    {"role": "user", "content": get_transcript_chunk_context(context)}
+                )
+                for update in parser.feed("<br>"):
+                    queue.put_nowait(("event", update))
+            input_messages.append({"role": "user", "content": format_dialogue(chunk)})
+
+            final_response = await self._stream_stage(
+                stage, parser.feed, input_messages, None, timing, queue
+            )
+            response_id = final_response.id
+            formatted.extend(chunk)
+
+        await self._get_dialogue_text()
+        return response_id
+
+    async def _run_grouped_stage(
+        self,
+        stage: StageSpec,
+        parser: CriteriaOutputParser,
+        dependencies: list[StageResult],
+        timing: StageTiming,
+        queue: asyncio.Queue[tuple[str, Any]],
+    ) -> str:
+        """Evaluates groups of criteria concurrently from the same conversation context."""
+        assert stage.group_size is not None
+        names = list(config.EVALUATION_CRITERIA)
+        groups = [names[i : i + stage.group_size] for i in range(0, len(names), stage.group_size)]
+        if not groups:
+            raise ValueError(f"No evaluation criteria configured for {stage.name} stage")
+
+        logger.info(f"→ {stage.name}: evaluating {len(names)} criteria in {len(groups)} groups")
+        semaphore = asyncio.Semaphore(config.CRITERIA_MAX_CONCURRENCY)
+
+        async def run_group(index: int, criteria: list[str]) -> str:
+            async with semaphore:
+                final_response = await self._stream_stage(
+                    stage,
+                    partial(parser.feed_group, index),
+                    await self._build_input(
+                        stage, dependencies, get_criteria_streaming_prompt(criteria)
+                    ),
+                    dependencies[0].response_id if dependencies else None,
+                    timing,
+                    queue,
+                )
+            for update in parser.close_group(index):
+                queue.put_nowait(("event", update))
+            return str(final_response.id)
+
+        tasks = [
+            asyncio.create_task(run_group(index, criteria), name=f"{stage.name}_group_{index}")
+            for index, criteria in enumerate(groups)
+        ]
+        try:
+            response_ids = await asyncio.gather(*tasks)
+        finally:
+            # A failed group stops the others, and their streams are closed before the stage ends
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        # Each group's conversation holds the shared context; dependent stages get all results
+        # through the stage context
+        return response_ids[0]
+
+    async def _get_dialogue_text(self) -> str:
+        dialogue_text = format_dialogue(await self._dialogue.wait_closed())
+        if not dialogue_text or not dialogue_text.strip():
+            raise ValueError("Cannot start streaming analysis: dialogue is empty")
+        return dialogue_text
+
+    async def _get_raw_dialogue_text(self) -> str:
+        """The raw transcript, or the diarized dialogue when there is no usable raw transcript."""
+        raw_transcript = self._raw_transcript
+        if isinstance(raw_transcript, asyncio.Future):
+            try:
+                raw_transcript = await raw_transcript
+            except Exception as e:
+                logger.warning(f"Raw transcript failed, using the diarized dialogue: {e}")
+                raw_transcript = None
+        if not raw_transcript or not raw_transcript.strip():
+            return await self._get_dialogue_text()
+        return raw_transcript
+
+    async def _get_input_text(self, stage: StageSpec) -> str:
+        if stage.input == "raw_dialogue":
+            return await self._get_raw_dialogue_text()
+        return await self._get_dialogue_text()
+
+    async def _get_image_report(self) -> str | None:
+        if isinstance(self._image_report, asyncio.Future):
+            return await self._image_report
+        return self._image_report
+
+    async def _stage_key(self, stage: StageSpec) -> str:
+        """Hashes everything a stage's output depends on, so only stages whose inputs changed run.
+
+        Dependencies are complete before a stage runs, so their keys are already known.
+        """
+        if stage.name not in self._stage_keys:
+            profile = self.spec.profiles[stage.profile]
+            dialogue = await self._get_input_text(stage) if stage.input else None
+            report = await self._get_image_report() if stage.include_image_report else None
+            self._stage_keys[stage.name] = hash_text(
+                stage.model_dump_json(),
+                # Prompts are built from config, so this covers criteria.yaml changes as well
+                get_streaming_prompt(stage.prompt),
+                profile.model or config.LLM_MODEL,
+                str(profile.temperature),
+                dialogue,
+                report,
+                *(self._stage_keys[dependency] for dependency in stage.depends_on),
+            )
+        return self._stage_keys[stage.name]
+
+    async def _build_input(
+        self,
+        stage: StageSpec,
+        dependencies: list[StageResult] | None = None,
+        prompt: str | None = None,
+    ) -> list[dict[str, Any]]:
+        prompt = prompt or get_streaming_prompt(stage.prompt)
+        report = await self._get_image_report() if stage.include_image_report else None
+
+        if stage.input in ("dialogue", "raw_dialogue"):
+            messages = [{"role": "system", "content": prompt}]
+            if report:
+                # Sent with the first request so later stages see it without an extra round trip
+                logger.info(f"→ Attaching image report to {stage.name} input ({len(report)} chars)")
+                messages.append({"role": "user", "content": get_image_report_context(report)})
+            messages.append({"role": "user", "content": await self._get_input_text(stage)})
+            return messages
+
+        # The conversation continued is the first dependency's; the others are added as text
+        dependencies = dependencies or []
+        parent = dependencies[0] if dependencies else None
+        summaries = "\n\n".join(other.summary for other in dependencies[1:] if other.summary)
+        if summaries:
+            prompt = f"{get_stage_results_context(summaries)}\n\n{prompt}"
+        if parent and parent.context:
+            prompt = f"{parent.context}\n\n{prompt}"
+        if report:
+            prompt = f"{get_image_report_context(report)}\n\n{prompt}"
+        return [{"role": "user", "content": prompt}]
+
+    @staticmethod
+    def _stage_context(stage: StageSpec, outputs: dict[str, Any]) -> str | None:
+        if not stage.group_size:
+            return None
+        evaluation = "\n".join(
+            f"- {criterion.name}: {criterion.score}/5. {criterion.comment}"
+            for criterion in outputs.get(stage.name, [])
+        )
+        return get_criteria_results_context(evaluation)
+
+    @staticmethod
+    def build_result(outputs: dict[str, Any]) -> AnalysisResult:
+        recommendations = outputs.get("recommendations", [])
+        return AnalysisResult(
+            structured_data=StructuredData(
+                complaints=outputs.get("complaints", []),
+                diagnosis=outputs.get("diagnosis"),
+                medications=outputs.get("medications", []),
+                image_findings=outputs.get("image_findings", []),
+            ),
+            prescription_review=PrescriptionReview(
+                status="ok" if not recommendations else "warning",
+                recommendations=recommendations,
+            ),
+            doctor_evaluation=DoctorEvaluation(
+                criteria=outputs.get("criteria", []),
+                general_comment=outputs.get("general_comment", ""),
+            ),
+            formatted_transcript=outputs.get("transcript", ""),
+        )
@@ -1,12 +1,29 @@
 import asyncio
-import re
+import time
 import uuid
+from collections.abc import AsyncGenerator
+from contextlib import aclosing
+from functools import partial
 from pathlib import Path
 
-from app.core.models import AnalysisResult, DialogueTurn, GeneratedDialogue, ImageAttachment
+from app.core.models import (
+    AnalysisResult,
+    DialogueAudioIndex,
+    DialogueAudioTurn,
+    DialogueTurn,
+    GeneratedDialogue,
+    ImageAttachment,
+)
+from app.services.audio import (
+    OrderedAudioWriter,
+    audio_index_path,
+    mp3_playback_chunks,
+    ordered_streams,
+)
+from app.services.audio_library import DialogueAudioLibrary
 from app.services.llm import get_llm_provider
 from app.services.stt import get_stt_provider
-from app.services.tts import get_tts_provider
+from app.services.tts import get_tts_provider, split_sentences
 from config.logger import logger
 from config.prompts import get_analysis_prompt, get_dialogue_generation_prompt
 from config.settings import config
@@ -73,42 +90,99 @@ class MedicalSessionService:
 
     async def generate_voice_recommendations(self, recommendations: list[str]) -> str:
         logger.info(f"Generating voice recommendations for {len(recommendations)} items.")
-        text_to_speak = "Рекомендации по назначению: " + ". ".join(recommendations)
-        filename = f"recs_{uuid.uuid4()}.mp3"
-        output_path = config.TEMP_DIR / filename
+        # The heading and each recommendation are separate requests, cached on their own
+        parts = ["Рекомендации по назначению:"] + self._sentences(". ".join(recommendations))
+        output_path = config.TEMP_DIR / f"recs_{uuid.uuid4()}.mp3"
 
-        audio_file = await self._tts.speak(text_to_speak, str(output_path))
-        logger.info(f"Audio generated at: {audio_file}")
-        return audio_file
+        await self._write_speech([(part, None) for part in parts], output_path)
+        logger.info(f"Audio generated at: {output_path}")
+        return str(output_path)
 
     async def text_to_speech(self, text: str, voice: str | None = None) -> str:
         logger.info(f"Generating speech for text (length: {len(text)})...")
         filename = f"speech_{uuid.uuid4().hex[:8]}.mp3"
         output_path = config.TEMP_DIR / filename
 
-        audio_file = await self._tts.speak(text=text, output_path=str(output_path), voice=voice)
-        logger.info(f"Audio generated at: {audio_file}")
-        return audio_file
+        await self._write_speech([(part, voice) for part in self._sentences(text)], output_path)
+        logger.info(f"Audio generated at: {output_path}")
+        return str(output_path)
+
+    async def stream_speech(
+        self, text: str, voice: str | None = None
+    ) -> AsyncGenerator[bytes, None]:
+        """Yields MP3 chunks of whole frames while the speech is synthesized, for playback.
+
+        Sentences are synthesized concurrently; the first one plays while the rest are generated.
+        """
+        sentences = self._sentences(text)
+        logger.info(f"Streaming speech for text (length: {len(text)}, {len(sentences)} parts)...")
+        started = time.perf_counter()
+        first = True
+        streams = [partial(self._tts.stream, sentence, voice=voice) for sentence in sentences]
+        async with (
+            aclosing(ordered_streams(streams, config.TTS_MAX_CONCURRENCY)) as chunks,
+            aclosing(mp3_playback_chunks(chunks, config.TTS_PLAYBACK_CHUNK_SECONDS)) as playback,
+        ):
+            async for chunk in playback:
+                if first:
+                    logger.info(f"First audio chunk after {time.perf_counter() - started:.2f}s")
+                    first = False
+                yield chunk
+        logger.info(f"Speech streamed in {time.perf_counter() - started:.2f}s")
+
+    def _sentences(self, text: str) -> list[str]:
+        return split_sentences(text, config.TTS_MIN_SENTENCE_CHARS)
+
+    async def _write_speech(
+        self, parts: list[tuple[str, str | None]], output_file: Path
+    ) -> OrderedAudioWriter:
+        """Synthesizes (text, voice) parts concurrently into one MP3 file, in their order."""
+        semaphore = asyncio.Semaphore(config.TTS_MAX_CONCURRENCY)
+
+        async def synthesize(idx: int, text: str, voice: str | None) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                async with aclosing(self._tts.stream(text, voice=voice)) as chunks:
+                    async for chunk in chunks:
+                        await writer.write(idx, chunk)
+                await writer.finish(idx)
+            logger.info(
+                f"[{idx+1}/{len(parts)}] synthesized in "
+                f"{time.perf_counter() - started:.2f}s: {text[:30]}..."
+            )
+
+        try:
+            with open(output_file, "wb") as outfile:
+                writer = OrderedAudioWriter(
+                    outfile,
+                    parts=len(parts),
+                    chunk_size=config.TTS_STREAM_CHUNK_SIZE,
+                    max_buffered=config.TTS_MAX_BUFFERED_BYTES,
+                )
+                tasks = [
+                    asyncio.create_task(synthesize(idx, text, voice))
+                    for idx, (text, voice) in enumerate(parts)
+                ]
+                try:
+                    await asyncio.gather(*tasks)
+                finally:
+                    for task in tasks:
+                        task.cancel()
+                writer.close()
+        except BaseException:
+            output_file.unlink(missing_ok=True)
+            raise
+        return writer
 
     async def generate_dialogue_audio(
         self, diagnosis: str | None, doctor_skill: int, output_dir: Path
     ) -> str:
         logger.info(f"Generating dialogue audio: diagnosis={diagnosis}, skill={doctor_skill}")
 
-        output_dir.mkdir(exist_ok=True)
-
         diagnosis = diagnosis.strip() if diagnosis else None
         if not diagnosis:
             diagnosis = None
 
-        file_index = self._get_next_file_index(output_dir)
-        diagnosis_slug: str = (
-            self._sanitize_diagnosis_for_filename(diagnosis) if diagnosis else "random"
-        )
-        output_file = (
-            output_dir / f"{file_index:04d}_dialogue_{diagnosis_slug}_skill{doctor_skill}.mp3"
-        )
-
         system_prompt = get_dialogue_generation_prompt(
             diagnosis=diagnosis, doctor_skill=doctor_skill
         )
@@ -117,60 +191,42 @@ class MedicalSessionService:
         )
         dialogue_script = generated_dialogue.dialogue
 
-        logger.info(f"Dialogue generated with {len(dialogue_script)} turns")
+        library = DialogueAudioLibrary(output_dir)
+        entry = library.allocate(diagnosis, doctor_skill)
+        output_file = library.path(entry)
 
-        temp_files: list[Path] = []
+        logger.info(f"Dialogue generated with {len(dialogue_script)} turns")
 
+        index_file = audio_index_path(output_file)
+        started = time.perf_counter()
         try:
-            for idx, turn in enumerate(dialogue_script):
-                role = turn.role
-                voice = turn.voice
-                text = turn.text
-
-                logger.info(f"[{idx+1}/{len(dialogue_script)}] {role}: {text[:30]}...")
-
-                temp_file = output_dir / f"part_{idx}_{role}_{uuid.uuid4().hex[:8]}.mp3"
-                temp_files.append(temp_file)
-
-                await self._tts.speak(text=text, output_path=str(temp_file), voice=voice)
+            # Turns are synthesized concurrently and streamed into the file in dialogue order,
+            # with a turn index written next to it for seeking
+            writer = await self._write_speech(
+                [(turn.text, turn.voice) for turn in dialogue_script], output_file
+            )
+            index = DialogueAudioIndex(
+                audio_file=output_file.name,
+                duration_seconds=writer.duration_seconds,
+                turns=[
+                    DialogueAudioTurn(role=turn.role, text=turn.text, **segment.model_dump())
+                    for turn, segment in zip(dialogue_script, writer.segments)
+                ],
+            )
+            index_file.write_text(index.model_dump_json(indent=2), encoding="utf-8")
+            library.complete(entry.file_index, index.duration_seconds, len(index.turns))
+        except BaseException:
+            output_file.unlink(missing_ok=True)
+            index_file.unlink(missing_ok=True)
+            library.discard(entry.file_index)
+            raise
 
-            logger.info("Combining audio segments...")
-
-            with open(output_file, "wb") as outfile:
-                for fpath in temp_files:
-                    with open(fpath, "rb") as infile:
-                        outfile.write(infile.read())
-
-            logger.info(f"Audio generation complete: {output_file}")
-            return str(output_file)
-
-        finally:
-            logger.info("Cleaning up temporary files...")
-            for fpath in temp_files:
-                if fpath.exists():
-                    fpath.unlink()
-
-    def _sanitize_diagnosis_for_filename(self, diagnosis: str) -> str:
-        slug = diagnosis.lower()
-        slug = re.sub(r"[^\w\s-]", "", slug)
-        slug = re.sub(r"[\s_]+", "_", slug)
-        slug = slug.strip("_")
-        return slug
-
-    def _get_next_file_index(self, output_dir: Path) -> int:
-        existing_files = list(output_dir.glob("*_dialogue_*.mp3"))
-        if not existing_files:
-            return 1
-
-        max_index = 0
-        for file in existing_files:
-            try:
-                index = int(file.name.split("_")[0])
-                max_index = max(max_index, index)
-            except (ValueError, IndexError):
-                continue
-
-        return max_index + 1
+        logger.info(
+            f"Synthesized {len(dialogue_script)} turns in {time.perf_counter() - started:.2f}s, "
+            f"{writer.bytes_written} bytes, {index.duration_seconds:.1f}s of audio"
+        )
+        logger.info(f"Audio generation complete: {output_file}")
+        return str(output_file)
 
 
 # Singleton or Factory
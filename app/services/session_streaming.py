@@ -1,81 +1,313 @@
-from collections.abc import AsyncIterator
-from typing import Any
-
-from app.core.models import (
-    AnalysisResult,
-    ComplaintsResponse,
-    DiagnosisResponse,
-    DialogueTurn,
-    DoctorEvaluation,
-    EvaluationCriterion,
-    GeneratedDialogue,
-    ImageAttachment,
-    Medication,
-    MedicationsResponse,
-    PrescriptionReview,
-    StructuredData,
-)
+import asyncio
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import aclosing
+from typing import Any, TypeVar
+
+from app.core.models import DialogueTurn, GeneratedDialogue, ImageAttachment
+from app.services.checkpoints import StageCheckpoint, get_checkpoint_store, hash_files
 from app.services.llm import OpenAILLM
+from app.services.metrics import SESSIONS_IN_FLIGHT, record_cache_lookup
+from app.services.pipeline import StagePipeline, load_pipeline
+from app.services.speech_prefetch import get_speech_prefetcher, recommendations_speech_text
+from app.services.stream_events import AnalysisEventStream
 from app.services.stt import get_stt_provider
 from config.logger import logger
-from config.prompts import (
-    get_complaints_streaming_prompt,
-    get_criteria_streaming_prompt,
-    get_diagnosis_streaming_prompt,
-    get_dialogue_generation_prompt,
-    get_general_comment_streaming_prompt,
-    get_medications_streaming_prompt,
-    get_recommendations_streaming_prompt,
-    get_transcript_streaming_prompt,
-)
+from config.prompts import get_dialogue_generation_prompt
+from config.settings import config
+
+T = TypeVar("T")
+
+
+class SpeculativeTranscription:
+    """Transcription of an upload started before Analyze is clicked.
+
+    The turns are collected as they arrive, so the analysis that takes it over replays them and
+    follows the rest.
+    """
+
+    def __init__(self, batches: AsyncGenerator[list[DialogueTurn], None]) -> None:
+        self.turns: list[DialogueTurn] = []
+        self.done = False
+        self._waiters: list[asyncio.Future[None]] = []
+        self.task = asyncio.create_task(self._run(batches), name="speculative_transcription")
+        self.task.add_done_callback(_log_speculation)
+
+    @property
+    def failed(self) -> bool:
+        return _failed(self.task)
+
+    async def _run(self, batches: AsyncGenerator[list[DialogueTurn], None]) -> None:
+        try:
+            async with aclosing(batches):
+                async for turns in batches:
+                    self.turns.extend(turns)
+                    self._notify()
+        finally:
+            self.done = True
+            self._notify()
+
+    def _notify(self) -> None:
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    async def follow(self) -> AsyncGenerator[list[DialogueTurn], None]:
+        """Replays the turns transcribed so far, then yields the rest as they arrive."""
+        offset = 0
+        try:
+            while True:
+                turns = self.turns[offset:]
+                offset += len(turns)
+                if turns:
+                    yield turns
+                elif self.done:
+                    break
+                else:
+                    waiter = asyncio.get_running_loop().create_future()
+                    self._waiters.append(waiter)
+                    await waiter
+            await asyncio.wait([self.task])
+            if self.task.cancelled():
+                raise RuntimeError("Speculative transcription was cancelled")
+            if (error := self.task.exception()) is not None:
+                raise error
+        finally:
+            # The analysis owns the transcription: closing it early stops the transcription
+            if not self.task.done():
+                self.task.cancel()
+
+
+def _failed(task: asyncio.Task[Any]) -> bool:
+    return task.done() and (task.cancelled() or task.exception() is not None)
+
+
+def _log_speculation(task: asyncio.Task[Any]) -> None:
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        logger.error(f"✗ {task.get_name()} failed: {task.exception()}")
+    else:
+        logger.info(f"✓ {task.get_name()} finished")
 
 
 class MedicalSessionStreamingService:
     def __init__(self) -> None:
         self._stt = get_stt_provider()
         self._llm = OpenAILLM()
+        self._checkpoints = get_checkpoint_store()
+        # Work started on upload, keyed by the hash of its files, and the keys of each client's
+        # current upload; all of it lives on the loop the service runs on
+        self._speculative_transcripts: dict[str, SpeculativeTranscription] = {}
+        self._speculative_images: dict[str, asyncio.Task[str]] = {}
+        self._upload_keys: dict[str, set[str]] = {}
         logger.info("MedicalSessionStreamingService initialized")
 
-    def _parse_criterion(self, text: str) -> EvaluationCriterion | None:
-        lines = [line.strip() for line in text.split("\n") if line.strip()]
-        criterion_name: str | None = None
-        score: int | None = None
-        comment: str | None = None
-
-        for line in lines:
-            if line.startswith("CRITERION_NAME:"):
-                criterion_name = line.replace("CRITERION_NAME:", "").strip()
-            elif line.startswith("SCORE:"):
-                try:
-                    score = int(line.replace("SCORE:", "").strip())
-                except ValueError:
-                    logger.warning(f"Failed to parse score: {line}")
-            elif line.startswith("COMMENT:"):
-                comment = line.replace("COMMENT:", "").strip()
-
-        if criterion_name and score is not None and comment:
-            return EvaluationCriterion(name=criterion_name, score=score, comment=comment)
-
-        logger.warning(f"Failed to parse criterion from text: {text}")
-        return None
-
     async def process_upload(
         self, audio_path: str, images: list[ImageAttachment] | None = None
     ) -> tuple[list[DialogueTurn], str | None]:
         logger.info(f"Processing upload: audio={audio_path}, images={len(images) if images else 0}")
 
+        session_id = await self.get_upload_session_id(audio_path, images)
+
         image_report: str | None = None
         if images:
             logger.info("→ Starting image analysis first...")
-            image_report = await self._llm.analyze_images(images)
+            image_report = await self.analyze_images(images, session_id)
             logger.info(f"→ Image analysis complete: {len(image_report)} chars")
 
         logger.info("→ Starting transcription...")
-        transcript = await self._stt.transcribe(audio_path)
+        transcript = await self.transcribe(audio_path, session_id)
         logger.info(f"→ Transcription complete: {len(transcript)} turns")
 
         return transcript, image_report
 
+    async def get_upload_session_id(
+        self, audio_path: str | None, images: list[ImageAttachment] | None = None
+    ) -> str | None:
+        if not self._checkpoints:
+            return None
+        paths = [audio_path] if audio_path else []
+        paths += [image.file_path for image in images or []]
+        return await asyncio.to_thread(hash_files, paths)
+
+    async def transcribe(
+        self, audio_path: str, session_id: str | None = None
+    ) -> list[DialogueTurn]:
+        checkpoint = await self._load_checkpoint(session_id, "transcription")
+        if checkpoint:
+            logger.info("→ Transcription restored from checkpoint")
+            return [DialogueTurn.model_validate(turn) for turn in checkpoint.outputs["transcript"]]
+
+        transcript = await self._stt.transcribe(audio_path)
+        await self._save_checkpoint(session_id, "transcription", {"transcript": transcript})
+        return transcript
+
+    async def transcribe_stream(
+        self, audio_path: str, session_id: str | None = None
+    ) -> AsyncGenerator[list[DialogueTurn], None]:
+        checkpoint = await self._load_checkpoint(session_id, "transcription")
+        if checkpoint:
+            logger.info("→ Transcription restored from checkpoint")
+            yield [DialogueTurn.model_validate(turn) for turn in checkpoint.outputs["transcript"]]
+            return
+
+        speculation = await self._take_speculation(self._speculative_transcripts, [audio_path])
+        if speculation and not speculation.failed:
+            logger.info(
+                f"→ Taking over the speculative transcription ({len(speculation.turns)} turns ready)"
+            )
+            source = speculation.follow()
+        else:
+            source = self._stt.transcribe_stream(audio_path)
+
+        transcript: list[DialogueTurn] = []
+        async with aclosing(source) as batches:
+            async for turns in batches:
+                transcript.extend(turns)
+                yield turns
+        logger.info(f"→ Transcription complete: {len(transcript)} turns")
+        await self._save_checkpoint(session_id, "transcription", {"transcript": transcript})
+
+    async def transcribe_raw(self, audio_path: str, session_id: str | None = None) -> str:
+        checkpoint = await self._load_checkpoint(session_id, "raw_transcription")
+        if checkpoint:
+            logger.info("→ Raw transcription restored from checkpoint")
+            return str(checkpoint.outputs["raw_transcript"])
+
+        raw_transcript = await self._stt.transcribe_raw(audio_path)
+        logger.info(f"→ Raw transcription complete: {len(raw_transcript)} chars")
+        await self._save_checkpoint(
+            session_id, "raw_transcription", {"raw_transcript": raw_transcript}
+        )
+        return raw_transcript
+
+    async def analyze_upload_streaming(
+        self, audio_path: str, images: list[ImageAttachment] | None = None
+    ) -> AsyncGenerator[dict[str, Any], None]:
+        """Analyzes an uploaded consultation, formatting the transcript while it is transcribed."""
+        # Re-running the same upload resumes from its checkpointed stages
+        session_id = await self.get_upload_session_id(audio_path, images)
+
+        image_task: asyncio.Task[str] | None = None
+        if images:
+            image_task = asyncio.create_task(
+                self.analyze_images(images, session_id), name="image_analysis"
+            )
+
+        # The fast raw transcript starts the stages that do not need speakers
+        raw_task: asyncio.Task[str] | None = None
+        pipeline_mode: str | None = None
+        if config.TWO_TIER_TRANSCRIPTION:
+            raw_task = asyncio.create_task(
+                self.transcribe_raw(audio_path, session_id), name="raw_transcription"
+            )
+            pipeline_mode = config.TWO_TIER_PIPELINE_MODE
+
+        # The image report joins the analysis as soon as it is ready
+        turns = self.transcribe_stream(audio_path, session_id)
+        analysis = self.analyze_consultation_streaming(
+            turns, image_task, pipeline_mode, raw_transcript=raw_task
+        )
+        try:
+            async with aclosing(turns), aclosing(analysis) as updates:
+                async for update in updates:
+                    yield update
+        finally:
+            for task in (image_task, raw_task):
+                if task and not task.done():
+                    task.cancel()
+
+    async def analyze_images(
+        self, images: list[ImageAttachment], session_id: str | None = None
+    ) -> str:
+        checkpoint = await self._load_checkpoint(session_id, "image_analysis")
+        if checkpoint:
+            logger.info("→ Image analysis restored from checkpoint")
+            return str(checkpoint.outputs["image_report"])
+
+        task = await self._take_speculation(
+            self._speculative_images, [image.file_path for image in images]
+        )
+        if task and not _failed(task):
+            logger.info("→ Taking over the speculative image analysis")
+            image_report = await task
+        else:
+            image_report = await self._llm.analyze_images(images)
+        await self._save_checkpoint(session_id, "image_analysis", {"image_report": image_report})
+        return image_report
+
+    async def speculate_upload(
+        self, client_id: str, audio_path: str | None, images: list[ImageAttachment] | None = None
+    ) -> None:
+        """Starts transcribing and analyzing a client's upload before Analyze is clicked.
+
+        The analysis of the same files takes the work over. Work started for the client's previous
+        upload is discarded, unless another client uploaded the same files.
+        """
+        if not config.SPECULATIVE_UPLOADS_ENABLED:
+            return
+        keys: set[str] = set()
+        session_id = await self.get_upload_session_id(audio_path, images)
+        if audio_path and await self._load_checkpoint(session_id, "transcription"):
+            logger.info("→ Transcription already checkpointed, not transcribing speculatively")
+        elif audio_path:
+            key = await asyncio.to_thread(hash_files, [audio_path])
+            keys.add(key)
+            transcription = self._speculative_transcripts.get(key)
+            if transcription is None or transcription.failed:
+                logger.info("→ Transcribing the upload speculatively")
+                self._speculative_transcripts[key] = SpeculativeTranscription(
+                    self._stt.transcribe_stream(audio_path)
+                )
+        if images and await self._load_checkpoint(session_id, "image_analysis"):
+            logger.info("→ Image analysis already checkpointed, not analyzing speculatively")
+        elif images:
+            key = await asyncio.to_thread(hash_files, [image.file_path for image in images])
+            keys.add(key)
+            task = self._speculative_images.get(key)
+            if task is None or _failed(task):
+                logger.info(f"→ Analyzing {len(images)} uploaded images speculatively")
+                task = asyncio.create_task(
+                    self._llm.analyze_images(images), name="speculative_image_analysis"
+                )
+                task.add_done_callback(_log_speculation)
+                self._speculative_images[key] = task
+
+        previous = self._upload_keys.pop(client_id, set())
+        if keys:
+            self._upload_keys[client_id] = keys
+        in_use = set().union(*self._upload_keys.values())
+        for key in previous - in_use:
+            self._discard_speculation(key)
+
+    def _discard_speculation(self, key: str) -> None:
+        transcription = self._speculative_transcripts.pop(key, None)
+        image_task = self._speculative_images.pop(key, None)
+        for task in (transcription.task if transcription else None, image_task):
+            if task and not task.done():
+                logger.info(f"✗ {task.get_name()} discarded, the upload was replaced")
+                task.cancel()
+
+    async def _take_speculation(self, speculations: dict[str, T], paths: list[str]) -> T | None:
+        """Removes and returns the work started on upload for these files, if any."""
+        if not speculations:
+            return None
+        return speculations.pop(await asyncio.to_thread(hash_files, paths), None)
+
+    async def _load_checkpoint(self, session_id: str | None, stage: str) -> StageCheckpoint | None:
+        if not self._checkpoints or not session_id:
+            return None
+        checkpoint = await asyncio.to_thread(self._checkpoints.get, session_id, stage)
+        record_cache_lookup("checkpoint", checkpoint is not None)
+        return checkpoint
+
+    async def _save_checkpoint(
+        self, session_id: str | None, stage: str, outputs: dict[str, Any]
+    ) -> None:
+        if self._checkpoints and session_id:
+            await asyncio.to_thread(self._checkpoints.save, session_id, stage, outputs)
+
     async def generate_simulation(
         self,
         diagnosis: str | None,
@@ -115,297 +347,63 @@ class MedicalSessionStreamingService:
         return image_report
 
     async def analyze_consultation_streaming(
-        self, transcript: list[DialogueTurn], image_report: str | None = None
-    ) -> AsyncIterator[dict[str, Any]]:
+        self,
+        transcript: list[DialogueTurn] | AsyncIterator[list[DialogueTurn]],
+        image_report: str | asyncio.Future[str] | None = None,
+        pipeline_mode: str | None = None,
+        raw_transcript: str | asyncio.Future[str] | None = None,
+    ) -> AsyncGenerator[dict[str, Any], None]:
         logger.info("Starting streaming analysis...")
 
-        response_id: str | None = None
-        formatted_transcript = ""
-        complaints: list[str] = []
-        diagnosis: str | None = None
-        medications: list[Medication] = []
-        recommendations: list[str] = []
-        criteria: list[EvaluationCriterion] = []
-        general_comment = ""
+        events = AnalysisEventStream()
+        if pipeline_mode is None and not isinstance(transcript, list):
+            # Turns still being transcribed: start formatting them before the audio is done
+            pipeline_mode = config.TRANSCRIPTION_PIPELINE_MODE
 
+        speech_key: str | None = None
+        SESSIONS_IN_FLIGHT.inc()
         try:
-            logger.info("→ Starting transcript stage")
-            yield {"stage": "transcript", "status": "starting", "data": None}
-
-            stream_manager = await self._llm.analyze_formatted_transcript_streaming(
-                dialogue=transcript,
-                system_prompt=get_transcript_streaming_prompt(),
-            )
-
-            formatted_transcript = ""
-            async with stream_manager as stream:
-                async for event in stream:
-                    if event.type == "response.output_text.delta":
-                        if hasattr(event, "delta") and event.delta:
-                            formatted_transcript += event.delta
-                            # logger.info(
-                            #     f"→ Streaming transcript delta (buffer: {len(formatted_transcript)} chars)"
-                            # )
-                            yield {
-                                "stage": "transcript",
-                                "status": "streaming",
-                                "data": formatted_transcript,
-                            }
-                    elif event.type == "response.completed":
-                        logger.info("→ Transcript stream completed")
-
-                final_response = await stream.get_final_response()
-                response_id = final_response.id
-                if not response_id:
-                    raise ValueError("Failed to get response_id from transcript stage")
-
-            logger.info(f"→ Transcript complete. Response ID: {response_id}")
-            yield {"stage": "transcript", "status": "complete", "data": formatted_transcript}
-
-            if image_report:
-                logger.info("→ Injecting image analysis into conversation context...")
-                image_stream = await self._llm.inject_image_analysis_streaming(
-                    previous_response_id=response_id, image_analysis=image_report
-                )
-                async with image_stream as stream:
-                    async for event in stream:
-                        if event.type == "response.completed":
-                            logger.info("→ Image analysis injected")
-                    final_response = await stream.get_final_response()
-                    response_id = final_response.id
-                    if not response_id:
-                        raise ValueError("Failed to get response_id from image injection stage")
-
-            logger.info("→ Starting complaints stage")
-            yield {"stage": "complaints", "status": "starting", "data": None}
-
-            stream_manager = await self._llm.analyze_complaints_streaming(
-                previous_response_id=response_id,
-                system_prompt=get_complaints_streaming_prompt(),
-            )
-
-            async with stream_manager as stream:
-                async for event in stream:
-                    if event.type == "response.completed":
-                        logger.info("→ Complaints stream completed")
-
-                final_response = await stream.get_final_response()
-                response_id = final_response.id
-                if not response_id:
-                    raise ValueError("Failed to get response_id from complaints stage")
-
-                if final_response.output:
-                    for message in final_response.output:
-                        if hasattr(message, "content"):
-                            for content in message.content:
-                                if hasattr(content, "parsed"):
-                                    parsed_complaints: ComplaintsResponse = content.parsed
-                                    complaints = parsed_complaints.complaints
-
-            logger.info(f"→ Complaints complete: {len(complaints)} items")
-            yield {"stage": "complaints", "status": "streaming", "data": complaints}
-            yield {"stage": "complaints", "status": "complete", "data": complaints}
-
-            logger.info("→ Starting diagnosis stage")
-            yield {"stage": "diagnosis", "status": "starting", "data": None}
-
-            stream_manager = await self._llm.analyze_diagnosis_streaming(
-                previous_response_id=response_id,
-                system_prompt=get_diagnosis_streaming_prompt(),
-            )
-
-            async with stream_manager as stream:
-                async for event in stream:
-                    if event.type == "response.completed":
-                        logger.info("→ Diagnosis stream completed")
-
-                final_response = await stream.get_final_response()
-                response_id = final_response.id
-                if not response_id:
-                    raise ValueError("Failed to get response_id from diagnosis stage")
-
-                if final_response.output:
-                    for message in final_response.output:
-                        if hasattr(message, "content"):
-                            for content in message.content:
-                                if hasattr(content, "parsed"):
-                                    parsed_diagnosis: DiagnosisResponse = content.parsed
-                                    diagnosis = parsed_diagnosis.diagnosis
-
-            logger.info(f"→ Diagnosis complete: {diagnosis}")
-            yield {"stage": "diagnosis", "status": "streaming", "data": diagnosis}
-            yield {"stage": "diagnosis", "status": "complete", "data": diagnosis}
-
-            logger.info("→ Starting medications stage")
-            yield {"stage": "medications", "status": "starting", "data": None}
-
-            stream_manager = await self._llm.analyze_medications_streaming(
-                previous_response_id=response_id,
-                system_prompt=get_medications_streaming_prompt(),
-            )
-
-            async with stream_manager as stream:
-                async for event in stream:
-                    if event.type == "response.completed":
-                        logger.info("→ Medications stream completed")
-
-                final_response = await stream.get_final_response()
-                response_id = final_response.id
-                if not response_id:
-                    raise ValueError("Failed to get response_id from medications stage")
-
-                if final_response.output:
-                    for message in final_response.output:
-                        if hasattr(message, "content"):
-                            for content in message.content:
-                                if hasattr(content, "parsed"):
-                                    parsed_medications: MedicationsResponse = content.parsed
-                                    medications = parsed_medications.medications
-
-            logger.info(f"→ Medications complete: {len(medications)} medications")
-            yield {"stage": "medications", "status": "streaming", "data": medications}
-            yield {"stage": "medications", "status": "complete", "data": medications}
-
-            logger.info("→ Starting recommendations stage")
-            yield {"stage": "recommendations", "status": "starting", "data": None}
-
-            stream_manager = await self._llm.analyze_recommendations_streaming(
-                previous_response_id=response_id,
-                system_prompt=get_recommendations_streaming_prompt(),
-            )
-
-            buffer = ""
-            async with stream_manager as stream:
-                async for event in stream:
-                    if event.type == "response.output_text.delta":
-                        if hasattr(event, "delta") and event.delta:
-                            buffer += event.delta
-
-                            if "__ITEM__" in buffer:
-                                parts = buffer.split("__ITEM__")
-                                for i in range(len(parts) - 1):
-                                    item_text = parts[i].strip()
-                                    if item_text and item_text.lower() != "no recommendations.":
-                                        recommendations.append(item_text)
-                                        yield {
-                                            "stage": "recommendations",
-                                            "status": "streaming",
-                                            "data": recommendations,
-                                        }
-                                buffer = parts[-1]
-                    elif event.type == "response.completed":
-                        logger.info("→ Recommendations stream completed")
-
-                final_response = await stream.get_final_response()
-                response_id = final_response.id
-                if not response_id:
-                    raise ValueError("Failed to get response_id from recommendations stage")
-
-            if buffer.strip() and buffer.strip().lower() != "no recommendations.":
-                recommendations.append(buffer.strip())
-
-            logger.info(f"→ Recommendations complete: {len(recommendations)} recommendations")
-            yield {"stage": "recommendations", "status": "complete", "data": recommendations}
-
-            logger.info("→ Starting criteria stage")
-            yield {"stage": "criteria", "status": "starting", "data": None}
-
-            stream_manager = await self._llm.analyze_criteria_streaming(
-                previous_response_id=response_id,
-                system_prompt=get_criteria_streaming_prompt(),
+            pipeline = StagePipeline(
+                load_pipeline(pipeline_mode), self._llm, events, checkpoints=self._checkpoints
             )
-
-            buffer = ""
-            async with stream_manager as stream:
-                async for event in stream:
-                    if event.type == "response.output_text.delta":
-                        if hasattr(event, "delta") and event.delta:
-                            buffer += event.delta
-
-                            if "__ITEM__" in buffer:
-                                parts = buffer.split("__ITEM__")
-                                for i in range(len(parts) - 1):
-                                    item_text = parts[i].strip()
-                                    if item_text:
-                                        criterion = self._parse_criterion(item_text)
-                                        if criterion:
-                                            criteria.append(criterion)
-                                            yield {
-                                                "stage": "criteria",
-                                                "status": "streaming",
-                                                "data": criteria,
-                                            }
-                                buffer = parts[-1]
-                    elif event.type == "response.completed":
-                        logger.info("→ Criteria stream completed")
-
-                final_response = await stream.get_final_response()
-                response_id = final_response.id
-                if not response_id:
-                    raise ValueError("Failed to get response_id from criteria stage")
-
-            if buffer.strip():
-                criterion = self._parse_criterion(buffer.strip())
-                if criterion:
-                    criteria.append(criterion)
-
-            logger.info(f"→ Criteria complete: {len(criteria)} criteria")
-            yield {"stage": "criteria", "status": "complete", "data": criteria}
-
-            logger.info("→ Starting general_comment stage")
-            yield {"stage": "general_comment", "status": "starting", "data": None}
-
-            stream_manager = await self._llm.analyze_general_comment_streaming(
-                previous_response_id=response_id,
-                system_prompt=get_general_comment_streaming_prompt(),
-            )
-
-            general_comment = ""
-            async with stream_manager as stream:
-                async for event in stream:
-                    if event.type == "response.output_text.delta":
-                        if hasattr(event, "delta") and event.delta:
-                            general_comment += event.delta
-                            # logger.info(
-                            #     f"→ Streaming general comment delta (buffer: {len(general_comment)} chars)"
-                            # )
-                            yield {
-                                "stage": "general_comment",
-                                "status": "streaming",
-                                "data": general_comment,
-                            }
-                    elif event.type == "response.completed":
-                        logger.info("→ General comment stream completed")
-
-                final_response = await stream.get_final_response()
-                response_id = final_response.id
-
-            logger.info(f"→ General comment complete")
-            yield {"stage": "general_comment", "status": "complete", "data": general_comment}
-
-            final_result = AnalysisResult(
-                structured_data=StructuredData(
-                    complaints=complaints,
-                    diagnosis=diagnosis,
-                    medications=medications,
-                    image_findings=[],
-                ),
-                prescription_review=PrescriptionReview(
-                    status="ok" if not recommendations else "warning",
-                    recommendations=recommendations,
-                ),
-                doctor_evaluation=DoctorEvaluation(
-                    criteria=criteria, general_comment=general_comment
-                ),
-                formatted_transcript=formatted_transcript,
-            )
-
-            logger.info("✓ All stages complete! Sending final result")
-            yield {"stage": "complete", "status": "complete", "data": final_result}
-
+            async with aclosing(pipeline.run(transcript, image_report, raw_transcript)) as updates:
+                async for update in updates:
+                    if update["stage"] == "complete":
+                        logger.info("✓ All stages complete! Sending final result")
+                    elif update["stage"] == "recommendations" and update["status"] == "complete":
+                        speech_key = self._prefetch_recommendations_audio(
+                            update["data"], speech_key
+                        )
+                    yield update
+
+        except (asyncio.CancelledError, GeneratorExit):
+            # Closing the pipeline cancels its stage tasks, which closes the in-flight upstream streams
+            logger.info("✗ Streaming analysis cancelled, upstream streams closed")
+            if speech_key:
+                get_speech_prefetcher().cancel(speech_key)
+            raise
         except Exception as e:
             logger.error(f"✗ Error during streaming analysis: {e}")
-            yield {"stage": "error", "status": "error", "data": str(e)}
+            if speech_key:
+                get_speech_prefetcher().cancel(speech_key)
+            yield events.event("error", "error", str(e))
+        finally:
+            SESSIONS_IN_FLIGHT.dec()
+
+    def _prefetch_recommendations_audio(
+        self, recommendations: list[str] | None, previous_key: str | None
+    ) -> str | None:
+        """Starts synthesizing the recommendations audio while the remaining stages stream."""
+        if not config.TTS_PREFETCH_ENABLED or not recommendations:
+            return previous_key
+        prefetcher = get_speech_prefetcher()
+        key = prefetcher.start(
+            recommendations_speech_text(recommendations), config.DEFAULT_TTS_VOICE
+        )
+        if previous_key and previous_key != key:
+            # The recommendations changed: the earlier audio is no longer needed
+            prefetcher.cancel(previous_key)
+        return key
 
 
 def get_streaming_session_service() -> MedicalSessionStreamingService:
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+from app.services.checkpoints import hash_text
+from app.services.session import MedicalSessionService, get_session_service
+from config.logger import logger
+from config.settings import config
+
+
+def recommendations_speech_text(recommendations: list[str]) -> str:
+    """Text the Play Recommendations button reads out, shared by the UI and the prefetch."""
+    return "\n\n".join(recommendations)
+
+
+class SpeechPrefetcher:
+    """Synthesizes speech in the background before it is requested, keyed by text and voice.
+
+    Analyses start the recommendations audio as soon as the recommendations are final, so the
+    Play button finds a ready file. Syntheses run on the prefetcher's own event loop, since its
+    service's client is bound to one loop while analyses run on the UI and job loops. The file of
+    an evicted or cancelled entry is deleted.
+    """
+
+    def __init__(self, speech: MedicalSessionService | None = None, max_entries: int = 32) -> None:
+        self._speech = speech or get_session_service()
+        self._max_entries = max_entries
+        self._tasks: OrderedDict[str, Future[str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="speech-prefetch", daemon=True
+        )
+        self._thread.start()
+
+    @staticmethod
+    def key(text: str, voice: str | None) -> str:
+        return hash_text(text, voice)
+
+    def start(self, text: str, voice: str | None = None) -> str:
+        key = self.key(text, voice)
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is not None and not (task.done() and self._failed(task)):
+                self._tasks.move_to_end(key)
+                return key
+            logger.info(f"→ Pre-synthesizing speech in the background (length: {len(text)})")
+            task = asyncio.run_coroutine_threadsafe(
+                self._speech.text_to_speech(text, voice=voice), self._loop
+            )
+            task.add_done_callback(self._log_result)
+            self._tasks[key] = task
+            evicted = []
+            while len(self._tasks) > self._max_entries:
+                evicted.append(self._tasks.popitem(last=False)[1])
+        for task in evicted:
+            self._discard(task)
+        return key
+
+    def cancel(self, key: str) -> None:
+        with self._lock:
+            task = self._tasks.pop(key, None)
+        if task is None:
+            return
+        if not task.done():
+            logger.info("✗ Background speech synthesis cancelled")
+        self._discard(task)
+
+    def ready(self, text: str, voice: str | None = None) -> str | None:
+        """Path of the synthesized file if the prefetch for this text has finished, else None."""
+        with self._lock:
+            task = self._tasks.get(self.key(text, voice))
+        if task is None or not task.done() or self._failed(task):
+            return None
+        path = task.result()
+        return path if Path(path).exists() else None
+
+    def _discard(self, task: Future[str]) -> None:
+        """Stops a synthesis, which then removes its partial file, or deletes its finished file."""
+        task.cancel()
+        task.add_done_callback(self._delete_file)
+
+    @classmethod
+    def _delete_file(cls, task: Future[str]) -> None:
+        if not cls._failed(task):
+            Path(task.result()).unlink(missing_ok=True)
+
+    @staticmethod
+    def _log_result(task: Future[str]) -> None:
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.error(f"✗ Background speech synthesis failed: {task.exception()}")
+        else:
+            logger.info(f"✓ Background speech ready: {task.result()}")
+
+    @staticmethod
+    def _failed(task: Future[str]) -> bool:
+        return task.cancelled() or task.exception() is not None
+
+
+_speech_prefetcher: SpeechPrefetcher | None = None
+
+
+def get_speech_prefetcher() -> SpeechPrefetcher:
+    """The process-wide prefetcher, shared by the analysis services and the Play button."""
+    global _speech_prefetcher
+    if _speech_prefetcher is None:
+        _speech_prefetcher = SpeechPrefetcher(max_entries=config.TTS_PREFETCH_MAX_ENTRIES)
+    return _speech_prefetcher
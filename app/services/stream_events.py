@@ -0,0 +1,153 @@
+import asyncio
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import suppress
+from typing import Any
+
+from config.logger import logger
+from config.settings import config
+
+# Event operations: how a consumer applies an event's data to the stage value it holds
+OP_APPEND = "append"  # data is a text delta to append
+OP_ADD_ITEMS = "add_items"  # data is a list of new items to append to the list
+OP_REPLACE = "replace"  # data replaces the stage value
+OP_SNAPSHOT = "snapshot"  # data is the full accumulated stage value, sent periodically
+
+
+class AnalysisEventStream:
+    """Builds sequence-numbered analysis events carrying deltas instead of accumulated values."""
+
+    def __init__(self, snapshot_interval: int | None = None) -> None:
+        self._seq = 0
+        self._snapshot_interval = snapshot_interval or config.STREAM_SNAPSHOT_INTERVAL
+        self._deltas_since_snapshot: dict[str, int] = {}
+
+    def event(
+        self, stage: str, status: str, data: Any = None, op: str = OP_REPLACE
+    ) -> dict[str, Any]:
+        self._seq += 1
+        return {"seq": self._seq, "stage": stage, "status": status, "op": op, "data": data}
+
+    def append_text(self, stage: str, delta: str, text: str) -> list[dict[str, Any]]:
+        events = [self.event(stage, "streaming", delta, op=OP_APPEND)]
+        events.extend(self._maybe_snapshot(stage, text))
+        return events
+
+    def add_items(self, stage: str, items: list[Any], all_items: list[Any]) -> list[dict[str, Any]]:
+        events = [self.event(stage, "streaming", list(items), op=OP_ADD_ITEMS)]
+        events.extend(self._maybe_snapshot(stage, list(all_items)))
+        return events
+
+    def _maybe_snapshot(self, stage: str, value: Any) -> list[dict[str, Any]]:
+        count = self._deltas_since_snapshot.get(stage, 0) + 1
+        if count < self._snapshot_interval:
+            self._deltas_since_snapshot[stage] = count
+            return []
+
+        self._deltas_since_snapshot[stage] = 0
+        return [self.event(stage, "snapshot", value, op=OP_SNAPSHOT)]
+
+
+class AnalysisViewState:
+    """Applies analysis events in sequence order and keeps the current value of every stage."""
+
+    def __init__(self) -> None:
+        self.last_seq = 0
+        self._values: dict[str, Any] = {}
+        self._text_chunks: dict[str, list[str]] = {}
+        self._stale_stages: set[str] = set()
+
+    def get(self, stage: str, default: Any = None) -> Any:
+        chunks = self._text_chunks.get(stage)
+        if chunks is not None and len(chunks) > 1:
+            # Collapse appended deltas lazily so appends stay O(delta)
+            self._text_chunks[stage] = ["".join(chunks)]
+        if chunks is not None:
+            return self._text_chunks[stage][0]
+        return self._values.get(stage, default)
+
+    def apply(self, event: dict[str, Any]) -> bool:
+        seq = event.get("seq", self.last_seq + 1)
+        if seq <= self.last_seq:
+            return False
+
+        stage = event["stage"]
+        op = event.get("op", OP_REPLACE)
+        data: Any = event.get("data")
+
+        if seq != self.last_seq + 1:
+            logger.warning(f"Missed events before seq={seq}, waiting for snapshots")
+            self._stale_stages.update(self._values, self._text_chunks)
+            self._stale_stages.add(stage)
+        self.last_seq = seq
+
+        if op in (OP_REPLACE, OP_SNAPSHOT):
+            self._stale_stages.discard(stage)
+        elif stage in self._stale_stages:
+            return False
+
+        if op == OP_APPEND:
+            if stage not in self._text_chunks:
+                self._text_chunks[stage] = [self._values.pop(stage, None) or ""]
+            self._text_chunks[stage].append(data)
+        elif op == OP_ADD_ITEMS:
+            self._values[stage] = list(self._values.get(stage) or []) + list(data)
+        elif data is not None or event.get("status") != "starting":
+            self._text_chunks.pop(stage, None)
+            self._values[stage] = data
+        return True
+
+
+async def coalesce_frames(
+    events: AsyncIterator[dict[str, Any]], frame_rate: float | None = None
+) -> AsyncGenerator[list[dict[str, Any]], None]:
+    """Batches events into frames emitted at most `frame_rate` times per second.
+
+    Stage completions and errors flush the pending frame immediately so they are never delayed.
+    """
+    frame_interval = 1.0 / (frame_rate or config.UI_FRAME_RATE)
+    queue: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue()
+
+    async def pump() -> None:
+        try:
+            async for event in events:
+                queue.put_nowait(event)
+        finally:
+            queue.put_nowait(None)
+
+    loop = asyncio.get_running_loop()
+    pump_task = asyncio.create_task(pump(), name="event_pump")
+    frame: list[dict[str, Any]] = []
+    last_flush = 0.0
+
+    try:
+        while True:
+            timeout = None
+            if frame:
+                timeout = max(0.0, last_flush + frame_interval - loop.time())
+
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout)
+            except TimeoutError:
+                yield frame
+                frame = []
+                last_flush = loop.time()
+                continue
+
+            if event is None:
+                if frame:
+                    yield frame
+                # Re-raises a failure of the source stream
+                await pump_task
+                return
+
+            frame.append(event)
+            flush = event.get("status") in ("complete", "error")
+            if flush or loop.time() >= last_flush + frame_interval:
+                yield frame
+                frame = []
+                last_flush = loop.time()
+    finally:
+        if not pump_task.done():
+            pump_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await pump_task
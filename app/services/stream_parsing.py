@@ -0,0 +1,206 @@
+import json
+from typing import Any
+
+from app.core.models import EvaluationCriterion
+from config.logger import logger
+
+ITEM_DELIMITER = "__ITEM__"
+
+CRITERION_FIELDS = {
+    "CRITERION_NAME:": "name",
+    "SCORE:": "score",
+    "COMMENT:": "comment",
+}
+
+
+class DelimitedItemTokenizer:
+    """Splits a streamed plain-text response into items separated by a delimiter.
+
+    Only the new delta (plus a tail shorter than the delimiter) is scanned on each call, so a
+    delimiter split across deltas is still found and the per-delta cost stays flat.
+    """
+
+    def __init__(self, delimiter: str = ITEM_DELIMITER) -> None:
+        self._delimiter = delimiter
+        self._pending: list[str] = []
+        self._tail = ""
+
+    def feed(self, delta: str) -> list[str]:
+        text = self._tail + delta
+        items: list[str] = []
+        start = 0
+
+        index = text.find(self._delimiter, start)
+        while index != -1:
+            self._pending.append(text[start:index])
+            item = "".join(self._pending).strip()
+            if item:
+                items.append(item)
+            self._pending = []
+            start = index + len(self._delimiter)
+            index = text.find(self._delimiter, start)
+
+        # Keep just enough of the remainder to recognise a delimiter split across deltas
+        split_at = max(start, len(text) - len(self._delimiter) + 1)
+        self._pending.append(text[start:split_at])
+        self._tail = text[split_at:]
+        return items
+
+    def flush(self) -> list[str]:
+        self._pending.append(self._tail)
+        item = "".join(self._pending).strip()
+        self._pending = []
+        self._tail = ""
+        return [item] if item else []
+
+
+def parse_criterion(text: str) -> EvaluationCriterion | None:
+    """Parses one CRITERION_NAME/SCORE/COMMENT item in a single pass over its lines."""
+    fields: dict[str, list[str]] = {}
+    current: list[str] | None = None
+
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+
+        for label, field in CRITERION_FIELDS.items():
+            if line.startswith(label):
+                current = fields.setdefault(field, [])
+                current.append(line[len(label) :].strip())
+                break
+        else:
+            # Unlabelled lines continue the previous field (multi-line comments)
+            if current is not None:
+                current.append(line)
+
+    name = " ".join(fields.get("name", [])).strip()
+    comment = " ".join(fields.get("comment", [])).strip()
+    score_text = " ".join(fields.get("score", [])).strip()
+
+    score: int | None = None
+    try:
+        score = int(score_text)
+    except ValueError:
+        logger.warning(f"Failed to parse score: {score_text}")
+
+    if name and score is not None and comment:
+        try:
+            return EvaluationCriterion(name=name, score=score, comment=comment)
+        except ValueError as e:
+            logger.warning(f"Invalid criterion '{name}': {e}")
+            return None
+
+    logger.warning(f"Failed to parse criterion from text: {text}")
+    return None
+
+
+class PartialJsonObjectParser:
+    """Incrementally parses a streamed JSON object and reports top-level fields as they complete.
+
+    Each delta is scanned once, so the total cost is linear in the length of the output.
+    """
+
+    def __init__(self) -> None:
+        self._started = False
+        self._finished = False
+        self._in_string = False
+        self._escape = False
+        self._depth = 0
+        self._key: str | None = None
+        self._key_chars: list[str] | None = None
+        self._value_chars: list[str] | None = None
+        self._completed: dict[str, Any] = {}
+
+    @property
+    def completed(self) -> dict[str, Any]:
+        return self._completed
+
+    def feed(self, delta: str) -> list[tuple[str, Any]]:
+        fields: list[tuple[str, Any]] = []
+        for char in delta:
+            field = self._consume(char)
+            if field is not None:
+                fields.append(field)
+        return fields
+
+    def _consume(self, char: str) -> tuple[str, Any] | None:
+        if self._finished:
+            return None
+
+        if not self._started:
+            if char == "{":
+                self._started = True
+            return None
+
+        if self._key_chars is not None:
+            self._consume_key(char)
+            return None
+
+        if self._value_chars is not None:
+            return self._consume_value(char)
+
+        if char == '"' and self._key is None:
+            self._key_chars = []
+        elif char == ":" and self._key is not None:
+            self._value_chars = []
+        elif char == "}":
+            self._finished = True
+        return None
+
+    def _consume_key(self, char: str) -> None:
+        assert self._key_chars is not None
+        if self._escape:
+            self._escape = False
+            self._key_chars.append(char)
+        elif char == "\\":
+            self._escape = True
+            self._key_chars.append(char)
+        elif char == '"':
+            self._key = json.loads('"' + "".join(self._key_chars) + '"')
+            self._key_chars = None
+        else:
+            self._key_chars.append(char)
+
+    def _consume_value(self, char: str) -> tuple[str, Any] | None:
+        assert self._value_chars is not None
+        if self._in_string:
+            self._value_chars.append(char)
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+            return None
+
+        if self._depth == 0 and char in ",}":
+            field = self._complete_value()
+            if char == "}":
+                self._finished = True
+            return field
+
+        self._value_chars.append(char)
+        if char == '"':
+            self._in_string = True
+        elif char in "[{":
+            self._depth += 1
+        elif char in "]}":
+            self._depth -= 1
+        return None
+
+    def _complete_value(self) -> tuple[str, Any] | None:
+        assert self._key is not None and self._value_chars is not None
+        key = self._key
+        raw_value = "".join(self._value_chars)
+        self._key = None
+        self._value_chars = None
+
+        try:
+            value = json.loads(raw_value)
+        except json.JSONDecodeError:
+            logger.warning(f"Failed to parse streamed JSON field '{key}': {raw_value[:100]}")
+            return None
+
+        self._completed[key] = value
+        return key, value
@@ -1,10 +1,12 @@
 import asyncio
+from collections.abc import AsyncGenerator
 
 from deepgram import DeepgramClient
 from openai import AsyncOpenAI
 
 from app.core.interfaces import STTProvider
 from app.core.models import DialogueTurn
+from app.services.metrics import track_upstream_call
 from config.logger import logger
 from config.settings import config
 
@@ -13,6 +15,16 @@ class MockSTT(STTProvider):
     async def transcribe(self, audio_path: str) -> list[DialogueTurn]:
         logger.info(f"MockSTT: Transcribing {audio_path}")
         await asyncio.sleep(2)  # Simulate processing
+        return self._dialogue()
+
+    async def transcribe_stream(self, audio_path: str) -> AsyncGenerator[list[DialogueTurn], None]:
+        logger.info(f"MockSTT: Streaming transcription of {audio_path}")
+        dialogue = self._dialogue()
+        for turn in dialogue:
+            await asyncio.sleep(2 / len(dialogue))  # Simulate processing
+            yield [turn]
+
+    def _dialogue(self) -> list[DialogueTurn]:
         return [
             DialogueTurn(speaker="Врач", text="Добрый день. На что жалуетесь?"),
             DialogueTurn(
@@ -57,18 +69,19 @@ class DeepgramSTT(STTProvider):
 
         # Run synchronous Deepgram call in executor to avoid blocking the event loop
         loop = asyncio.get_running_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: self.client.listen.v1.media.transcribe_file(
-                request=buffer_data,
-                model=config.DEEPGRAM_MODEL,
-                smart_format=True,
-                diarize=True,
-                utterances=True,
-                paragraphs=True,
-                punctuate=True,
-            ),
-        )
+        with track_upstream_call("stt", "deepgram"):
+            response = await loop.run_in_executor(
+                None,
+                lambda: self.client.listen.v1.media.transcribe_file(
+                    request=buffer_data,
+                    model=config.DEEPGRAM_MODEL,
+                    smart_format=True,
+                    diarize=True,
+                    utterances=True,
+                    paragraphs=True,
+                    punctuate=True,
+                ),
+            )
 
         dialogue: list[DialogueTurn] = []
 
@@ -120,14 +133,15 @@ class DeepgramSTT(STTProvider):
             buffer_data = audio_file.read()
 
         loop = asyncio.get_running_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: self.client.listen.v1.media.transcribe_file(
-                request=buffer_data,
-                model=config.DEEPGRAM_MODEL,
-                smart_format=True,
-            ),
-        )
+        with track_upstream_call("stt", "deepgram"):
+            response = await loop.run_in_executor(
+                None,
+                lambda: self.client.listen.v1.media.transcribe_file(
+                    request=buffer_data,
+                    model=config.DEEPGRAM_MODEL,
+                    smart_format=True,
+                ),
+            )
 
         return response.results.channels[0].alternatives[0].transcript
 
@@ -143,7 +157,7 @@ class OpenAI_STT(STTProvider):
             f"OpenAI_STT: Transcribing {audio_path} with model {config.STT_DIARIZATION_MODEL}"
         )
 
-        with open(audio_path, "rb") as audio_file:
+        with open(audio_path, "rb") as audio_file, track_upstream_call("stt", "openai"):
             # Based on user documentation snippet
             transcript = await self.client.audio.transcriptions.create(
                 model=config.STT_DIARIZATION_MODEL,
@@ -173,9 +187,41 @@ class OpenAI_STT(STTProvider):
 
         return dialogue
 
+    async def transcribe_stream(self, audio_path: str) -> AsyncGenerator[list[DialogueTurn], None]:
+        logger.info(
+            f"OpenAI_STT: Streaming transcription of {audio_path} "
+            f"with model {config.STT_DIARIZATION_MODEL}"
+        )
+
+        speaker: str | None = None
+        texts: list[str] = []
+        with open(audio_path, "rb") as audio_file, track_upstream_call("stt", "openai"):
+            stream = await self.client.audio.transcriptions.create(
+                model=config.STT_DIARIZATION_MODEL,
+                file=audio_file,
+                response_format="diarized_json",
+                chunking_strategy="auto",
+                stream=True,
+            )
+            async for event in stream:
+                if event.type != "transcript.text.segment":
+                    continue
+                text = event.text.strip()
+                if not text:
+                    continue
+                # Consecutive segments of one speaker form a turn, emitted once the speaker changes
+                if speaker is not None and event.speaker != speaker:
+                    yield [DialogueTurn(speaker=speaker, text=" ".join(texts))]
+                    texts = []
+                speaker = event.speaker
+                texts.append(text)
+
+        if speaker is not None:
+            yield [DialogueTurn(speaker=speaker, text=" ".join(texts))]
+
     async def transcribe_raw(self, audio_path: str) -> str:
         logger.info(f"OpenAI_STT: Transcribing raw {audio_path} with model {config.STT_MODEL}")
-        with open(audio_path, "rb") as audio_file:
+        with open(audio_path, "rb") as audio_file, track_upstream_call("stt", "openai"):
             transcript = await self.client.audio.transcriptions.create(
                 model=config.STT_MODEL, file=audio_file
             )
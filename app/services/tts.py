@@ -1,12 +1,38 @@
 import asyncio
+import re
+from collections.abc import AsyncGenerator
 from pathlib import Path
 
 from openai import AsyncOpenAI
 
 from app.core.interfaces import TTSProvider
+from app.services.metrics import track_upstream_call
+from app.services.tts_cache import CachedTTS
 from config.logger import logger
 from config.settings import config
 
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+def split_sentences(text: str, min_chars: int) -> list[str]:
+    """Splits text at sentence ends; fragments shorter than min_chars join the next sentence."""
+    sentences: list[str] = []
+    pending = ""
+    for sentence in SENTENCE_END.split(text.strip()):
+        pending = f"{pending} {sentence}" if pending else sentence
+        if len(pending) >= min_chars:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+MOCK_SILENT_FRAME = b"\xff\xfb\x90\xc4" + bytes(413)
+
 
 class MockTTS(TTSProvider):
     async def speak(self, text: str, output_path: str, voice: str | None = None) -> str:
@@ -20,6 +46,12 @@ class MockTTS(TTSProvider):
                 f.write(b"dummy audio content")
         return output_path
 
+    async def stream(self, text: str, voice: str | None = None) -> AsyncGenerator[bytes, None]:
+        logger.info(f"MockTTS: Streaming speech for text (len={len(text)}), voice={voice}")
+        await asyncio.sleep(1)
+        # Silent MPEG-1 Layer III frames (128 kbps, 44.1 kHz, mono), about 0.05s per character
+        yield MOCK_SILENT_FRAME * max(1, len(text) * 2)
+
 
 class OpenAITTS(TTSProvider):
     instructions = """Voice: Professional, direct, and quick.
@@ -35,17 +67,39 @@ class OpenAITTS(TTSProvider):
     async def speak(self, text: str, output_path: str, voice: str | None = None) -> str:
         target_voice = voice or "alloy"
         logger.info(f"OpenAITTS: Synthesizing speech to {output_path} with voice {target_voice}")
-        async with self.client.audio.speech.with_streaming_response.create(
-            model=config.TTS_MODEL, voice=target_voice, input=text, instructions=self.instructions
-        ) as response:
-            await response.stream_to_file(output_path)
+        with track_upstream_call("tts", "openai"):
+            async with self.client.audio.speech.with_streaming_response.create(
+                model=config.TTS_MODEL,
+                voice=target_voice,
+                input=text,
+                instructions=self.instructions,
+            ) as response:
+                await response.stream_to_file(output_path)
         return output_path
 
+    async def stream(self, text: str, voice: str | None = None) -> AsyncGenerator[bytes, None]:
+        target_voice = voice or "alloy"
+        logger.info(f"OpenAITTS: Streaming speech with voice {target_voice}")
+        with track_upstream_call("tts", "openai"):
+            async with self.client.audio.speech.with_streaming_response.create(
+                model=config.TTS_MODEL,
+                voice=target_voice,
+                input=text,
+                instructions=self.instructions,
+            ) as response:
+                async for chunk in response.iter_bytes(config.TTS_STREAM_CHUNK_SIZE):
+                    yield chunk
+
 
 def get_tts_provider() -> TTSProvider:
+    provider: TTSProvider
     if config.USE_MOCK_SERVICES:
         logger.info("Using Mock TTS service")
-        return MockTTS()
+        provider = MockTTS()
+    else:
+        logger.info("Using OpenAI TTS service")
+        provider = OpenAITTS()
 
-    logger.info("Using OpenAI TTS service")
-    return OpenAITTS()
+    if not config.TTS_CACHE_ENABLED:
+        return provider
+    return CachedTTS(provider)
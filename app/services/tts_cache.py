@@ -0,0 +1,167 @@
+import asyncio
+import os
+import shutil
+import sqlite3
+import time
+import unicodedata
+import uuid
+from collections.abc import AsyncGenerator, Iterator
+from contextlib import aclosing, closing, contextmanager
+from pathlib import Path
+from typing import BinaryIO
+
+from app.core.interfaces import TTSProvider
+from app.services.checkpoints import hash_text
+from app.services.metrics import TTS_CACHE_BYTES, record_cache_lookup
+from config.logger import logger
+from config.settings import config
+
+
+def normalize_tts_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class CachedTTS(TTSProvider):
+    """Content-addressed disk cache of synthesized audio in front of another TTS provider.
+
+    Audio is keyed by the normalized text, voice, provider, TTS model and a hash of the provider's
+    voice instructions. Files are evicted least recently used first once the cache outgrows
+    max_bytes; the index lives in SQLite so worker processes share the cache. Index queries and
+    file operations run in threads, off the event loop.
+    """
+
+    def __init__(
+        self,
+        provider: TTSProvider,
+        cache_dir: Path | None = None,
+        max_bytes: int | None = None,
+    ) -> None:
+        self.provider = provider
+        self.cache_dir = cache_dir or config.TTS_CACHE_DIR
+        self.max_bytes = max_bytes or int(config.TTS_CACHE_MAX_MB * 1024 * 1024)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / "index.db"
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tts_cache (
+                    key TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM tts_cache").fetchone()[0]
+        TTS_CACHE_BYTES.set(total)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.db_path, timeout=10)) as conn, conn:
+            yield conn
+
+    def cache_key(self, text: str, voice: str | None) -> str:
+        return hash_text(
+            normalize_tts_text(text),
+            voice,
+            type(self.provider).__name__,
+            config.TTS_MODEL,
+            hash_text(getattr(self.provider, "instructions", None)),
+        )
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.mp3"
+
+    def lookup(self, key: str) -> Path | None:
+        """Returns the cached file for a key and marks it as recently used."""
+        path = self._path(key)
+        with self._connect() as conn:
+            found = conn.execute(
+                "UPDATE tts_cache SET last_used = ? WHERE key = ?", (time.time(), key)
+            ).rowcount
+        hit = bool(found) and path.exists()
+        record_cache_lookup("tts", hit)
+        return path if hit else None
+
+    def store(self, key: str, source: Path) -> None:
+        """Moves a finished audio file into the cache and evicts the least recently used files."""
+        path = self._path(key)
+        os.replace(source, path)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO tts_cache (key, size, last_used) VALUES (?, ?, ?)",
+                (key, path.stat().st_size, time.time()),
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM tts_cache").fetchone()[0]
+            evicted = 0
+            if total > self.max_bytes:
+                rows = conn.execute(
+                    "SELECT key, size FROM tts_cache WHERE key != ? ORDER BY last_used", (key,)
+                ).fetchall()
+                for old_key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM tts_cache WHERE key = ?", (old_key,))
+                    self._path(old_key).unlink(missing_ok=True)
+                    total -= size
+                    evicted += 1
+        TTS_CACHE_BYTES.set(total)
+        if evicted:
+            logger.info(f"CachedTTS: evicted {evicted} files, {total} bytes cached")
+
+    def _open_cached(self, path: Path) -> BinaryIO | None:
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            # Evicted by another worker since the lookup
+            logger.info(f"CachedTTS: {path.name} was evicted, synthesizing again")
+            return None
+
+    def _copy_cached(self, path: Path, output_path: str) -> bool:
+        try:
+            shutil.copyfile(path, output_path)
+        except FileNotFoundError:
+            logger.info(f"CachedTTS: {path.name} was evicted, synthesizing again")
+            return False
+        return True
+
+    def _store_copy(self, key: str, audio_file: str) -> None:
+        part = self.cache_dir / f"{key}.{uuid.uuid4().hex[:8]}.part"
+        shutil.copyfile(audio_file, part)
+        self.store(key, part)
+
+    async def speak(self, text: str, output_path: str, voice: str | None = None) -> str:
+        key = self.cache_key(text, voice)
+        cached = await asyncio.to_thread(self.lookup, key)
+        if cached is not None and await asyncio.to_thread(self._copy_cached, cached, output_path):
+            logger.info(f"CachedTTS: cache hit for text (len={len(text)}), voice={voice}")
+            return output_path
+
+        audio_file = await self.provider.speak(text, output_path, voice=voice)
+        await asyncio.to_thread(self._store_copy, key, audio_file)
+        return audio_file
+
+    async def stream(self, text: str, voice: str | None = None) -> AsyncGenerator[bytes, None]:
+        key = self.cache_key(text, voice)
+        cached = await asyncio.to_thread(self.lookup, key)
+        cached_file = await asyncio.to_thread(self._open_cached, cached) if cached else None
+        if cached_file is not None:
+            logger.info(f"CachedTTS: cache hit for text (len={len(text)}), voice={voice}")
+            with cached_file:
+                while chunk := await asyncio.to_thread(
+                    cached_file.read, config.TTS_STREAM_CHUNK_SIZE
+                ):
+                    yield chunk
+            return
+
+        # The audio is written to the cache while it streams and kept only if the stream completes
+        part = self.cache_dir / f"{key}.{uuid.uuid4().hex[:8]}.part"
+        try:
+            with open(part, "wb") as f:
+                async with aclosing(self.provider.stream(text, voice=voice)) as chunks:
+                    async for chunk in chunks:
+                        await asyncio.to_thread(f.write, chunk)
+                        yield chunk
+            await asyncio.to_thread(self.store, key, part)
+        finally:
+            part.unlink(missing_ok=True)
@@ -4,14 +4,14 @@ import gradio as gr
 
 from app.core.models import AnalysisResult, DialogueTurn, ImageAttachment
 from app.services.session import get_session_service
+from app.services.speech_prefetch import get_speech_prefetcher
 from config.logger import logger
 from config.settings import config
 
 service = get_session_service()
 
 
-def format_transcript_html(content: str) -> str:
-    return f"""
+TRANSCRIPT_HTML_OPEN = """
     <div style="
         height: 500px;
         overflow-y: auto; 
@@ -23,33 +23,42 @@ def format_transcript_html(content: str) -> str:
         line-height: 1.6;
         color: #1f2937;
     ">
-        {content}
-    </div>
+        """
+
+CRITERIA_CARDS_OPEN = """
+    <div style="display: flex; flex-direction: column; gap: 12px; font-family: system-ui, -apple-system, sans-serif;">
     """
 
+RECOMMENDATIONS_HTML_OPEN = """
+    <div style="
+        display: flex;
+        flex-direction: column;
+        gap: 12px;
+        font-family: system-ui, -apple-system, sans-serif;
+    ">
+    """
 
-def format_criteria_cards(criteria_list: list) -> str:
-    if not criteria_list:
-        return "<div>No evaluation data available</div>"
 
-    cards_html = """
-    <div style="display: flex; flex-direction: column; gap: 12px; font-family: system-ui, -apple-system, sans-serif;">
+def format_transcript_html(content: str) -> str:
+    return f"""{TRANSCRIPT_HTML_OPEN}{content}
+    </div>
     """
 
-    for criterion in criteria_list:
-        score = criterion["score"]
-
-        if score >= 4:
-            color = "#166534"
-            bg_color = "#dcfce7"
-        elif score == 3:
-            color = "#92400e"
-            bg_color = "#fef3c7"
-        else:
-            color = "#991b1b"
-            bg_color = "#fee2e2"
-
-        cards_html += f"""
+
+def format_criterion_card(criterion: dict) -> str:
+    score = criterion["score"]
+
+    if score >= 4:
+        color = "#166534"
+        bg_color = "#dcfce7"
+    elif score == 3:
+        color = "#92400e"
+        bg_color = "#fef3c7"
+    else:
+        color = "#991b1b"
+        bg_color = "#fee2e2"
+
+    return f"""
         <div style="
             border: 1px solid #e5e7eb;
             border-radius: 8px;
@@ -73,6 +82,16 @@ def format_criteria_cards(criteria_list: list) -> str:
         </div>
         """
 
+
+def format_criteria_cards(criteria_list: list) -> str:
+    if not criteria_list:
+        return "<div>No evaluation data available</div>"
+
+    cards_html = CRITERIA_CARDS_OPEN
+
+    for criterion in criteria_list:
+        cards_html += format_criterion_card(criterion)
+
     cards_html += "</div>"
     return cards_html
 
@@ -93,17 +112,17 @@ def format_recommendations_html(recommendations: list[str]) -> str:
         </div>
         """
 
-    html = """
-    <div style="
-        display: flex;
-        flex-direction: column;
-        gap: 12px;
-        font-family: system-ui, -apple-system, sans-serif;
-    ">
-    """
+    html = RECOMMENDATIONS_HTML_OPEN
 
     for idx, rec in enumerate(recommendations, 1):
-        html += f"""
+        html += format_recommendation_item(idx, rec)
+
+    html += "</div>"
+    return html
+
+
+def format_recommendation_item(idx: int, rec: str) -> str:
+    return f"""
         <div style="
             border-left: 4px solid #4b5563;
             padding: 12px 16px;
@@ -133,9 +152,6 @@ def format_recommendations_html(recommendations: list[str]) -> str:
         </div>
         """
 
-    html += "</div>"
-    return html
-
 
 def format_data_card(title: str, content: str, emoji: str = "") -> str:
     display_title = f"{emoji} {title}" if emoji else title
@@ -179,15 +195,7 @@ def format_data_card(title: str, content: str, emoji: str = "") -> str:
     """
 
 
-def format_general_comment(comment: str) -> str:
-    if not comment:
-        comment = "No general comment provided."
-        color = "#9ca3af"
-        style = "font-style: italic;"
-    else:
-        color = "#1f2937"
-        style = ""
-
+def format_general_comment_open(color: str = "#1f2937", style: str = "") -> str:
     return f"""
     <div style="
         border: 1px solid #e5e7eb;
@@ -206,7 +214,19 @@ def format_general_comment(comment: str) -> str:
             color: {color};
             line-height: 1.6;
             {style}
-        ">{comment}</div>
+        ">"""
+
+
+def format_general_comment(comment: str) -> str:
+    if not comment:
+        comment = "No general comment provided."
+        color = "#9ca3af"
+        style = "font-style: italic;"
+    else:
+        color = "#1f2937"
+        style = ""
+
+    return f"""{format_general_comment_open(color, style)}{comment}</div>
     </div>
     """
 
@@ -536,21 +556,40 @@ async def generate_and_analyze(
     )
 
 
-async def play_recommendations(recommendations_text: str) -> tuple[str | None, dict]:
+async def play_recommendations(
+    recommendations_text: str,
+) -> AsyncIterator[tuple[bytes | dict | None, dict]]:
     if not recommendations_text or not recommendations_text.strip():
         logger.warning("No recommendations to play")
-        return None, gr.update(interactive=True, value="🔊 Play Recommendations Audio")
+        yield None, gr.update(interactive=True, value="🔊 Play Recommendations Audio")
+        return
+
+    prefetched = get_speech_prefetcher().ready(recommendations_text, config.DEFAULT_TTS_VOICE)
+    if prefetched:
+        logger.info(f"Recommendations audio pre-synthesized: {prefetched}")
+        try:
+            with open(prefetched, "rb") as f:
+                audio = f.read()
+        except FileNotFoundError:
+            # Evicted by the prefetcher in the meantime; streamed below instead
+            audio = None
+        if audio is not None:
+            yield audio, gr.update(interactive=True, value="🔊 Play Recommendations Audio")
+            return
 
     try:
-        logger.info("Generating recommendations audio...")
-        audio_path = await service.text_to_speech(
+        logger.info("Streaming recommendations audio...")
+        # Audio chunks are played as they are synthesized instead of after the whole file
+        async for chunk in service.stream_speech(
             text=recommendations_text, voice=config.DEFAULT_TTS_VOICE
-        )
-        logger.info(f"Recommendations audio ready: {audio_path}")
-        return audio_path, gr.update(interactive=True, value="🔊 Play Recommendations Audio")
+        ):
+            yield chunk, gr.update(interactive=False)
+        logger.info("Recommendations audio streamed")
+        # gr.update() leaves the streamed audio in place
+        yield gr.update(), gr.update(interactive=True, value="🔊 Play Recommendations Audio")
     except Exception as e:
         logger.error(f"Error generating recommendations audio: {e}")
-        return None, gr.update(interactive=True, value="🔊 Play Recommendations Audio")
+        yield gr.update(), gr.update(interactive=True, value="🔊 Play Recommendations Audio")
 
 
 def toggle_analyze_button(audio_path: str | None) -> dict:
@@ -703,7 +742,11 @@ def create_app() -> gr.Blocks:
                     "🔊 Play Recommendations Audio", variant="secondary", size="sm"
                 )
                 recs_audio_output = gr.Audio(
-                    label="Recommendations Audio", visible=True, interactive=False, autoplay=True
+                    label="Recommendations Audio",
+                    visible=True,
+                    interactive=False,
+                    autoplay=True,
+                    streaming=True,
                 )
 
             with gr.Column():
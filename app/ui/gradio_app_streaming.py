@@ -1,14 +1,43 @@
 import asyncio
-from collections.abc import AsyncIterator
+import html
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from concurrent.futures import Future
+from contextlib import aclosing
+from functools import partial
+from typing import Any
 
 import gradio as gr
 
-from app.core.models import DialogueTurn, GeneratedDialogue, ImageAttachment
+from app.core.models import (
+    DialogueTurn,
+    EvaluationCriterion,
+    GeneratedDialogue,
+    ImageAttachment,
+    Medication,
+)
+from app.services.dialogue_pool import get_dialogue_pool
+from app.services.jobs import get_job_manager
+from app.services.metrics import record_upload
 from app.services.session_streaming import get_streaming_session_service
+from app.services.speech_prefetch import recommendations_speech_text
+from app.services.stream_events import (
+    OP_ADD_ITEMS,
+    OP_APPEND,
+    OP_REPLACE,
+    OP_SNAPSHOT,
+    AnalysisViewState,
+    coalesce_frames,
+)
 from app.ui.gradio_app import (
+    CRITERIA_CARDS_OPEN,
+    RECOMMENDATIONS_HTML_OPEN,
+    TRANSCRIPT_HTML_OPEN,
     format_criteria_cards,
+    format_criterion_card,
     format_data_card,
     format_general_comment,
+    format_general_comment_open,
+    format_recommendation_item,
     format_recommendations_html,
     format_status,
     format_transcript_html,
@@ -17,6 +46,7 @@ from app.ui.gradio_app import (
 )
 from config.logger import logger
 from config.prompts import get_dialogue_generation_prompt
+from config.settings import config
 
 
 def format_markdown_card(content: str) -> str:
@@ -31,6 +61,18 @@ def format_markdown_card(content: str) -> str:
 
 
 streaming_service = get_streaming_session_service()
+job_manager = get_job_manager()
+# Upload analyses run as jobs on the job manager's event loop, with their own service and clients
+job_service = get_streaming_session_service()
+
+LOADING_HTML = "<div style='padding: 20px; text-align: center; color: #6b7280;'>⏳ Loading...</div>"
+
+
+def cancel_pending_tasks(*tasks: asyncio.Task | None) -> None:
+    for task in tasks:
+        if task is not None and not task.done():
+            logger.info(f"Cancelling in-flight task: {task.get_name()}")
+            task.cancel()
 
 
 def format_transcript_highlighted_streaming(formatted_transcript: str) -> str:
@@ -42,6 +84,319 @@ def format_transcript_highlighted_streaming(formatted_transcript: str) -> str:
     return "<div style='padding: 20px; text-align: center; color: #6b7280;'>⏳ Loading...</div>"
 
 
+def format_transcript_preview(raw_transcript: str) -> str:
+    return format_transcript_html(
+        "<div style='color: #6b7280; font-style: italic; margin-bottom: 8px;'>"
+        "Raw transcript preview, identifying speakers...</div>"
+        + html.escape(raw_transcript).replace("\n", "<br>")
+    )
+
+
+STAGE_STATUS_MESSAGES = {
+    "transcript": "🔍 Formatting and highlighting transcript...",
+    "complaints": "📝 Extracting patient complaints...",
+    "diagnosis": "🩺 Identifying diagnosis...",
+    "medications": "💊 Extracting prescribed medications...",
+    "recommendations": "⚠️ Generating clinical recommendations...",
+    "criteria": "📊 Evaluating doctor performance...",
+    "general_comment": "✍️ Writing general evaluation...",
+}
+
+
+def format_medications_text(medications: list[Medication]) -> str:
+    lines = []
+    for m in medications:
+        med_str = f"- {m.name}"
+        if m.dosage:
+            med_str += f" ({m.dosage})"
+        if m.frequency:
+            med_str += f", {m.frequency}"
+        lines.append(med_str)
+    return "\n".join(lines) if lines else "No prescriptions"
+
+
+def criterion_to_dict(criterion: EvaluationCriterion) -> dict:
+    return {"name": criterion.name, "score": criterion.score, "comment": criterion.comment}
+
+
+class StreamingAnalysisView:
+    """Applies delta events from the analysis stream to the rendered output panels.
+
+    Panels that are still streaming are rendered without their closing tags, so each update only
+    extends the previous HTML and Gradio sends just the appended suffix to the browser. A panel
+    is re-rendered in full only when its stage completes.
+    """
+
+    def __init__(self, transcript_html: str, image_findings_html: str) -> None:
+        self.state = AnalysisViewState()
+        self.transcript_html = transcript_html
+        self.recs_html = LOADING_HTML
+        self.recs_text = ""
+        self.eval_html = LOADING_HTML
+        self.gen_comment_html = LOADING_HTML
+        self.complaints_html = LOADING_HTML
+        self.diagnosis_html = LOADING_HTML
+        self.meds_html = LOADING_HTML
+        self.image_findings_html = image_findings_html
+        self.status_html = format_status("🔄 Starting consultation analysis...", False)
+        self.complete = False
+        self.failed = False
+        self._open_panels: set[str] = set()
+
+    def apply(self, update: dict[str, Any]) -> bool:
+        if not self.state.apply(update):
+            return False
+
+        stage = update["stage"]
+        status = update["status"]
+        op = update.get("op", OP_REPLACE)
+        data = update.get("data")
+
+        if stage == "complete":
+            self.complete = True
+            self.status_html = format_status("Analysis complete!", True)
+            return True
+        if stage == "error":
+            self.failed = True
+            self.status_html = format_status(f"Error: {data}", False)
+            return True
+
+        if status == "starting":
+            self._set_status(stage)
+            return True
+
+        if stage == "image_report":
+            self.image_findings_html = format_markdown_card(content=data or "")
+            return True
+
+        if stage == "transcript_preview":
+            # Shown until the diarized transcript streams in its place
+            if not self.state.get("transcript"):
+                self.transcript_html = format_transcript_preview(data or "")
+            return True
+
+        if stage == "transcript":
+            self.transcript_html = self._render_text(
+                stage, op, data, TRANSCRIPT_HTML_OPEN, format_transcript_highlighted_streaming
+            )
+        elif stage == "general_comment":
+            self.gen_comment_html = self._render_text(
+                stage, op, data, format_general_comment_open(), format_general_comment
+            )
+        elif stage == "recommendations":
+            self.recs_html = self._render_items(
+                stage,
+                op,
+                data,
+                RECOMMENDATIONS_HTML_OPEN,
+                format_recommendation_item,
+                format_recommendations_html,
+                self.recs_html,
+            )
+            self.recs_text = recommendations_speech_text(self.state.get(stage) or [])
+        elif stage == "criteria":
+            self.eval_html = self._render_items(
+                stage,
+                op,
+                data,
+                CRITERIA_CARDS_OPEN,
+                lambda _, criterion: format_criterion_card(criterion_to_dict(criterion)),
+                lambda criteria: format_criteria_cards([criterion_to_dict(c) for c in criteria]),
+                self.eval_html,
+            )
+        elif stage == "complaints":
+            complaints_text = "\n".join([f"- {c}" for c in data or []])
+            self.complaints_html = format_data_card(
+                title="Complaints", content=complaints_text or "No complaints recorded"
+            )
+        elif stage == "diagnosis":
+            self.diagnosis_html = format_data_card(
+                title="Diagnosis", content=data or "Not established"
+            )
+        elif stage == "medications":
+            self.meds_html = format_data_card(
+                title="Medications", content=format_medications_text(data or [])
+            )
+
+        self._set_status(stage)
+        return True
+
+    def outputs(self, input_controls: int) -> tuple:
+        finished = self.complete or self.failed
+        has_recs = bool(self.recs_text and self.recs_text.strip())
+        return (
+            self.transcript_html,
+            self.recs_html,
+            self.recs_text,
+            self.eval_html,
+            self.gen_comment_html,
+            self.complaints_html,
+            self.diagnosis_html,
+            self.meds_html,
+            self.image_findings_html,
+            self.status_html,
+            *[gr.update(interactive=finished) for _ in range(input_controls)],
+            gr.update(interactive=self.complete and has_recs),
+            gr.update(open=False),
+        )
+
+    def _set_status(self, stage: str) -> None:
+        message = STAGE_STATUS_MESSAGES.get(stage)
+        if not message:
+            return
+        if stage == "recommendations":
+            message += f" ({len(self.state.get(stage) or [])} so far)"
+        elif stage == "criteria":
+            message += f" ({len(self.state.get(stage) or [])} criteria)"
+        self.status_html = format_status(message, False)
+
+    def _render_text(
+        self,
+        stage: str,
+        op: str,
+        data: Any,
+        open_html: str,
+        render_complete: Callable[[str], str],
+    ) -> str:
+        if op == OP_APPEND:
+            if stage not in self._open_panels:
+                self._open_panels.add(stage)
+                return open_html + self.state.get(stage, "")
+            return self._current_html(stage) + data
+        if op == OP_SNAPSHOT:
+            self._open_panels.add(stage)
+            return open_html + (data or "")
+        self._open_panels.discard(stage)
+        return render_complete(data or "")
+
+    def _render_items(
+        self,
+        stage: str,
+        op: str,
+        data: Any,
+        open_html: str,
+        render_item: Callable[[int, Any], str],
+        render_complete: Callable[[list], str],
+        current_html: str,
+    ) -> str:
+        items = self.state.get(stage) or []
+        if op == OP_ADD_ITEMS and stage in self._open_panels:
+            first_idx = len(items) - len(data) + 1
+            return current_html + "".join(
+                render_item(idx, item) for idx, item in enumerate(data, first_idx)
+            )
+        if op in (OP_ADD_ITEMS, OP_SNAPSHOT):
+            self._open_panels.add(stage)
+            return open_html + "".join(render_item(idx, item) for idx, item in enumerate(items, 1))
+        self._open_panels.discard(stage)
+        return render_complete(data or [])
+
+    def _current_html(self, stage: str) -> str:
+        return self.transcript_html if stage == "transcript" else self.gen_comment_html
+
+
+async def stream_analysis_outputs(
+    transcript: list[DialogueTurn] | AsyncIterator[list[DialogueTurn]],
+    image_report: str | asyncio.Future[str] | None,
+    transcript_html: str,
+    image_findings_html: str,
+    input_controls: int,
+) -> AsyncIterator[tuple]:
+    updates = streaming_service.analyze_consultation_streaming(transcript, image_report)
+    async for outputs in render_analysis_updates(
+        updates, transcript_html, image_findings_html, input_controls
+    ):
+        yield outputs
+
+
+async def render_analysis_updates(
+    updates: AsyncGenerator[dict[str, Any], None],
+    transcript_html: str,
+    image_findings_html: str,
+    input_controls: int,
+) -> AsyncIterator[tuple]:
+    view = StreamingAnalysisView(transcript_html, image_findings_html)
+    async with aclosing(updates), aclosing(coalesce_frames(updates)) as frames:
+        async for frame in frames:
+            changed = False
+            for update in frame:
+                changed = view.apply(update) or changed
+            if changed:
+                yield view.outputs(input_controls)
+
+
+async def follow_job_outputs(job_id: str, input_controls: int) -> AsyncIterator[tuple]:
+    job = job_manager.get(job_id) if job_id else None
+    if job is None:
+        view = StreamingAnalysisView(LOADING_HTML, "*⏳ Loading...*")
+        view.failed = True
+        view.status_html = format_status(f"Unknown analysis job: {job_id}", False)
+        yield view.outputs(input_controls)
+        return
+
+    # Every subscriber replays the job from its first event, so reconnecting clients catch up;
+    # closing the subscription leaves the job running
+    async for outputs in render_analysis_updates(
+        job.subscribe(), LOADING_HTML, "*⏳ Loading...*", input_controls
+    ):
+        yield outputs
+
+
+def submit_visit_job(audio_path: str | None, images: list | None) -> str:
+    if not audio_path:
+        return ""
+
+    image_attachments: list[ImageAttachment] = []
+    for img_path in images or []:
+        if isinstance(img_path, str):
+            image_attachments.append(ImageAttachment(file_path=img_path))
+        elif hasattr(img_path, "name"):
+            image_attachments.append(ImageAttachment(file_path=img_path.name))
+
+    record_upload("audio", [audio_path])
+    record_upload("image", [img.file_path for img in image_attachments])
+
+    job = job_manager.submit(
+        partial(job_service.analyze_upload_streaming, audio_path, image_attachments or None)
+    )
+    return job.job_id
+
+
+def _log_upload_speculation(future: Future[None]) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"✗ Speculative upload work failed: {future.exception()}")
+
+
+def speculate_upload(audio_path: str | None, images: list | None, request: gr.Request) -> None:
+    image_attachments: list[ImageAttachment] = []
+    for img_path in images or []:
+        if isinstance(img_path, str):
+            image_attachments.append(ImageAttachment(file_path=img_path))
+        elif hasattr(img_path, "name"):
+            image_attachments.append(ImageAttachment(file_path=img_path.name))
+
+    # Runs next to the upload jobs, so the analysis of the same files can take the work over
+    future = job_manager.run_coroutine(
+        job_service.speculate_upload(
+            request.session_hash or "", audio_path, image_attachments or None
+        )
+    )
+    future.add_done_callback(_log_upload_speculation)
+
+
+def release_upload(request: gr.Request) -> None:
+    future = job_manager.run_coroutine(
+        job_service.speculate_upload(request.session_hash or "", None)
+    )
+    future.add_done_callback(_log_upload_speculation)
+
+
+async def follow_analysis_job(job_id: str) -> AsyncIterator[tuple]:
+    logger.info(f"Following analysis job: {job_id}")
+    async for outputs in follow_job_outputs(job_id.strip(), input_controls=3):
+        yield outputs
+
+
 async def analyze_images_only(images: list) -> AsyncIterator[tuple]:
     loading_html = (
         "<div style='padding: 20px; text-align: center; color: #6b7280;'>⏳ Loading...</div>"
@@ -56,6 +411,7 @@ async def analyze_images_only(images: list) -> AsyncIterator[tuple]:
             image_attachments.append(ImageAttachment(file_path=img_path.name))
 
     logger.info(f"Analyzing {len(image_attachments)} image(s) without audio...")
+    record_upload("image", [img.file_path for img in image_attachments])
 
     yield (
         "<div style='padding: 20px; text-align: center; color: #6b7280;'>No audio provided - analyzing images only...</div>",
@@ -75,7 +431,10 @@ async def analyze_images_only(images: list) -> AsyncIterator[tuple]:
         gr.update(open=False),
     )
 
-    image_report = await streaming_service.analyze_images_only(image_attachments)
+    # Runs on the job loop to take over the image analysis started on upload
+    image_report = await asyncio.wrap_future(
+        job_manager.run_coroutine(job_service.analyze_images(image_attachments))
+    )
 
     image_findings_html = format_markdown_card(content=image_report)
 
@@ -98,7 +457,9 @@ async def analyze_images_only(images: list) -> AsyncIterator[tuple]:
     )
 
 
-async def analyze_visit_streaming(audio_path: str, images: list | None) -> AsyncIterator[tuple]:
+async def analyze_visit_streaming(
+    job_id: str, audio_path: str, images: list | None
+) -> AsyncIterator[tuple]:
     loading_html = (
         "<div style='padding: 20px; text-align: center; color: #6b7280;'>⏳ Loading...</div>"
     )
@@ -162,323 +523,26 @@ async def analyze_visit_streaming(audio_path: str, images: list | None) -> Async
         gr.update(open=False),
     )
 
-    transcript_task = asyncio.create_task(streaming_service._stt.transcribe(audio_path))
+    # The analysis runs as a background job (submit_visit_job); this client follows its events
+    async for outputs in follow_job_outputs(job_id, input_controls=3):
+        yield outputs
 
-    image_task = None
-    if image_attachments:
-        image_task = asyncio.create_task(streaming_service._llm.analyze_images(image_attachments))
-
-    transcript_raw = await transcript_task
-    logger.info(f"Transcription completed: {len(transcript_raw)} turns")
-
-    raw_transcript_text = "\n".join([f"{turn.speaker}: {turn.text}" for turn in transcript_raw])
-    transcript_display = f"""
-    <div style="
-        border: 1px solid #e5e7eb;
-        border-radius: 8px;
-        padding: 16px;
-        background-color: #ffffff;
-        font-family: system-ui, -apple-system, sans-serif;
-    ">
-        <div style="font-weight: 600; color: #1f2937; margin-bottom: 12px;">📝 Raw Transcript</div>
-        <pre style="
-            white-space: pre-wrap;
-            font-family: monospace;
-            margin: 0;
-            color: #1f2937;
-            background-color: #f9fafb;
-            padding: 12px;
-            border-radius: 4px;
-        ">{raw_transcript_text}</pre>
-    </div>
-    """
 
-    status_after_transcript = "✅ Transcription complete"
-    if image_task:
-        status_after_transcript += " | ⏳ Still processing images..."
-    else:
-        status_after_transcript += " | 🔄 Starting analysis..."
+async def generate_dialogue(diagnosis: str | None, doctor_skill: int) -> GeneratedDialogue:
+    if config.DIALOGUE_POOL_ENABLED:
+        dialogue_pool = get_dialogue_pool()
+        pooled = await asyncio.to_thread(dialogue_pool.take, diagnosis, doctor_skill)
+        # The pool's client lives on the job loop, where it is topped up in the background
+        job_manager.run_coroutine(dialogue_pool.refill(diagnosis, doctor_skill))
+        if pooled:
+            logger.info(f"Dialogue taken from the pool: {len(pooled.dialogue)} turns")
+            return pooled
 
-    yield (
-        transcript_display,
-        loading_html,
-        "",
-        loading_html,
-        loading_html,
-        loading_html,
-        loading_html,
-        loading_html,
-        "*⏳ Loading...*",
-        format_status(status_after_transcript, False),
-        gr.update(interactive=False),
-        gr.update(interactive=False),
-        gr.update(interactive=False),
-        gr.update(interactive=False),
-        gr.update(open=False),
+    system_prompt = get_dialogue_generation_prompt(diagnosis=diagnosis, doctor_skill=doctor_skill)
+    return await streaming_service._llm.generate_dialogue(
+        system_prompt=system_prompt, diagnosis=diagnosis
     )
 
-    image_report: str | None = None
-    image_findings_html = "*⏳ Loading...*"
-    if image_task:
-        image_report = await image_task
-        logger.info("Image analysis completed")
-        image_findings_html = format_markdown_card(content=image_report)
-
-        yield (
-            transcript_display,
-            loading_html,
-            "",
-            loading_html,
-            loading_html,
-            loading_html,
-            loading_html,
-            loading_html,
-            image_findings_html,
-            format_status("✅ Images analyzed | 🔄 Starting consultation analysis...", False),
-            gr.update(interactive=False),
-            gr.update(interactive=False),
-            gr.update(interactive=False),
-            gr.update(interactive=False),
-            gr.update(open=False),
-        )
-
-    transcript_html = loading_html
-    recs_html = loading_html
-    recs_text = ""
-    eval_html = loading_html
-    gen_comment_html = loading_html
-    complaints_html = loading_html
-    diagnosis_html = loading_html
-    meds_html = loading_html
-
-    async for update in streaming_service.analyze_consultation_streaming(
-        transcript_raw, image_report
-    ):
-        stage = update.get("stage")
-        status = update.get("status")
-        data = update.get("data")
-
-        if stage == "transcript":
-            if status == "streaming" and data:
-                transcript_html = format_transcript_highlighted_streaming(data)
-                yield (
-                    transcript_html,
-                    recs_html,
-                    recs_text,
-                    eval_html,
-                    gen_comment_html,
-                    complaints_html,
-                    diagnosis_html,
-                    meds_html,
-                    image_findings_html,
-                    format_status("🔍 Formatting and highlighting transcript...", False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(open=False),
-                )
-            elif status == "complete" and data:
-                transcript_html = format_transcript_highlighted_streaming(data)
-
-        elif stage == "complaints":
-            if status == "streaming" and data:
-                complaints_text = "\n".join([f"- {c}" for c in data])
-                if not complaints_text:
-                    complaints_text = "No complaints recorded"
-                complaints_html = format_data_card(title="Complaints", content=complaints_text)
-
-                yield (
-                    transcript_html,
-                    recs_html,
-                    recs_text,
-                    eval_html,
-                    gen_comment_html,
-                    complaints_html,
-                    diagnosis_html,
-                    meds_html,
-                    image_findings_html,
-                    format_status("📝 Extracting patient complaints...", False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(open=False),
-                )
-
-        elif stage == "diagnosis":
-            if status == "streaming" and data:
-                diagnosis_text = data or "Not established"
-                diagnosis_html = format_data_card(title="Diagnosis", content=diagnosis_text)
-
-                yield (
-                    transcript_html,
-                    recs_html,
-                    recs_text,
-                    eval_html,
-                    gen_comment_html,
-                    complaints_html,
-                    diagnosis_html,
-                    meds_html,
-                    image_findings_html,
-                    format_status("🩺 Identifying diagnosis...", False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(open=False),
-                )
-
-        elif stage == "medications":
-            if status == "streaming" and data:
-                medications = []
-                for m in data:
-                    med_str = f"- {m.name}"
-                    if m.dosage:
-                        med_str += f" ({m.dosage})"
-                    if m.frequency:
-                        med_str += f", {m.frequency}"
-                    medications.append(med_str)
-                meds_text = "\n".join(medications) if medications else "No prescriptions"
-                meds_html = format_data_card(title="Medications", content=meds_text)
-
-                yield (
-                    transcript_html,
-                    recs_html,
-                    recs_text,
-                    eval_html,
-                    gen_comment_html,
-                    complaints_html,
-                    diagnosis_html,
-                    meds_html,
-                    image_findings_html,
-                    format_status("💊 Extracting prescribed medications...", False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(open=False),
-                )
-
-        elif stage == "recommendations":
-            if status == "streaming" and data:
-                recs_html = format_recommendations_html(data)
-                recs_text = "\n\n".join(data) if data else ""
-
-                yield (
-                    transcript_html,
-                    recs_html,
-                    recs_text,
-                    eval_html,
-                    gen_comment_html,
-                    complaints_html,
-                    diagnosis_html,
-                    meds_html,
-                    image_findings_html,
-                    format_status(
-                        f"⚠️ Generating clinical recommendations... ({len(data)} so far)", False
-                    ),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(open=False),
-                )
-
-        elif stage == "criteria":
-            if status == "streaming" and data:
-                criteria_data = []
-                for criterion in data:
-                    criteria_data.append(
-                        {
-                            "name": criterion.name,
-                            "score": criterion.score,
-                            "comment": criterion.comment,
-                        }
-                    )
-                eval_html = format_criteria_cards(criteria_data)
-
-                yield (
-                    transcript_html,
-                    recs_html,
-                    recs_text,
-                    eval_html,
-                    gen_comment_html,
-                    complaints_html,
-                    diagnosis_html,
-                    meds_html,
-                    image_findings_html,
-                    format_status(
-                        f"📊 Evaluating doctor performance... ({len(data)} criteria)", False
-                    ),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(open=False),
-                )
-
-        elif stage == "general_comment":
-            if status == "streaming" and data:
-                gen_comment_html = format_general_comment(data)
-
-                yield (
-                    transcript_html,
-                    recs_html,
-                    recs_text,
-                    eval_html,
-                    gen_comment_html,
-                    complaints_html,
-                    diagnosis_html,
-                    meds_html,
-                    image_findings_html,
-                    format_status("✍️ Writing general evaluation...", False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(open=False),
-                )
-
-        elif stage == "complete":
-            has_recs = bool(recs_text and recs_text.strip())
-            yield (
-                transcript_html,
-                recs_html,
-                recs_text,
-                eval_html,
-                gen_comment_html,
-                complaints_html,
-                diagnosis_html,
-                meds_html,
-                image_findings_html,
-                format_status("Analysis complete!", True),
-                gr.update(interactive=True),
-                gr.update(interactive=True),
-                gr.update(interactive=True),
-                gr.update(interactive=has_recs),
-                gr.update(open=False),
-            )
-
-        elif stage == "error":
-            yield (
-                transcript_html,
-                recs_html,
-                recs_text,
-                eval_html,
-                gen_comment_html,
-                complaints_html,
-                diagnosis_html,
-                meds_html,
-                image_findings_html,
-                format_status(f"Error: {data}", False),
-                gr.update(interactive=True),
-                gr.update(interactive=True),
-                gr.update(interactive=True),
-                gr.update(interactive=False),
-                gr.update(open=False),
-            )
-
 
 async def generate_and_analyze_streaming(
     diagnosis: str | None, doctor_skill: int, images: list | None
@@ -497,6 +561,8 @@ async def generate_and_analyze_streaming(
                 image_attachments.append(ImageAttachment(file_path=img_path.name))
         logger.info(f"Processing {len(image_attachments)} image(s)")
 
+    record_upload("image", [img.file_path for img in image_attachments or []])
+
     status_text = "🎭 Generating dialogue"
     if image_attachments:
         status_text += f" & 📸 Analyzing {len(image_attachments)} image(s)"
@@ -526,75 +592,55 @@ async def generate_and_analyze_streaming(
         gr.update(open=False),
     )
 
-    system_prompt = get_dialogue_generation_prompt(diagnosis=diagnosis, doctor_skill=doctor_skill)
     dialogue_task = asyncio.create_task(
-        streaming_service._llm.generate_dialogue(system_prompt=system_prompt, diagnosis=diagnosis)
+        generate_dialogue(diagnosis, doctor_skill), name="dialogue_generation"
     )
 
-    image_task = None
+    image_task: asyncio.Task | None = None
     if image_attachments:
-        image_task = asyncio.create_task(streaming_service._llm.analyze_images(image_attachments))
-
-    generated_dialogue: GeneratedDialogue = await dialogue_task
-    logger.info(f"Dialogue generation completed: {len(generated_dialogue.dialogue)} turns")
-
-    transcript_turns = [
-        DialogueTurn(speaker=turn.role, text=turn.text) for turn in generated_dialogue.dialogue
-    ]
-
-    raw_transcript_text = "\n".join([f"{turn.speaker}: {turn.text}" for turn in transcript_turns])
-    transcript_display = f"""
-    <div style="
-        border: 1px solid #e5e7eb;
-        border-radius: 8px;
-        padding: 16px;
-        background-color: #ffffff;
-        font-family: system-ui, -apple-system, sans-serif;
-    ">
-        <div style="font-weight: 600; color: #1f2937; margin-bottom: 12px;">📝 Raw Transcript</div>
-        <pre style="
-            white-space: pre-wrap;
-            font-family: monospace;
-            margin: 0;
-            color: #1f2937;
-            background-color: #f9fafb;
-            padding: 12px;
-            border-radius: 4px;
-        ">{raw_transcript_text}</pre>
-    </div>
-    """
+        image_session_id = await streaming_service.get_upload_session_id(None, image_attachments)
+        image_task = asyncio.create_task(
+            streaming_service.analyze_images(image_attachments, image_session_id),
+            name="image_analysis",
+        )
 
-    status_after_dialogue = "✅ Dialogue generated"
-    if image_task:
-        status_after_dialogue += " | ⏳ Still processing images..."
-    else:
-        status_after_dialogue += " | 🔄 Starting analysis..."
+    try:
+        generated_dialogue: GeneratedDialogue = await dialogue_task
+        logger.info(f"Dialogue generation completed: {len(generated_dialogue.dialogue)} turns")
 
-    yield (
-        transcript_display,
-        loading_html,
-        "",
-        loading_html,
-        loading_html,
-        loading_html,
-        loading_html,
-        loading_html,
-        "*⏳ Loading...*",
-        format_status(status_after_dialogue, False),
-        gr.update(interactive=False),
-        gr.update(interactive=False),
-        gr.update(interactive=False),
-        gr.update(interactive=False),
-        gr.update(interactive=False),
-        gr.update(open=False),
-    )
+        transcript_turns = [
+            DialogueTurn(speaker=turn.role, text=turn.text) for turn in generated_dialogue.dialogue
+        ]
 
-    image_report: str | None = None
-    image_findings_html = "*⏳ Loading...*"
-    if image_task:
-        image_report = await image_task
-        logger.info("Image analysis completed")
-        image_findings_html = format_markdown_card(content=image_report)
+        raw_transcript_text = "\n".join(
+            [f"{turn.speaker}: {turn.text}" for turn in transcript_turns]
+        )
+        transcript_display = f"""
+        <div style="
+            border: 1px solid #e5e7eb;
+            border-radius: 8px;
+            padding: 16px;
+            background-color: #ffffff;
+            font-family: system-ui, -apple-system, sans-serif;
+        ">
+            <div style="font-weight: 600; color: #1f2937; margin-bottom: 12px;">📝 Raw Transcript</div>
+            <pre style="
+                white-space: pre-wrap;
+                font-family: monospace;
+                margin: 0;
+                color: #1f2937;
+                background-color: #f9fafb;
+                padding: 12px;
+                border-radius: 4px;
+            ">{raw_transcript_text}</pre>
+        </div>
+        """
+
+        status_after_dialogue = "✅ Dialogue generated"
+        if image_task:
+            status_after_dialogue += " | ⏳ Still processing images..."
+        else:
+            status_after_dialogue += " | 🔄 Starting analysis..."
 
         yield (
             transcript_display,
@@ -605,8 +651,8 @@ async def generate_and_analyze_streaming(
             loading_html,
             loading_html,
             loading_html,
-            image_findings_html,
-            format_status("✅ Images analyzed | 🔄 Starting consultation analysis...", False),
+            "*⏳ Loading...*",
+            format_status(status_after_dialogue, False),
             gr.update(interactive=False),
             gr.update(interactive=False),
             gr.update(interactive=False),
@@ -615,252 +661,59 @@ async def generate_and_analyze_streaming(
             gr.update(open=False),
         )
 
-    transcript_html = loading_html
-    recs_html = loading_html
-    recs_text = ""
-    eval_html = loading_html
-    gen_comment_html = loading_html
-    complaints_html = loading_html
-    diagnosis_html = loading_html
-    meds_html = loading_html
-
-    async for update in streaming_service.analyze_consultation_streaming(
-        transcript_turns, image_report
-    ):
-        stage = update.get("stage")
-        status = update.get("status")
-        data = update.get("data")
-
-        if stage == "transcript":
-            if status == "streaming" and data:
-                transcript_html = format_transcript_highlighted_streaming(data)
-                yield (
-                    transcript_html,
-                    recs_html,
-                    recs_text,
-                    eval_html,
-                    gen_comment_html,
-                    complaints_html,
-                    diagnosis_html,
-                    meds_html,
-                    image_findings_html,
-                    format_status("🔍 Formatting and highlighting transcript...", False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(open=False),
-                )
-            elif status == "complete" and data:
-                transcript_html = format_transcript_highlighted_streaming(data)
-
-        elif stage == "complaints":
-            if status == "streaming" and data:
-                complaints_text = "\n".join([f"- {c}" for c in data])
-                if not complaints_text:
-                    complaints_text = "No complaints recorded"
-                complaints_html = format_data_card(title="Complaints", content=complaints_text)
-
-                yield (
-                    transcript_html,
-                    recs_html,
-                    recs_text,
-                    eval_html,
-                    gen_comment_html,
-                    complaints_html,
-                    diagnosis_html,
-                    meds_html,
-                    image_findings_html,
-                    format_status("📝 Extracting patient complaints...", False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(open=False),
-                )
-
-        elif stage == "diagnosis":
-            if status == "streaming" and data:
-                diagnosis_text = data or "Not established"
-                diagnosis_html = format_data_card(title="Diagnosis", content=diagnosis_text)
-
-                yield (
-                    transcript_html,
-                    recs_html,
-                    recs_text,
-                    eval_html,
-                    gen_comment_html,
-                    complaints_html,
-                    diagnosis_html,
-                    meds_html,
-                    image_findings_html,
-                    format_status("🩺 Identifying diagnosis...", False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(open=False),
-                )
+        image_report: str | None = None
+        image_findings_html = "*⏳ Loading...*"
+        if image_task:
+            image_report = await image_task
+            logger.info("Image analysis completed")
+            image_findings_html = format_markdown_card(content=image_report)
 
-        elif stage == "medications":
-            if status == "streaming" and data:
-                medications = []
-                for m in data:
-                    med_str = f"- {m.name}"
-                    if m.dosage:
-                        med_str += f" ({m.dosage})"
-                    if m.frequency:
-                        med_str += f", {m.frequency}"
-                    medications.append(med_str)
-                meds_text = "\n".join(medications) if medications else "No prescriptions"
-                meds_html = format_data_card(title="Medications", content=meds_text)
-
-                yield (
-                    transcript_html,
-                    recs_html,
-                    recs_text,
-                    eval_html,
-                    gen_comment_html,
-                    complaints_html,
-                    diagnosis_html,
-                    meds_html,
-                    image_findings_html,
-                    format_status("💊 Extracting prescribed medications...", False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(open=False),
-                )
-
-        elif stage == "recommendations":
-            if status == "streaming" and data:
-                recs_html = format_recommendations_html(data)
-                recs_text = "\n\n".join(data) if data else ""
-
-                yield (
-                    transcript_html,
-                    recs_html,
-                    recs_text,
-                    eval_html,
-                    gen_comment_html,
-                    complaints_html,
-                    diagnosis_html,
-                    meds_html,
-                    image_findings_html,
-                    format_status(
-                        f"⚠️ Generating clinical recommendations... ({len(data)} so far)", False
-                    ),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(open=False),
-                )
-
-        elif stage == "criteria":
-            if status == "streaming" and data:
-                criteria_data = []
-                for criterion in data:
-                    criteria_data.append(
-                        {
-                            "name": criterion.name,
-                            "score": criterion.score,
-                            "comment": criterion.comment,
-                        }
-                    )
-                eval_html = format_criteria_cards(criteria_data)
-
-                yield (
-                    transcript_html,
-                    recs_html,
-                    recs_text,
-                    eval_html,
-                    gen_comment_html,
-                    complaints_html,
-                    diagnosis_html,
-                    meds_html,
-                    image_findings_html,
-                    format_status(
-                        f"📊 Evaluating doctor performance... ({len(data)} criteria)", False
-                    ),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(open=False),
-                )
-
-        elif stage == "general_comment":
-            if status == "streaming" and data:
-                gen_comment_html = format_general_comment(data)
-
-                yield (
-                    transcript_html,
-                    recs_html,
-                    recs_text,
-                    eval_html,
-                    gen_comment_html,
-                    complaints_html,
-                    diagnosis_html,
-                    meds_html,
-                    image_findings_html,
-                    format_status("✍️ Writing general evaluation...", False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(interactive=False),
-                    gr.update(open=False),
-                )
-
-        elif stage == "complete":
-            has_recs = bool(recs_text and recs_text.strip())
-            yield (
-                transcript_html,
-                recs_html,
-                recs_text,
-                eval_html,
-                gen_comment_html,
-                complaints_html,
-                diagnosis_html,
-                meds_html,
-                image_findings_html,
-                format_status("Analysis complete!", True),
-                gr.update(interactive=True),
-                gr.update(interactive=True),
-                gr.update(interactive=True),
-                gr.update(interactive=True),
-                gr.update(interactive=has_recs),
-                gr.update(open=False),
-            )
-
-        elif stage == "error":
             yield (
-                transcript_html,
-                recs_html,
-                recs_text,
-                eval_html,
-                gen_comment_html,
-                complaints_html,
-                diagnosis_html,
-                meds_html,
+                transcript_display,
+                loading_html,
+                "",
+                loading_html,
+                loading_html,
+                loading_html,
+                loading_html,
+                loading_html,
                 image_findings_html,
-                format_status(f"Error: {data}", False),
-                gr.update(interactive=True),
-                gr.update(interactive=True),
-                gr.update(interactive=True),
-                gr.update(interactive=True),
+                format_status("✅ Images analyzed | 🔄 Starting consultation analysis...", False),
+                gr.update(interactive=False),
+                gr.update(interactive=False),
+                gr.update(interactive=False),
+                gr.update(interactive=False),
                 gr.update(interactive=False),
                 gr.update(open=False),
             )
 
+        async for outputs in stream_analysis_outputs(
+            transcript_turns,
+            image_report,
+            transcript_display,
+            image_findings_html,
+            input_controls=4,
+        ):
+            yield outputs
+    finally:
+        cancel_pending_tasks(dialogue_task, image_task)
+
+
+def stop_analysis(job_id: str) -> tuple:
+    logger.info("Analysis stopped by user")
+    if job_id:
+        job_manager.cancel(job_id)
+    return (
+        format_status("⏹ Analysis stopped", False),
+        gr.update(interactive=True),
+        gr.update(interactive=True),
+        gr.update(interactive=True),
+        gr.update(interactive=True),
+        gr.update(interactive=True),
+        gr.update(interactive=True),
+        gr.update(interactive=True),
+    )
+
 
 def toggle_analyze_button(audio_path: str | None, images: list | None) -> tuple[dict, dict]:
     has_audio = audio_path and audio_path.strip()
@@ -911,6 +764,15 @@ footer {visibility: hidden}
         gr.Markdown("## 🏥 Medical AI Assistant Demo (Streaming Mode)")
 
         status_output = gr.HTML(value="", visible=True)
+        stop_btn = gr.Button("⏹ Stop Analysis", variant="stop", size="sm")
+        with gr.Row():
+            job_id_input = gr.Textbox(
+                label="Analysis Job ID",
+                placeholder="Paste a job ID to follow a running analysis...",
+                lines=1,
+                scale=4,
+            )
+            follow_btn = gr.Button("👁 Follow Job", variant="secondary", size="sm", scale=1)
 
         with gr.Row():
             with gr.Column(scale=1):
@@ -1024,7 +886,11 @@ footer {visibility: hidden}
                     "🔊 Play Recommendations Audio", variant="secondary", size="sm"
                 )
                 recs_audio_output = gr.Audio(
-                    label="Recommendations Audio", visible=True, interactive=False, autoplay=True
+                    label="Recommendations Audio",
+                    visible=True,
+                    interactive=False,
+                    autoplay=True,
+                    streaming=True,
                 )
 
             with gr.Column():
@@ -1070,14 +936,33 @@ footer {visibility: hidden}
             inputs=[audio_input, images_input],
             outputs=[analyze_btn, images_input],
         )
+        for upload_input in (audio_input, images_input):
+            upload_input.change(
+                fn=speculate_upload,
+                inputs=[audio_input, images_input],
+                outputs=None,
+                show_progress="hidden",
+            )
+        app.unload(release_upload)
+        if config.DIALOGUE_POOL_ENABLED:
+            job_manager.run_coroutine(get_dialogue_pool().warm())
 
-        analyze_btn.click(
-            fn=analyze_visit_streaming,
+        analyze_event = analyze_btn.click(
+            fn=submit_visit_job,
             inputs=[audio_input, images_input],
+            outputs=[job_id_input],
+        ).then(
+            fn=analyze_visit_streaming,
+            inputs=[job_id_input, audio_input, images_input],
+            outputs=outputs_list_with_accordion,
+        )
+        follow_event = follow_btn.click(
+            fn=follow_analysis_job,
+            inputs=[job_id_input],
             outputs=outputs_list_with_accordion,
         )
 
-        generate_btn.click(
+        generate_event = generate_btn.click(
             fn=generate_and_analyze_streaming,
             inputs=[diagnosis_input, doctor_skill_input, images_input_generate],
             outputs=outputs_list
@@ -1092,6 +977,28 @@ footer {visibility: hidden}
             ],
         )
 
+        # Starting a new analysis cancels the other one still in flight; a client that stops
+        # following an upload job leaves the job running
+        analyze_btn.click(fn=None, cancels=[generate_event, follow_event])
+        generate_btn.click(fn=None, cancels=[analyze_event, follow_event])
+        follow_btn.click(fn=None, cancels=[analyze_event, generate_event])
+
+        stop_btn.click(
+            fn=stop_analysis,
+            inputs=[job_id_input],
+            outputs=[
+                status_output,
+                audio_input,
+                images_input,
+                analyze_btn,
+                diagnosis_input,
+                doctor_skill_input,
+                images_input_generate,
+                generate_btn,
+            ],
+            cancels=[analyze_event, generate_event, follow_event],
+        )
+
         play_recs_btn.click(
             fn=play_recommendations,
             inputs=[recs_text_state],
@@ -1,3 +1,5 @@
+from collections.abc import Callable
+
 from .settings import config
 
 SYSTEM_PROMPT_IMAGE_ANALYSIS = """
@@ -209,6 +211,38 @@ Instructions:
 """
 
 
+def get_image_report_context(image_report: str) -> str:
+    return (
+        f"Additional context - Image/Document Analysis Report:\n{image_report}\n\n"
+        "Use this report in the analysis steps that follow; "
+        "do not include it in the formatted transcript."
+    )
+
+
+def get_transcript_chunk_context(previous_dialogue: str) -> str:
+    return (
+        "The consultation is still being transcribed. Earlier turns, already formatted, "
+        f"for speaker context only:\n{previous_dialogue}\n\n"
+        "Format only the turns in the next message and do not repeat the earlier ones."
+    )
+
+
+def get_criteria_results_context(evaluation: str) -> str:
+    return (
+        "The doctor's performance was evaluated criterion by criterion in separate requests. "
+        f"Evaluation results:\n{evaluation}\n\n"
+        "Base the next answer on these results."
+    )
+
+
+def get_stage_results_context(results: str) -> str:
+    return (
+        "Results of earlier analysis steps, produced in separate requests:\n"
+        f"{results}\n\n"
+        "Take them into account in the next answer."
+    )
+
+
 def get_complaints_streaming_prompt() -> str:
     return f"""{get_base_context()}
 
@@ -239,6 +273,25 @@ For each medication provide: name, dosage, frequency, and duration (if mentioned
 """
 
 
+def get_extraction_streaming_prompt() -> str:
+    return f"""{get_base_context()}
+
+Based on the consultation analysis, extract the structured consultation data in a single response.
+Fill the fields in this order: complaints, diagnosis, medications, image_findings.
+
+- complaints: list of strings with all symptoms and concerns the patient mentioned.
+  Use reported speech (third-person past tense), e.g., "The patient had a headache for about two days".
+- diagnosis: the preliminary diagnosis as a string, or null if no diagnosis was established.
+- medications: prescribed medications, each with name, dosage, frequency, and duration (if mentioned).
+- image_findings: key findings from the image analysis report, if one was provided. Leave empty otherwise.
+
+IMPORTANT: If an image analysis report is provided:
+- Use the findings (diagnosis, document summary) to contextualize the consultation
+- Consider whether the doctor's diagnosis aligns with the information in the image report
+- The images are brought by the patient, not ordered by the doctor
+"""
+
+
 def get_recommendations_streaming_prompt() -> str:
     return f"""{get_base_context()}
 
@@ -279,9 +332,12 @@ __ITEM__
 """
 
 
-def get_criteria_streaming_prompt() -> str:
-    criteria_defs = "\n".join([f"     - {k}: {v}" for k, v in config.EVALUATION_CRITERIA.items()])
-    criteria_keys = ", ".join(config.EVALUATION_CRITERIA.keys())
+def get_criteria_streaming_prompt(criteria: list[str] | None = None) -> str:
+    selected = {
+        k: v for k, v in config.EVALUATION_CRITERIA.items() if criteria is None or k in criteria
+    }
+    criteria_defs = "\n".join([f"     - {k}: {v}" for k, v in selected.items()])
+    criteria_keys = ", ".join(selected.keys())
     return f"""{get_base_context()}
 
 Based on the consultation analysis, evaluate the doctor's performance using these criteria:
@@ -316,6 +372,24 @@ Write exactly 3 concise sentences summarizing: (1) overall performance, (2) key
 """
 
 
+STREAMING_PROMPTS: dict[str, Callable[[], str]] = {
+    "transcript": get_transcript_streaming_prompt,
+    "complaints": get_complaints_streaming_prompt,
+    "diagnosis": get_diagnosis_streaming_prompt,
+    "medications": get_medications_streaming_prompt,
+    "extraction": get_extraction_streaming_prompt,
+    "recommendations": get_recommendations_streaming_prompt,
+    "criteria": get_criteria_streaming_prompt,
+    "general_comment": get_general_comment_streaming_prompt,
+}
+
+
+def get_streaming_prompt(name: str) -> str:
+    if name not in STREAMING_PROMPTS:
+        raise ValueError(f"Unknown streaming prompt: {name}")
+    return STREAMING_PROMPTS[name]()
+
+
 def get_image_analysis_prompt() -> str:
     return SYSTEM_PROMPT_IMAGE_ANALYSIS
 
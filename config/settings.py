@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import Any
 
 import yaml
 from pydantic import Field
@@ -23,6 +24,12 @@ def load_criteria_from_yaml() -> dict[str, str]:
         return yaml.safe_load(f)
 
 
+def load_pipelines_from_yaml() -> dict[str, Any]:
+    yaml_path = BASE_DIR / "config" / "pipeline.yaml"
+    with open(yaml_path, "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
 class AppConfig(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
@@ -40,6 +47,85 @@ class AppConfig(BaseSettings):
 
     TTS_MODEL: str = "tts-1-hd"
     DEFAULT_TTS_VOICE: str = "sage"
+    # Dialogue turns synthesized at the same time when generating dialogue audio
+    TTS_MAX_CONCURRENCY: int = 6
+    # Synthesized audio is streamed into the output file in chunks of this size; parts that arrive
+    # ahead of their turn are held in memory up to TTS_MAX_BUFFERED_BYTES
+    TTS_STREAM_CHUNK_SIZE: int = 64 * 1024
+    TTS_MAX_BUFFERED_BYTES: int = 8 * 1024 * 1024
+    # Streamed playback sends the first synthesized frames at once, then chunks of this many seconds
+    TTS_PLAYBACK_CHUNK_SECONDS: float = 1.0
+    # Longer texts are synthesized sentence by sentence, TTS_MAX_CONCURRENCY at a time; shorter
+    # fragments (abbreviations, list numbers) are kept with the next sentence
+    TTS_MIN_SENTENCE_CHARS: int = 20
+    # Recommendations audio is synthesized in the background as soon as the recommendations are
+    # final; the last TTS_PREFETCH_MAX_ENTRIES texts are kept for the Play button
+    TTS_PREFETCH_ENABLED: bool = True
+    TTS_PREFETCH_MAX_ENTRIES: int = 32
+    # Synthesized audio is cached on disk by text, voice, model and instructions; the least
+    # recently used files are evicted once the cache outgrows TTS_CACHE_MAX_MB
+    TTS_CACHE_ENABLED: bool = True
+    TTS_CACHE_DIR: Path = BASE_DIR / "_data" / "tts_cache"
+    TTS_CACHE_MAX_MB: float = 512.0
+
+    # Simulated dialogues are kept ready, DIALOGUE_POOL_SIZE per diagnosis and doctor skill, in
+    # SQLite; taking one refills the pool in the background. Only the presets and combinations
+    # requested at least DIALOGUE_POOL_MIN_REQUESTS times are kept filled
+    DIALOGUE_POOL_ENABLED: bool = True
+    DIALOGUE_POOL_SIZE: int = 3
+    DIALOGUE_POOL_MIN_REQUESTS: int = 2
+    DIALOGUE_POOL_DB_PATH: Path = BASE_DIR / "_data" / "dialogue_pool.db"
+    DIALOGUE_POOL_PRESETS: list[tuple[str | None, int]] = [(None, 3)]
+
+    # Streaming analysis pipeline from config/pipeline.yaml: "chained" runs complaints, diagnosis
+    # and medications as separate requests, "combined" extracts them in one structured request
+    ANALYSIS_PIPELINE_MODE: str = "chained"
+    ANALYSIS_PIPELINES: dict[str, Any] = Field(default_factory=load_pipelines_from_yaml)
+    # Pipeline used when the analysis starts while the audio is still being transcribed
+    TRANSCRIPTION_PIPELINE_MODE: str = "overlapped"
+    # Two-tier transcription of uploads: the fast raw transcript is shown at once and starts the
+    # raw_dialogue stages of TWO_TIER_PIPELINE_MODE, the diarized one feeds the other stages
+    TWO_TIER_TRANSCRIPTION: bool = False
+    TWO_TIER_PIPELINE_MODE: str = "two_tier"
+    # Turns are formatted in chunks of at most this many turns while they are being transcribed,
+    # with the last TRANSCRIPT_CHUNK_CONTEXT_TURNS earlier turns sent along for speaker context;
+    # turns that are already transcribed are formatted in one request
+    TRANSCRIPT_CHUNK_MAX_TURNS: int = 12
+    TRANSCRIPT_CHUNK_CONTEXT_TURNS: int = 4
+    # Maximum number of pipeline stages streaming at the same time
+    PIPELINE_MAX_CONCURRENCY: int = 4
+    # Criteria stages with a group_size evaluate at most this many criteria groups at the same time
+    CRITERIA_MAX_CONCURRENCY: int = 3
+    # Streaming events carry deltas; a full snapshot of a stage is sent every N deltas
+    STREAM_SNAPSHOT_INTERVAL: int = 50
+    # Streaming UI updates are coalesced into at most this many frames per second
+    UI_FRAME_RATE: float = 15.0
+
+    # Uploads are transcribed and their images analyzed as soon as they change, before Analyze is
+    # clicked; the analysis of the same files takes the speculative work over
+    SPECULATIVE_UPLOADS_ENABLED: bool = True
+
+    # Finished stages are checkpointed so an interrupted session resumes where it stopped; analysis
+    # stages are keyed by their inputs and only re-run when their dialogue, prompt or profile changes
+    CHECKPOINTS_ENABLED: bool = True
+    CHECKPOINT_DB_PATH: Path = BASE_DIR / "_data" / "checkpoints.db"
+    CHECKPOINT_TTL_HOURS: float = 24.0
+
+    # Finished background analysis jobs stay available for replay this long
+    JOB_RETENTION_MINUTES: float = 60.0
+    # Job status and events are shared between worker processes through SQLite (cluster mode)
+    JOB_STORE_ENABLED: bool = False
+    JOB_DB_PATH: Path = BASE_DIR / "_data" / "jobs.db"
+    JOB_POLL_INTERVAL: float = 0.25
+
+    # Cluster mode (main_cluster.py): worker processes behind a sticky local load balancer
+    CLUSTER_WORKERS: int = 0  # 0 = one worker per CPU core
+    CLUSTER_WORKER_BASE_PORT: int = 7870
+    WORKER_ID: str = ""
+
+    # Prometheus-style metrics are served next to the Gradio app
+    METRICS_ENABLED: bool = True
+    METRICS_PATH: str = "/metrics"
 
     # Mocking
     USE_MOCK_SERVICES: bool = False
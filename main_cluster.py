@@ -0,0 +1,43 @@
+import multiprocessing
+import os
+
+import uvicorn
+
+from app.services.balancer import create_balancer_app
+from config.logger import logger
+from config.settings import config
+
+
+def run_worker(index: int, port: int) -> None:
+    # Workers share jobs and checkpoints through SQLite, so any worker can follow any job
+    config.WORKER_ID = f"worker-{index}"
+    config.JOB_STORE_ENABLED = True
+
+    from main_streaming import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    worker_count = config.CLUSTER_WORKERS or os.cpu_count() or 1
+    ports = [config.CLUSTER_WORKER_BASE_PORT + index for index in range(worker_count)]
+    port = int(os.getenv("PORT", 7861))
+
+    logger.info(f"Starting Medical AI Assistant cluster with {worker_count} workers...")
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker, args=(index, worker_port), name=f"worker-{index}")
+        for index, worker_port in enumerate(ports)
+    ]
+    for process in processes:
+        process.start()
+
+    logger.info(f"Launching sticky load balancer on port {port}...")
+    app = create_balancer_app([f"http://127.0.0.1:{worker_port}" for worker_port in ports])
+    try:
+        uvicorn.run(app, host="0.0.0.0", port=port)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
@@ -1,12 +1,32 @@
 import os
 
+import gradio as gr
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
+from app.services.metrics import REGISTRY
 from app.ui.gradio_app_streaming import create_streaming_app
 from config.logger import logger
+from config.settings import config
 
 demo = create_streaming_app()
 
+app = FastAPI()
+
+if config.METRICS_ENABLED:
+
+    @app.get(config.METRICS_PATH, response_class=PlainTextResponse)
+    def metrics() -> PlainTextResponse:
+        return PlainTextResponse(
+            REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+
+app = gr.mount_gradio_app(app, demo, path="/")
+
 if __name__ == "__main__":
     logger.info("Starting Medical AI Assistant (Streaming Mode)...")
     logger.info("Launching Gradio interface...")
     port = int(os.getenv("PORT", 7861))
-    demo.launch(server_name="0.0.0.0", server_port=port)
+    uvicorn.run(app, host="0.0.0.0", port=port)
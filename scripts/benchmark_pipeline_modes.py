@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path to allow imports from app
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.models import DialogueTurn
+from app.services.llm import get_llm_provider
+from app.services.session_streaming import get_streaming_session_service
+from config.prompts import get_dialogue_generation_prompt
+from config.settings import config
+
+if not config.OPENAI_API_KEY:
+    print("Error: OPENAI_API_KEY not found in .env")
+    exit(1)
+
+# Every measured run has to call the LLM, not replay stages from the checkpoint store
+config.CHECKPOINTS_ENABLED = False
+
+
+PIPELINE_MODES = ("chained", "combined")
+EXTRACTION_STAGES = ("complaints", "diagnosis", "medications")
+
+
+def load_transcript(path: Path) -> list[DialogueTurn]:
+    turns: list[DialogueTurn] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if ":" not in line:
+            continue
+        speaker, text = line.split(":", 1)
+        turns.append(DialogueTurn(speaker=speaker.strip(), text=text.strip()))
+    return turns
+
+
+async def generate_transcript(diagnosis: str | None) -> list[DialogueTurn]:
+    llm = get_llm_provider()
+    system_prompt = get_dialogue_generation_prompt(diagnosis=diagnosis, doctor_skill=3)
+    generated_dialogue = await llm.generate_dialogue(
+        system_prompt=system_prompt, diagnosis=diagnosis
+    )
+    return [DialogueTurn(speaker=turn.role, text=turn.text) for turn in generated_dialogue.dialogue]
+
+
+async def run_once(
+    transcript: list[DialogueTurn], image_report: str | None, mode: str
+) -> dict[str, float]:
+    service = get_streaming_session_service()
+    timings: dict[str, float] = {}
+
+    start = time.perf_counter()
+    async for update in service.analyze_consultation_streaming(
+        transcript, image_report, pipeline_mode=mode
+    ):
+        stage = update["stage"]
+        if stage == "error":
+            raise RuntimeError(update["data"])
+        if update["status"] == "complete" and stage not in timings:
+            timings[stage] = time.perf_counter() - start
+
+    timings["extraction"] = max(timings[stage] for stage in EXTRACTION_STAGES) - timings.get(
+        "transcript", 0.0
+    )
+    return timings
+
+
+async def benchmark(transcript: list[DialogueTurn], image_report: str | None, runs: int) -> None:
+    results: dict[str, list[dict[str, float]]] = {mode: [] for mode in PIPELINE_MODES}
+
+    for run in range(runs):
+        # Alternate the order so neither mode benefits from warmer upstream caches
+        modes = PIPELINE_MODES if run % 2 == 0 else tuple(reversed(PIPELINE_MODES))
+        for mode in modes:
+            print(f"[{run + 1}/{runs}] Running {mode} pipeline...")
+            results[mode].append(await run_once(transcript, image_report, mode))
+
+    columns = ("extraction",) + EXTRACTION_STAGES + ("complete",)
+    print()
+    print(f"{'mode':<10}" + "".join(f"{column:>14}" for column in columns))
+    for mode in PIPELINE_MODES:
+        row = f"{mode:<10}"
+        for column in columns:
+            row += f"{statistics.median(r[column] for r in results[mode]):>13.2f}s"
+        print(row)
+    print()
+    print("Stage columns are the median time from start until the stage completed;")
+    print("'extraction' is the time spent after the transcript stage until all fields were ready.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the chained and combined streaming analysis pipelines"
+    )
+    parser.add_argument(
+        "--transcript",
+        type=Path,
+        default=None,
+        help="Text file with one 'Speaker: text' turn per line. Generated if omitted",
+    )
+    parser.add_argument(
+        "--diagnosis",
+        type=str,
+        default=None,
+        help="Diagnosis for the generated dialogue when no transcript is given (optional)",
+    )
+    parser.add_argument(
+        "--image-report",
+        type=Path,
+        default=None,
+        help="Text file with an image analysis report to include (optional)",
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Runs per pipeline mode. Default: 3")
+    args = parser.parse_args()
+
+    if args.transcript:
+        transcript = load_transcript(args.transcript)
+    else:
+        transcript = asyncio.run(generate_transcript(args.diagnosis))
+    image_report = args.image_report.read_text(encoding="utf-8") if args.image_report else None
+
+    print(f"Benchmarking {len(transcript)} turns, {args.runs} run(s) per mode...")
+    asyncio.run(benchmark(transcript, image_report, args.runs))
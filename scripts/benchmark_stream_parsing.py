@@ -0,0 +1,117 @@
+import argparse
+import sys
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+# Add project root to path to allow imports from app
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.stream_parsing import ITEM_DELIMITER, DelimitedItemTokenizer, parse_criterion
+
+CRITERION_ITEM = (
+    "CRITERION_NAME: clinical_reasoning\n"
+    "SCORE: 4\n"
+    "COMMENT: The diagnostic approach was logical and systematic. "
+    "Minor improvement could be made in considering differential diagnoses.\n"
+    f"{ITEM_DELIMITER}\n"
+)
+
+
+def make_deltas(total_chars: int, delta_size: int) -> list[str]:
+    text = CRITERION_ITEM * (total_chars // len(CRITERION_ITEM) + 1)
+    text = text[:total_chars]
+    return [text[i : i + delta_size] for i in range(0, len(text), delta_size)]
+
+
+def legacy_parser(deltas: list[str]) -> Iterator[int]:
+    # Reference copy of the previous loop: grow a buffer and re-split it on every delta
+    buffer = ""
+    items: list[str] = []
+    for delta in deltas:
+        buffer += delta
+        if ITEM_DELIMITER in buffer:
+            parts = buffer.split(ITEM_DELIMITER)
+            for i in range(len(parts) - 1):
+                item_text = parts[i].strip()
+                if item_text:
+                    items.append(item_text)
+            buffer = parts[-1]
+        yield len(items)
+
+
+def legacy_no_delimiter_parser(deltas: list[str]) -> Iterator[int]:
+    # Worst case for the legacy loop: a long item without a delimiter yet
+    buffer = ""
+    for delta in deltas:
+        buffer += delta
+        if ITEM_DELIMITER in buffer:
+            buffer = buffer.split(ITEM_DELIMITER)[-1]
+        yield len(buffer)
+
+
+def tokenizer_parser(deltas: list[str]) -> Iterator[int]:
+    tokenizer = DelimitedItemTokenizer()
+    parsed = 0
+    for delta in deltas:
+        for item in tokenizer.feed(delta):
+            if parse_criterion(item):
+                parsed += 1
+        yield parsed
+
+
+def tokenizer_no_delimiter_parser(deltas: list[str]) -> Iterator[int]:
+    tokenizer = DelimitedItemTokenizer()
+    for delta in deltas:
+        yield len(tokenizer.feed(delta))
+
+
+def measure(parser: Callable[[list[str]], Iterator[int]], deltas: list[str]) -> float:
+    start = time.perf_counter()
+    for _ in parser(deltas):
+        pass
+    return (time.perf_counter() - start) / len(deltas) * 1_000_000
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Micro-benchmark per-delta cost of the __ITEM__ stream parsers"
+    )
+    arg_parser.add_argument(
+        "--delta-size", type=int, default=4, help="Characters per streamed delta. Default: 4"
+    )
+    arg_parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1_000, 10_000, 100_000],
+        help="Total output sizes in characters. Default: 1000 10000 100000",
+    )
+    args = arg_parser.parse_args()
+
+    parsers: dict[str, Callable[[list[str]], Iterator[int]]] = {
+        "legacy split": legacy_parser,
+        "tokenizer + state machine": tokenizer_parser,
+    }
+
+    print(f"Per-delta cost in microseconds (delta size: {args.delta_size} chars)")
+    print(f"{'parser':<28}" + "".join(f"{size:>12,}" for size in args.sizes))
+    for name, parser in parsers.items():
+        row = f"{name:<28}"
+        for size in args.sizes:
+            row += f"{measure(parser, make_deltas(size, args.delta_size)):>12.3f}"
+        print(row)
+
+    print()
+    print("Single undelimited item (legacy worst case, buffer grows with output):")
+    print(f"{'parser':<28}" + "".join(f"{size:>12,}" for size in args.sizes))
+    no_delimiter: dict[str, Callable[[list[str]], Iterator[int]]] = {
+        "legacy split": legacy_no_delimiter_parser,
+        "tokenizer": tokenizer_no_delimiter_parser,
+    }
+    for name, parser in no_delimiter.items():
+        row = f"{name:<28}"
+        for size in args.sizes:
+            deltas = ["x" * args.delta_size] * (size // args.delta_size)
+            row += f"{measure(parser, deltas):>12.3f}"
+        print(row)
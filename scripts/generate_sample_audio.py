@@ -1,7 +1,7 @@
 import argparse
 import asyncio
-import re
 import sys
+import time
 from pathlib import Path
 
 # Add project root to path to allow imports from app
@@ -10,6 +10,9 @@ sys.path.append(str(Path(__file__).parent.parent))
 from dotenv import load_dotenv
 from openai import AsyncOpenAI
 
+from app.core.models import DialogueAudioIndex, DialogueAudioTurn, GeneratedDialogueTurn
+from app.services.audio import OrderedAudioWriter, audio_index_path
+from app.services.audio_library import DialogueAudioLibrary
 from app.services.llm import get_llm_provider
 from config.prompts import get_dialogue_generation_prompt
 from config.settings import config
@@ -26,40 +29,12 @@ if not API_KEY:
 OUTPUT_DIR = config.DATA_DIR
 
 
-def sanitize_diagnosis_for_filename(diagnosis: str) -> str:
-    slug = diagnosis.lower()
-    slug = re.sub(r"[^\w\s-]", "", slug)
-    slug = re.sub(r"[\s_]+", "_", slug)
-    slug = slug.strip("_")
-    return slug
-
-
-def get_next_file_index() -> int:
-    existing_files = list(OUTPUT_DIR.glob("*_dialogue_*.mp3"))
-    if not existing_files:
-        return 1
-
-    max_index = 0
-    for file in existing_files:
-        try:
-            index = int(file.name.split("_")[0])
-            max_index = max(max_index, index)
-        except (ValueError, IndexError):
-            continue
-
-    return max_index + 1
-
-
-async def generate_dialogue_audio(diagnosis: str | None = None, doctor_skill: int = 3) -> None:
+async def generate_dialogue_audio(
+    diagnosis: str | None = None, doctor_skill: int = 3, concurrency: int | None = None
+) -> None:
     client = AsyncOpenAI(api_key=API_KEY)
     llm = get_llm_provider()
 
-    OUTPUT_DIR.mkdir(exist_ok=True)
-
-    file_index = get_next_file_index()
-    diagnosis_slug: str = sanitize_diagnosis_for_filename(diagnosis) if diagnosis else "random"
-    output_file = OUTPUT_DIR / f"{file_index:04d}_dialogue_{diagnosis_slug}_skill{doctor_skill}.mp3"
-
     if diagnosis:
         print(
             f"Generating new dialogue for diagnosis: {diagnosis} (doctor skill: {doctor_skill}/5)..."
@@ -73,50 +48,69 @@ async def generate_dialogue_audio(diagnosis: str | None = None, doctor_skill: in
     )
     dialogue_script = generated_dialogue.dialogue
 
-    print(f"Generating dialogue audio to {output_file}...")
-
-    temp_files: list[Path] = []
+    library = DialogueAudioLibrary(OUTPUT_DIR)
+    entry = library.allocate(diagnosis, doctor_skill)
+    output_file = library.path(entry)
 
-    try:
-        # Generate audio for each turn
-        for idx, turn in enumerate(dialogue_script):
-            role = turn.role
-            voice = turn.voice
-            text = turn.text
-            print(f"[{idx+1}/{len(dialogue_script)}] {role}: {text[:30]}...")
+    print(f"Generating dialogue audio to {output_file}...")
 
-            temp_file = OUTPUT_DIR / f"part_{idx}_{role}.mp3"
-            temp_files.append(temp_file)
+    semaphore = asyncio.Semaphore(concurrency or config.TTS_MAX_CONCURRENCY)
 
+    async def synthesize(idx: int, turn: GeneratedDialogueTurn, writer: OrderedAudioWriter) -> None:
+        async with semaphore:
+            started = time.perf_counter()
             async with client.audio.speech.with_streaming_response.create(
-                model="tts-1", voice=voice, input=text
+                model="tts-1", voice=turn.voice, input=turn.text
             ) as response:
-                await response.stream_to_file(temp_file)
-
-        # Combine audio files using ffmpeg (requires ffmpeg installed)
-        # Alternatively, we can just concatenate binary content if MP3 format allows it simply,
-        # but proper concatenation usually requires re-encoding or a container tool.
-        # For simplicity in python without extra heavy libs like pydub+ffmpeg, we can try simple binary concat for MP3
-        # (often works for simple players, though not strictly standard compliant without fixing headers).
-        # BUT: let's use pydub if available or just simple binary append for a quick hack script.
-        # Given we don't want to force install ffmpeg if user doesn't have it, let's try binary append first.
+                async for chunk in response.iter_bytes(config.TTS_STREAM_CHUNK_SIZE):
+                    await writer.write(idx, chunk)
+            await writer.finish(idx)
+        print(
+            f"[{idx+1}/{len(dialogue_script)}] {turn.role} ({time.perf_counter() - started:.2f}s): "
+            f"{turn.text[:30]}..."
+        )
 
-        print("Combining audio segments...")
+    try:
+        # Generate audio for all turns concurrently, streaming it into the file in dialogue order.
+        # MP3 frames are joined as they are, under one Xing header, so no re-encoding is needed.
         with open(output_file, "wb") as outfile:
-            for fpath in temp_files:
-                with open(fpath, "rb") as infile:
-                    outfile.write(infile.read())
+            writer = OrderedAudioWriter(
+                outfile,
+                parts=len(dialogue_script),
+                chunk_size=config.TTS_STREAM_CHUNK_SIZE,
+                max_buffered=config.TTS_MAX_BUFFERED_BYTES,
+            )
+            started = time.perf_counter()
+            tasks = [
+                asyncio.create_task(synthesize(idx, turn, writer))
+                for idx, turn in enumerate(dialogue_script)
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+            segments = writer.close()
+        print(f"Synthesized {len(tasks)} turns in {time.perf_counter() - started:.2f}s")
+
+        index = DialogueAudioIndex(
+            audio_file=output_file.name,
+            duration_seconds=writer.duration_seconds,
+            turns=[
+                DialogueAudioTurn(role=turn.role, text=turn.text, **segment.model_dump())
+                for turn, segment in zip(dialogue_script, segments)
+            ],
+        )
+        audio_index_path(output_file).write_text(index.model_dump_json(indent=2), encoding="utf-8")
+        library.complete(entry.file_index, index.duration_seconds, len(index.turns))
 
-        print(f"Done! Saved to {output_file}")
+        print(f"Done! Saved to {output_file} ({index.duration_seconds:.1f}s)")
 
     except Exception as e:
         print(f"Error generating audio: {e}")
-    finally:
-        # Cleanup temp files
-        print("Cleaning up temporary files...")
-        for fpath in temp_files:
-            if fpath.exists():
-                fpath.unlink()
+        output_file.unlink(missing_ok=True)
+        audio_index_path(output_file).unlink(missing_ok=True)
+        library.discard(entry.file_index)
 
 
 if __name__ == "__main__":
@@ -135,6 +129,31 @@ if __name__ == "__main__":
         metavar="[1-5]",
         help="Doctor's skill level: 1=Novice, 2=Junior, 3=Competent, 4=Proficient, 5=Expert. Default: 3 (competent)",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help=f"Turns synthesized at the same time. Default: {config.TTS_MAX_CONCURRENCY}",
+    )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="List the generated dialogue recordings instead of generating a new one",
+    )
     args = parser.parse_args()
 
-    asyncio.run(generate_dialogue_audio(diagnosis=args.diagnosis, doctor_skill=args.doctor_skill))
+    if args.list:
+        for entry in DialogueAudioLibrary(OUTPUT_DIR).entries():
+            print(
+                f"{entry.file_name}: {entry.diagnosis or 'random'}, skill {entry.doctor_skill}, "
+                f"{entry.turns or '?'} turns, {entry.duration_seconds or 0:.1f}s"
+            )
+        sys.exit(0)
+
+    asyncio.run(
+        generate_dialogue_audio(
+            diagnosis=args.diagnosis,
+            doctor_skill=args.doctor_skill,
+            concurrency=args.concurrency,
+        )
+    )